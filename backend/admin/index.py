@@ -9,6 +9,7 @@ import hashlib
 from typing import Dict, Any
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from http_response import http_response
 
 SCHEMA = 't_p65890965_refstaff_project'
 
@@ -35,6 +36,10 @@ def check_auth(event):
     provided = event.get('headers', {}).get('X-Admin-Secret', '')
     return secret and provided == secret
 
+def cache_policy(event: dict) -> str:
+    return 'private, no-cache' if event.get('httpMethod') == 'GET' else 'no-store'
+
+@http_response(cache_policy)
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     if event.get('httpMethod') == 'OPTIONS':
         return {'statusCode': 200, 'headers': cors_headers(), 'body': '', 'isBase64Encoded': False}
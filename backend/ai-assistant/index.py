@@ -9,6 +9,7 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import urllib.request
+from http_response import http_response
 
 POLZA_BASE_URL = "https://api.polza.ai/api/v1"
 MODEL = "openai/gpt-4o-mini"
@@ -187,6 +188,7 @@ def ask_gpt(messages: list) -> str:
     return result['choices'][0]['message']['content']
 
 
+@http_response()
 def handler(event: dict, context) -> dict:
     """ИИ-помощник для работодателя — отвечает на вопросы по данным компании и платформе."""
     cors = {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'}
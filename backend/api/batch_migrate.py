@@ -0,0 +1,48 @@
+# Сгенерировано scripts/sync_shared.py из shared/batch_migrate.py — не редактировать, правьте shared/batch_migrate.py.
+"""
+Пакетный перенос строк с курсором по id: вложения и резюме в api, аватары в upload-avatar.
+
+Каноничный исходник: shared/batch_migrate.py. Облачные функции деплоятся каждая из своей папки,
+поэтому в backend/<функция>/batch_migrate.py лежит копия, которую пишет scripts/sync_shared.py.
+
+Вызывающий передаёт after_id из прошлого ответа (last_id). Строку, которую не удалось перенести,
+курсор проходит, она попадает в failed — следующий вызов её не выбирает повторно. Перенос закончен,
+когда remaining (строк после last_id) стал 0; повторить упавшие — начать заново с after_id = 0.
+"""
+
+from typing import Callable, Optional
+
+MAX_ROW_ID = 2**31 - 1
+
+
+def parse_after_id(value) -> Optional[int]:
+    """Курсор из тела запроса: целое 0..MAX_ROW_ID (по умолчанию 0), иначе None."""
+    if value is None:
+        return 0
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= MAX_ROW_ID:
+        return None
+    return value
+
+
+def migrate_batch(cur, select_sql: str, update_sql: str, count_sql: str,
+                  convert: Callable[[dict], tuple], after_id: int, batch: int) -> dict:
+    """Переносит до batch строк с id > after_id.
+
+    select_sql выбирает id и данные строки (параметры: after_id, limit, ORDER BY id),
+    convert(row) кладёт данные в хранилище и возвращает параметры update_sql без id,
+    update_sql обновляет строку (последний параметр — id), count_sql считает
+    оставшиеся строки с id > %s. Курсор — RealDictCursor."""
+    cur.execute(select_sql, (after_id, batch))
+    rows = cur.fetchall()
+    migrated, failed = 0, []
+    for row in rows:
+        try:
+            values = convert(row)
+        except Exception as e:
+            failed.append({'id': row['id'], 'error': str(e)})
+            continue
+        cur.execute(update_sql, (*values, row['id']))
+        migrated += 1
+    last_id = rows[-1]['id'] if rows else after_id
+    cur.execute(count_sql, (last_id,))
+    return {'migrated': migrated, 'failed': failed, 'last_id': last_id, 'remaining': cur.fetchone()['cnt']}
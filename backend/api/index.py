@@ -9,43 +9,657 @@ Returns: HTTP response dict с statusCode, headers, body
 import json
 import os
 import base64
+import binascii
+import hashlib
+import hmac
+import io
+import math
 import uuid
 import mimetypes
+import select
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from typing import Dict, Any, Optional
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
+import urllib.parse
 import urllib.request
+import urllib.error
 import boto3
+from messenger import MessengerClient, MessengerError
+from http_response import http_response
+from batch_migrate import migrate_batch, parse_after_id
 
-NOTIFY_URL = 'https://functions.poehali.dev/3c081b85-b149-4f98-a70a-f773cb440d06'
+NOTIFY_URL = os.environ.get('NOTIFY_URL', 'https://functions.poehali.dev/3c081b85-b149-4f98-a70a-f773cb440d06')
 TG_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+OG_PROXY_URL = os.environ.get('OG_PROXY_URL', 'https://functions.poehali.dev/a7ef69a9-2736-4504-ac24-54132c34d646')
+
+OUTBOX_BATCH = 50
+OUTBOX_CONCURRENCY = 8
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_BASE = 30  # секунд: 30, 60, 120 ... не больше OUTBOX_BACKOFF_MAX
+OUTBOX_BACKOFF_MAX = 3600
+OUTBOX_LEASE = 120  # через столько секунд недоставленная «sending»-строка снова берётся в работу
+
+MESSENGER = MessengerClient(max_wait=10)
 
 def send_notification(payload):
-    try:
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(NOTIFY_URL, data=data, headers={'Content-Type': 'application/json'}, method='POST')
-        urllib.request.urlopen(req, timeout=5)
-    except Exception:
-        pass
+    """Письмо работодателю через notify-company. Ошибки пробрасываются — повторяет dispatcher."""
+    data = json.dumps(payload).encode('utf-8')
+    req = urllib.request.Request(NOTIFY_URL, data=data, headers={'Content-Type': 'application/json'}, method='POST')
+    urllib.request.urlopen(req, timeout=5).close()
+
+def tg_message(chat_id, text: str) -> tuple:
+    """Аргументы MESSENGER.post (и элемент MESSENGER.send_many) для сообщения сотруднику."""
+    if not TG_BOT_TOKEN:
+        raise RuntimeError('TELEGRAM_BOT_TOKEN is not set')
+    return (TG_BOT_TOKEN, chat_id, f'{TELEGRAM_API_URL}/bot{TG_BOT_TOKEN}/sendMessage',
+            {'chat_id': int(chat_id), 'text': text, 'parse_mode': 'HTML'}, None)
 
 def tg_notify(chat_id, text: str):
-    """Отправляет уведомление сотруднику в Telegram."""
-    if not chat_id or not TG_BOT_TOKEN:
-        return
+    """Отправляет уведомление сотруднику в Telegram. Ошибки пробрасываются — повторяет dispatcher."""
+    MESSENGER.post(*tg_message(chat_id, text))
+
+def refresh_og_page(payload):
+    """Пересобирает OG-страницы вакансии (обычную и реферальную) в og-proxy."""
+    data = json.dumps({'pages': [payload]}).encode('utf-8')
+    req = urllib.request.Request(
+        f'{OG_PROXY_URL}?action=prerender', data=data, method='POST',
+        headers={'Content-Type': 'application/json', 'X-Admin-Secret': os.environ.get('ADMIN_SECRET', '')}
+    )
+    urllib.request.urlopen(req, timeout=10).close()
+
+NOTIFICATION_SENDERS = {
+    'company': send_notification,
+    'telegram': lambda payload: tg_notify(payload['chat_id'], payload['text']),
+    'og_page': refresh_og_page,
+}
+
+def enqueue_notification(cur, kind: str, payload: dict):
+    """Кладёт уведомление в outbox — в той же транзакции, что и бизнес-изменение."""
+    cur.execute(
+        "INSERT INTO t_p65890965_refstaff_project.notification_outbox (kind, payload) VALUES (%s, %s)",
+        (kind, json.dumps(payload, default=str))
+    )
+
+def enqueue_tg(cur, chat_id, text: str):
+    if chat_id:
+        enqueue_notification(cur, 'telegram', {'chat_id': chat_id, 'text': text})
+
+def delivery_result(row, error: Exception = None) -> tuple:
+    """(row, error, permanent, retry_after): 4xx кроме 429 повторять бессмысленно
+    (бот заблокирован, чат не найден); после 429 ждём столько, сколько просит сервер."""
+    if error is None:
+        return row, None, False, None
+    if isinstance(error, MessengerError):
+        return row, str(error), 400 <= error.status < 500 and error.status != 429, error.retry_after
+    if isinstance(error, urllib.error.HTTPError):
+        return row, f'HTTP {error.code}', 400 <= error.code < 500 and error.code != 429, None
+    return row, str(error) or type(error).__name__, False, None
+
+def deliver_notification(row) -> tuple:
     try:
-        url = f'https://api.telegram.org/bot{TG_BOT_TOKEN}/sendMessage'
-        data = json.dumps({'chat_id': int(chat_id), 'text': text, 'parse_mode': 'HTML'}).encode()
-        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
-        urllib.request.urlopen(req, timeout=5)
-    except Exception:
-        pass
+        NOTIFICATION_SENDERS[row['kind']](row['payload'])
+        return delivery_result(row)
+    except Exception as e:
+        return delivery_result(row, e)
+
+def deliver_telegram(rows: list) -> list:
+    """Telegram-строки outbox одной рассылкой MESSENGER.send_many: лимиты бота и чатов
+    соблюдаются общими token bucket, а не отдельным вызовом на каждое сообщение."""
+    results, batch, messages = [], [], []
+    for row in rows:
+        try:
+            messages.append(tg_message(row['payload']['chat_id'], row['payload']['text']))
+            batch.append(row)
+        except Exception as e:
+            results.append(delivery_result(row, e))
+    for row, sent in zip(batch, MESSENGER.send_many(messages, OUTBOX_CONCURRENCY)):
+        results.append(delivery_result(row, sent if isinstance(sent, Exception) else None))
+    return results
+
+def dispatch_outbox(cur, batch: int) -> dict:
+    """Забирает пачку готовых к отправке уведомлений и доставляет их параллельно.
+    Неудачные откладываются с экспоненциальной задержкой, после OUTBOX_MAX_ATTEMPTS — failed."""
+    cur.execute("""
+        UPDATE t_p65890965_refstaff_project.notification_outbox
+        SET status = 'sending', attempts = attempts + 1,
+            next_attempt_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second'
+        WHERE id IN (
+            SELECT id FROM t_p65890965_refstaff_project.notification_outbox
+            WHERE status IN ('pending', 'sending') AND next_attempt_at <= CURRENT_TIMESTAMP
+            ORDER BY next_attempt_at, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, kind, payload, attempts
+    """, (OUTBOX_LEASE, batch))
+    rows = cur.fetchall()
+    if not rows:
+        return {'sent': 0, 'retried': 0, 'failed': 0}
+
+    others = [row for row in rows if row['kind'] != 'telegram']
+    with ThreadPoolExecutor(max_workers=max(1, min(OUTBOX_CONCURRENCY, len(others)))) as executor:
+        futures = [executor.submit(deliver_notification, row) for row in others]
+        results = deliver_telegram([row for row in rows if row['kind'] == 'telegram'])
+        results += [future.result() for future in futures]
+
+    sent, retried, failed = [], 0, 0
+    for row, error, permanent, retry_after in results:
+        if error is None:
+            sent.append(row['id'])
+        elif permanent or row['attempts'] >= OUTBOX_MAX_ATTEMPTS:
+            cur.execute(
+                "UPDATE t_p65890965_refstaff_project.notification_outbox SET status = 'failed', last_error = %s WHERE id = %s",
+                (error, row['id'])
+            )
+            failed += 1
+        else:
+            delay = retry_after or min(OUTBOX_BACKOFF_BASE * 2 ** (row['attempts'] - 1), OUTBOX_BACKOFF_MAX)
+            cur.execute("""
+                UPDATE t_p65890965_refstaff_project.notification_outbox
+                SET status = 'pending', last_error = %s, next_attempt_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second'
+                WHERE id = %s
+            """, (error, delay, row['id']))
+            retried += 1
+    if sent:
+        cur.execute(
+            "UPDATE t_p65890965_refstaff_project.notification_outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE id = ANY(%s)",
+            (sent,)
+        )
+    return {'sent': len(sent), 'retried': retried, 'failed': failed}
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_IDLE_TIMEOUT = int(os.environ.get('DB_POOL_IDLE_TIMEOUT', '300'))
+DB_POOL_PING_AFTER = int(os.environ.get('DB_POOL_PING_AFTER', '30'))
+
+
+class ConnectionPool:
+    """Пул соединений с БД, живущий между тёплыми вызовами функции.
+    Соединения старше idle_timeout закрываются, простаивавшие дольше ping_after
+    проверяются SELECT 1, оборванные (broken pipe, рестарт БД) пересоздаются."""
+
+    def __init__(self, max_size: int, idle_timeout: int, ping_after: int):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._idle = []  # [(conn, released_at)]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reconnects = 0
+
+    def _connect(self):
+        conn = psycopg2.connect(os.environ.get('DATABASE_URL'), cursor_factory=RealDictCursor)
+        conn.autocommit = True
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn, idle_for: float) -> bool:
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if idle_for < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def acquire(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, released_at = self._idle.pop()
+            idle_for = now - released_at
+            if idle_for > self.idle_timeout:
+                self.evictions += 1
+                self._close(conn)
+                continue
+            if not self._is_alive(conn, idle_for):
+                self.reconnects += 1
+                self._close(conn)
+                continue
+            self.hits += 1
+            return conn
+        self.misses += 1
+        return self._connect()
+
+    def release(self, conn):
+        if conn.closed:
+            return
+        status = conn.get_transaction_status()
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            self._close(conn)
+            return
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                self._close(conn)
+                return
+        if not conn.autocommit:
+            # Ветки с явной транзакцией выключают autocommit — возвращаем как было
+            conn.autocommit = True
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = len(self._idle)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'reconnects': self.reconnects,
+            'idle': idle,
+            'max_size': self.max_size,
+        }
+
+
+DB_POOL = ConnectionPool(DB_POOL_MAX_SIZE, DB_POOL_IDLE_TIMEOUT, DB_POOL_PING_AFTER)
 
 def get_db_connection():
-    database_url = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
-    conn.autocommit = True
-    return conn
+    return DB_POOL.acquire()
+
+API_URL = 'https://functions.poehali.dev/fad87b35-32bf-4090-9a18-d8ecce13f24a'
+ATTACHMENT_PREFIX = 'chat-attachments'
+RESUME_PREFIX = 'resumes'
+ATTACHMENT_MIGRATE_BATCH = 20
+RESUME_MIGRATE_BATCH = 10  # резюме бывают до 20 МБ (MAX_RESUME_SIZE в upload-resume) — пачка меньше
+
+# Колонки рекомендации без тела резюме: data URL заменяется ссылкой на ленивую выгрузку
+RESUME_URL_COLUMN = f"""CASE WHEN r.resume_url LIKE 'data:%%'
+                            THEN '{API_URL}?resource=resumes&recommendation_id=' || r.id
+                            ELSE r.resume_url END as resume_url"""
+RECOMMENDATION_COLUMNS = f"""r.id, r.vacancy_id, r.recommended_by, r.candidate_name, r.candidate_email,
+                       r.candidate_phone, r.comment, r.status, r.reward_amount,
+                       r.reviewed_at, r.accepted_at, r.created_at, r.updated_at,
+                       {RESUME_URL_COLUMN}"""
+
+
+class S3AttachmentStorage:
+    """Бакет poehali.dev; клиент создаётся один раз на инстанс функции."""
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client(
+                's3',
+                endpoint_url='https://bucket.poehali.dev',
+                aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+                aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
+            )
+        return self._client
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket='files', Key=key)
+            return True
+        except Exception:
+            return False
+
+    def put(self, key: str, data: bytes, content_type: str):
+        self.client.upload_fileobj(io.BytesIO(data), 'files', key, ExtraArgs={'ContentType': content_type})
+
+    def url(self, key: str) -> str:
+        return f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{key}"
+
+
+class LocalAttachmentStorage:
+    """Хранилище на локальном диске — для тестов и локального запуска."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.root, key))
+
+    def put(self, key: str, data: bytes, content_type: str):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def url(self, key: str) -> str:
+        return f'{self.base_url}/{key}'
+
+
+if os.environ.get('ATTACHMENT_STORAGE') == 'local':
+    ATTACHMENT_STORAGE = LocalAttachmentStorage(
+        os.environ.get('ATTACHMENT_LOCAL_DIR', '/tmp/attachments'),
+        os.environ.get('ATTACHMENT_LOCAL_URL', 'file:///tmp/attachments')
+    )
+else:
+    ATTACHMENT_STORAGE = S3AttachmentStorage()
+
+def store_attachment(file_bytes: bytes, content_type: str, file_name: str, prefix: str = ATTACHMENT_PREFIX) -> tuple:
+    """Кладёт файл по ключу из SHA-256 содержимого; одинаковые файлы хранятся один раз.
+    Возвращает (url, sha256)."""
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    ext = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else (mimetypes.guess_extension(content_type) or '.bin').lstrip('.')
+    key = f'{prefix}/{digest[:2]}/{digest}.{ext}'
+    if not ATTACHMENT_STORAGE.exists(key):
+        ATTACHMENT_STORAGE.put(key, file_bytes, content_type)
+    return ATTACHMENT_STORAGE.url(key), digest
+
+def parse_data_url(data_url: str) -> tuple:
+    """data:<mime>;base64,<payload> → (bytes, mime)."""
+    header, b64 = data_url.split(',', 1)
+    content_type = header[5:].split(';')[0] or 'application/octet-stream'
+    return base64.b64decode(b64), content_type
+
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 200
 
+def encode_cursor(created_at, row_id) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+def get_page_params(query_params: dict) -> tuple:
+    """Возвращает (page, error). page = None, если клиент не просил пагинацию —
+    тогда список отдаётся целиком, как раньше."""
+    if not any(query_params.get(k) for k in ('limit', 'after', 'before')):
+        return None, None
+    try:
+        limit = int(query_params.get('limit') or PAGE_DEFAULT_LIMIT)
+        after = decode_cursor(query_params['after']) if query_params.get('after') else None
+        before = decode_cursor(query_params['before']) if query_params.get('before') else None
+    except ValueError as e:
+        return None, str(e)
+    if after and before:
+        return None, 'after and before are mutually exclusive'
+    return {'limit': max(1, min(limit, PAGE_MAX_LIMIT)), 'after': after, 'before': before}, None
+
+def keyset_bounds(ts_col: str, id_col: str, order: str, page: dict, tail: bool = False) -> tuple:
+    """Условие и сортировка для keyset-пагинации по (created_at, id).
+    order — порядок списка ('ASC'/'DESC'); tail=True без курсора отдаёт последнюю страницу.
+    Возвращает (condition, params, order_by, backward)."""
+    backward = bool(page['before']) or (tail and not page['after'])
+    cursor = page['after'] or page['before']
+    fetch_desc = (order == 'DESC') != backward
+    condition, params = None, []
+    if cursor:
+        op = '<' if fetch_desc else '>'
+        condition = f'({ts_col}, {id_col}) {op} (%s, %s)'
+        params = [cursor[0], cursor[1]]
+    direction = 'DESC' if fetch_desc else 'ASC'
+    return condition, params, f'{ts_col} {direction}, {id_col} {direction}', backward
+
+def keyset_page(rows: list, page: dict, backward: bool) -> dict:
+    rows = [dict(r) for r in rows]
+    has_more = len(rows) > page['limit']
+    rows = rows[:page['limit']]
+    if backward:
+        rows.reverse()
+    first = encode_cursor(rows[0]['created_at'], rows[0]['id']) if rows else None
+    last = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if rows else None
+    if backward:
+        next_cursor = last if page['before'] else None
+        prev_cursor = first if has_more else None
+    else:
+        next_cursor = last if has_more else None
+        prev_cursor = first if page['after'] else None
+    return {'items': rows, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
+
+MESSAGES_SINCE_LIMIT = 200
+MESSAGES_POLL_TIMEOUT = 25  # секунд; меньше таймаута облачной функции
+
+def chat_channel(chat_id) -> str:
+    """Канал LISTEN/NOTIFY, в который POST messages сообщает о новом сообщении чата."""
+    return f'chat_messages_{int(chat_id)}'
+
+def parse_row_id(value) -> Optional[int]:
+    """id строки из query-параметра; None, если это не целое в диапазоне SERIAL."""
+    try:
+        row_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return row_id if 1 <= row_id <= 2**31 - 1 else None
+
+def session_user(event: dict, query_params: dict) -> Optional[Dict[str, Any]]:
+    """Payload JWT, выданного функцией auth (user_id, company_id, role), или None.
+    Токен берётся из X-Authorization / Authorization / X-Auth-Token, а для прямых ссылок,
+    которые браузер открывает без заголовков, — из параметра token. Без JWT_SECRET — None
+    (дефолтного секрета, как в auth, здесь нет: маршруты проверяют JWT_SECRET сами и отвечают 500)."""
+    secret = os.environ.get('JWT_SECRET')
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    token = (headers.get('x-authorization') or headers.get('authorization')
+             or headers.get('x-auth-token') or query_params.get('token') or '')
+    token = token.removeprefix('Bearer ').strip()
+    if not secret or token.count('.') != 2:
+        return None
+    header_encoded, payload_encoded, signature_encoded = token.split('.')
+    expected = hmac.new(secret.encode(), f'{header_encoded}.{payload_encoded}'.encode(), hashlib.sha256).digest()
+    try:
+        if not hmac.compare_digest(base64.urlsafe_b64decode(signature_encoded + '=='), expected):
+            return None
+        payload = json.loads(base64.urlsafe_b64decode(payload_encoded + '=='))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get('exp', 0) < time.time():
+        return None
+    return payload
+
+def is_chat_member(cur, user_id, chat_id) -> bool:
+    """Сотрудник чата или employer/admin той же компании (роль и компания — из users, не из токена)."""
+    cur.execute("SELECT employee_id, company_id FROM t_p65890965_refstaff_project.chats WHERE id = %s", (chat_id,))
+    chat_row = cur.fetchone()
+    cur.execute("SELECT company_id, role FROM t_p65890965_refstaff_project.users WHERE id = %s", (user_id,))
+    user_row = cur.fetchone()
+    if not chat_row or not user_row:
+        return False
+    if str(chat_row['employee_id']) == str(user_id):
+        return True
+    return user_row['role'] in ('employer', 'admin') and str(user_row['company_id']) == str(chat_row['company_id'])
+
+def select_messages(cur, where_clause: str, params: list, order_by: str = 'm.created_at ASC', limit_clause: str = '') -> list:
+    cur.execute(f"""
+        SELECT m.id, m.chat_id, m.sender_id, m.message, m.is_read, m.created_at,
+               CASE WHEN m.attachment_url LIKE 'data:%%' THEN NULL ELSE m.attachment_url END as attachment_url,
+               m.attachment_name, m.attachment_type, m.attachment_size,
+               (m.attachment_data IS NOT NULL OR m.attachment_url LIKE 'data:%%') as attachment_inline,
+               u.first_name || ' ' || u.last_name as sender_name,
+               u.avatar_url as sender_avatar
+        FROM t_p65890965_refstaff_project.chat_messages m
+        JOIN t_p65890965_refstaff_project.users u ON m.sender_id = u.id
+        WHERE {where_clause}
+        ORDER BY {order_by}
+        {limit_clause}
+    """, params)
+    messages = []
+    for m in cur.fetchall():
+        m = dict(m)
+        # Вложения, ещё не вынесенные из БД, отдаём по ссылке, а не телом в списке
+        if m.pop('attachment_inline'):
+            m['attachment_url'] = f"{API_URL}?resource=attachments&message_id={m['id']}"
+        messages.append(m)
+    return messages
+
+def wait_for_notify(conn, timeout: float) -> bool:
+    """Ждёт NOTIFY на уже подписанном (LISTEN) соединении не дольше timeout секунд."""
+    deadline = time.monotonic() + timeout
+    while True:
+        conn.poll()
+        if conn.notifies:
+            conn.notifies.clear()
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        select.select([conn], [], [], remaining)
+
+def py_str(expr: str, kind: str) -> str:
+    """SQL-выражение с тем же текстом, что json.dumps(default=str) давал для строки из psycopg2:
+    numeric — как str(Decimal), timestamp — как str(datetime) (микросекунды только если не ноль).
+    Дашборд раньше сериализовался в Python, и фронтенд рассчитывает на этот формат."""
+    if kind == 'numeric':
+        return f'({expr})::text'
+    return (f"CASE WHEN date_part('microseconds', {expr})::bigint %% 1000000 = 0 "
+            f"THEN to_char({expr}, 'YYYY-MM-DD HH24:MI:SS') "
+            f"ELSE to_char({expr}, 'YYYY-MM-DD HH24:MI:SS.US') END")
+
+def load_dashboard(cur, company_id, user_id, role: str) -> str:
+    """Собирает все секции дашборда одним SQL-запросом (CTE + json_agg).
+    Возвращает готовый JSON-текст — Python не пересериализует строки."""
+    params = {'company_id': company_id, 'user_id': user_id}
+
+    vac_where = 'v.company_id = %(company_id)s'
+    if role != 'employer':
+        vac_where += " AND v.status = 'active'"
+
+    rec_where = 'v.company_id = %(company_id)s'
+    if role == 'employee' and user_id:
+        rec_where += ' AND r.recommended_by = %(user_id)s'
+
+    archived_filter = '' if role == 'employer' else 'AND n.is_archived = false'
+
+    chats_sql = "'[]'::json"
+    if role == 'employer' and user_id:
+        chats_sql = f"""(SELECT COALESCE(json_agg(cht ORDER BY cht.last_message_at COLLATE "C" DESC NULLS LAST), '[]'::json) FROM (
+            SELECT c.id, c.company_id, c.employee_id,
+                   {py_str('c.last_message_at', 'timestamp')} as last_message_at,
+                   {py_str('c.created_at', 'timestamp')} as created_at,
+                   u.first_name || ' ' || u.last_name as employee_name,
+                   u.position, u.avatar_url,
+                   (SELECT COALESCE(SUM(unread_count), 0) FROM t_p65890965_refstaff_project.chat_unread_counters
+                    WHERE chat_id = c.id AND sender_id != %(user_id)s) as unread_count
+            FROM t_p65890965_refstaff_project.chats c
+            JOIN t_p65890965_refstaff_project.users u ON c.employee_id = u.id
+            WHERE c.company_id = %(company_id)s
+        ) cht)"""
+
+    wallet_sql = 'NULL::json'
+    if role == 'employee' and user_id:
+        wallet_sql = f"""json_build_object(
+            'wallet', COALESCE((SELECT row_to_json(w) FROM (
+                SELECT {py_str('wallet_balance', 'numeric')} as wallet_balance,
+                       {py_str('wallet_pending', 'numeric')} as wallet_pending
+                FROM t_p65890965_refstaff_project.users WHERE id = %(user_id)s
+            ) w), '{{}}'::json),
+            'transactions', (SELECT COALESCE(json_agg(t ORDER BY t.created_at COLLATE "C" DESC), '[]'::json) FROM (
+                SELECT id, {py_str('amount', 'numeric')} as amount, type, description,
+                       {py_str('created_at', 'timestamp')} as created_at
+                FROM t_p65890965_refstaff_project.wallet_transactions
+                WHERE user_id = %(user_id)s ORDER BY wallet_transactions.created_at DESC LIMIT 50
+            ) t),
+            'pending_payouts', (SELECT COALESCE(json_agg(p ORDER BY p.unlock_date COLLATE "C" ASC), '[]'::json) FROM (
+                SELECT id, {py_str('amount', 'numeric')} as amount,
+                       {py_str('unlock_date', 'timestamp')} as unlock_date, status
+                FROM t_p65890965_refstaff_project.pending_payouts
+                WHERE user_id = %(user_id)s AND status = 'pending'
+            ) p)
+        )"""
+
+    cur.execute(f"""
+        WITH vac AS (
+            SELECT v.id, v.title, v.department, v.salary_display, v.status,
+                   {py_str('v.reward_amount', 'numeric')} as reward_amount, v.payout_delay_days,
+                   v.requirements, v.description, v.motivation,
+                   v.referral_token, {py_str('v.created_at', 'timestamp')} as created_at,
+                   COUNT(r.id) as recommendations_count,
+                   u.first_name || ' ' || u.last_name as created_by_name
+            FROM t_p65890965_refstaff_project.vacancies v
+            LEFT JOIN t_p65890965_refstaff_project.recommendations r ON v.id = r.vacancy_id
+            LEFT JOIN t_p65890965_refstaff_project.users u ON v.created_by = u.id
+            WHERE {vac_where}
+            GROUP BY v.id, u.first_name, u.last_name
+        ), emp AS (
+            SELECT id, first_name, last_name, position, department, level, experience_points,
+                   total_recommendations, successful_hires,
+                   {py_str('total_earnings', 'numeric')} as total_earnings,
+                   {py_str('wallet_pending', 'numeric')} as wallet_pending,
+                   {py_str('wallet_balance', 'numeric')} as wallet_balance,
+                   avatar_url, email, phone, telegram, vk, is_admin, is_fired
+            FROM t_p65890965_refstaff_project.users
+            WHERE company_id = %(company_id)s AND role = 'employee'
+        ), rec AS (
+            SELECT r.id, r.vacancy_id, r.recommended_by, r.candidate_name, r.candidate_email,
+                   r.candidate_phone, r.comment, r.status,
+                   {py_str('r.reward_amount', 'numeric')} as reward_amount,
+                   {py_str('r.reviewed_at', 'timestamp')} as reviewed_at,
+                   {py_str('r.created_at', 'timestamp')} as created_at,
+                   {py_str('r.updated_at', 'timestamp')} as updated_at,
+                   {py_str('r.accepted_at', 'timestamp')} as accepted_at,
+                   {RESUME_URL_COLUMN}, v.title as vacancy_title, v.payout_delay_days,
+                   u.first_name || ' ' || u.last_name as recommended_by_name
+            FROM t_p65890965_refstaff_project.recommendations r
+            JOIN t_p65890965_refstaff_project.vacancies v ON r.vacancy_id = v.id
+            JOIN t_p65890965_refstaff_project.users u ON r.recommended_by = u.id
+            WHERE {rec_where}
+        ), comp AS (
+            SELECT id, name, employee_count, invite_token, logo_url, description,
+                   website, industry, inn, telegram, vk,
+                   {py_str('created_at', 'timestamp')} as created_at, subscription_tier,
+                   to_char(subscription_expires_at, 'YYYY-MM-DD"T"HH24:MI:SS"Z"') as subscription_expires_at,
+                   payout_methods
+            FROM t_p65890965_refstaff_project.companies WHERE id = %(company_id)s
+        ), nws AS (
+            SELECT n.id, n.title, n.content, n.category,
+                   {py_str('n.created_at', 'timestamp')} as created_at,
+                   {py_str('n.updated_at', 'timestamp')} as updated_at, n.is_archived,
+                   u.first_name || ' ' || u.last_name as author,
+                   (SELECT COUNT(*) FROM t_p65890965_refstaff_project.news_likes WHERE news_id = n.id) as likes,
+                   (SELECT json_agg(json_build_object('id', nc.id, 'author_name', nc.author_name, 'text', nc.text, 'created_at', nc.created_at) ORDER BY nc.created_at ASC)
+                    FROM t_p65890965_refstaff_project.news_comments nc WHERE nc.news_id = n.id) as comments
+            FROM t_p65890965_refstaff_project.news n
+            LEFT JOIN t_p65890965_refstaff_project.users u ON n.author_id = u.id
+            WHERE n.company_id = %(company_id)s {archived_filter}
+        )
+        SELECT json_build_object(
+            'vacancies', (SELECT COALESCE(json_agg(vac ORDER BY vac.created_at COLLATE "C" DESC), '[]'::json) FROM vac),
+            'employees', (SELECT COALESCE(json_agg(emp ORDER BY emp.successful_hires DESC, emp.total_recommendations DESC), '[]'::json) FROM emp),
+            'recommendations', (SELECT COALESCE(json_agg(rec ORDER BY rec.created_at COLLATE "C" DESC), '[]'::json) FROM rec),
+            'company', (SELECT row_to_json(comp) FROM comp),
+            'news', (SELECT COALESCE(json_agg(nws ORDER BY nws.created_at COLLATE "C" DESC), '[]'::json) FROM nws),
+            'chats', {chats_sql},
+            'payouts', '[]'::json,
+            'wallet', {wallet_sql}
+        )::text as dashboard
+    """, params)
+    return cur.fetchone()['dashboard']
+
+def cache_policy(event: dict) -> str:
+    """Ответы зависят от пользователя: браузер хранит копию и перепроверяет её по ETag.
+    Long-poll сообщений и все изменяющие запросы не кешируются."""
+    query_params = event.get('queryStringParameters') or {}
+    if event.get('httpMethod') != 'GET' or query_params.get('action') == 'poll' or query_params.get('since') is not None:
+        return 'no-store'
+    return 'private, no-cache'
+
+@http_response(cache_policy)
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method = event.get('httpMethod', 'GET')
     path_params = event.get('pathParams', {})
@@ -57,13 +671,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Company-Id',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Company-Id, X-Authorization, Authorization, X-Admin-Secret',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
             'isBase64Encoded': False
         }
     
+    conn = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
@@ -120,12 +735,25 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
 
+            page, page_error = get_page_params(query_params)
+            if page_error:
+                return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': page_error}), 'isBase64Encoded': False}
+
             where_clause = 'WHERE v.company_id = %s'
             params = [company_id]
             
             if status and status != 'all':
                 where_clause += ' AND v.status = %s'
                 params.append(status)
+
+            order_by = 'v.created_at DESC'
+            limit_clause = ''
+            if page:
+                condition, cursor_params, order_by, backward = keyset_bounds('v.created_at', 'v.id', 'DESC', page)
+                if condition:
+                    where_clause += f' AND {condition}'
+                    params.extend(cursor_params)
+                limit_clause = f"LIMIT {page['limit'] + 1}"
             
             query = f"""
                 SELECT v.id, v.title, v.department, v.salary_display, v.status, 
@@ -138,7 +766,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 LEFT JOIN t_p65890965_refstaff_project.users u ON v.created_by = u.id
                 {where_clause}
                 GROUP BY v.id, u.first_name, u.last_name
-                ORDER BY v.created_at DESC
+                ORDER BY {order_by}
+                {limit_clause}
             """
             cur.execute(query, params)
             vacancies = cur.fetchall()
@@ -149,6 +778,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 if user_id and vac_dict.get('referral_token'):
                     vac_dict['referral_link'] = f"https://refstaff.app/r/{vac_dict['referral_token']}?ref={user_id}"
                 result.append(vac_dict)
+            if page:
+                result = keyset_page(result, page, backward)
             
             return {
                 'statusCode': 200,
@@ -170,6 +801,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 RETURNING id, title, department, salary_display, status, reward_amount, payout_delay_days, referral_token, requirements, description, motivation, created_at
             """
             
+            conn.autocommit = False
             cur.execute(query, (
                 body_data.get('company_id', 1),
                 body_data.get('title'),
@@ -184,6 +816,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             ))
             
             new_vacancy = cur.fetchone()
+            enqueue_notification(cur, 'og_page', {'type': 'vacancy', 'id': new_vacancy['id']})
+            conn.commit()
             
             return {
                 'statusCode': 201,
@@ -210,9 +844,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if user_id:
                 where_clauses.append('r.recommended_by = %s')
                 params.append(user_id)
+
+            page, page_error = get_page_params(query_params)
+            if page_error:
+                return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': page_error}), 'isBase64Encoded': False}
+
+            order_by = 'r.created_at DESC'
+            limit_clause = ''
+            if page:
+                condition, cursor_params, order_by, backward = keyset_bounds('r.created_at', 'r.id', 'DESC', page)
+                if condition:
+                    where_clauses.append(condition)
+                    params.extend(cursor_params)
+                limit_clause = f"LIMIT {page['limit'] + 1}"
             
             query = f"""
-                SELECT r.*, 
+                SELECT {RECOMMENDATION_COLUMNS},
                        v.title as vacancy_title,
                        v.payout_delay_days,
                        u.first_name || ' ' || u.last_name as recommended_by_name
@@ -220,11 +867,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 JOIN t_p65890965_refstaff_project.vacancies v ON r.vacancy_id = v.id
                 JOIN t_p65890965_refstaff_project.users u ON r.recommended_by = u.id
                 WHERE {' AND '.join(where_clauses)}
-                ORDER BY r.created_at DESC
+                ORDER BY {order_by}
+                {limit_clause}
             """
             
             cur.execute(query, params)
             recommendations = cur.fetchall()
+            result = keyset_page(recommendations, page, backward) if page else [dict(row) for row in recommendations]
             
             return {
                 'statusCode': 200,
@@ -232,7 +881,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
-                'body': json.dumps([dict(row) for row in recommendations], default=str),
+                'body': json.dumps(result, default=str),
                 'isBase64Encoded': False
             }
         
@@ -241,11 +890,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
             # Получаем reward_amount из вакансии если не передан
             reward_amount = body_data.get('reward_amount')
+            vac_row = None
             if not reward_amount and body_data.get('vacancy_id'):
                 cur.execute("SELECT reward_amount, title FROM t_p65890965_refstaff_project.vacancies WHERE id = %s", (body_data.get('vacancy_id'),))
                 vac_row = cur.fetchone()
                 reward_amount = vac_row['reward_amount'] if vac_row else 30000
 
+            # Рекомендация, статистика и уведомления в outbox — одной транзакцией
+            conn.autocommit = False
             cur.execute("""
                 INSERT INTO t_p65890965_refstaff_project.recommendations 
                 (vacancy_id, recommended_by, candidate_name, candidate_email, candidate_phone, comment, resume_url, reward_amount)
@@ -267,36 +919,29 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             rec_user = None
             vacancy_title = vac_row['title'] if vac_row else ''
             if body_data.get('recommended_by'):
-                try:
-                    cur.execute("UPDATE t_p65890965_refstaff_project.users SET total_recommendations = total_recommendations + 1 WHERE id = %s", (body_data.get('recommended_by'),))
-                    cur.execute("SELECT first_name, last_name, company_id, telegram_chat_id FROM t_p65890965_refstaff_project.users WHERE id = %s", (body_data.get('recommended_by'),))
-                    rec_user = cur.fetchone()
-                except Exception:
-                    pass
+                cur.execute("UPDATE t_p65890965_refstaff_project.users SET total_recommendations = total_recommendations + 1 WHERE id = %s", (body_data.get('recommended_by'),))
+                cur.execute("SELECT first_name, last_name, company_id, telegram_chat_id FROM t_p65890965_refstaff_project.users WHERE id = %s", (body_data.get('recommended_by'),))
+                rec_user = cur.fetchone()
 
             result_body = json.dumps(dict(new_recommendation), default=str)
 
-            # Уведомляем работодателя (некритично — в отдельном потоке)
-            import threading
-            def notify():
-                try:
-                    if rec_user and rec_user.get('company_id'):
-                        send_notification({
-                            'company_id': rec_user['company_id'],
-                            'event_type': 'new_recommendation',
-                            'candidate_name': body_data.get('candidate_name', ''),
-                            'candidate_email': body_data.get('candidate_email', ''),
-                            'vacancy_title': vacancy_title,
-                            'recommended_by_name': f"{rec_user.get('first_name', '')} {rec_user.get('last_name', '')}",
-                            'reward_amount': reward_amount
-                        })
-                    tg_notify(
-                        rec_user.get('telegram_chat_id') if rec_user else None,
-                        f"📋 <b>Рекомендация отправлена!</b>\n\nКандидат: <b>{body_data.get('candidate_name', '')}</b>\nВакансия: <b>{vacancy_title}</b>\n\nМы уведомим вас об изменении статуса."
-                    )
-                except Exception:
-                    pass
-            threading.Thread(target=notify, daemon=True).start()
+            # Доставит dispatch_outbox — ответ не ждёт ни notify-company, ни Telegram
+            if rec_user and rec_user.get('company_id'):
+                enqueue_notification(cur, 'company', {
+                    'company_id': rec_user['company_id'],
+                    'event_type': 'new_recommendation',
+                    'candidate_name': body_data.get('candidate_name', ''),
+                    'candidate_email': body_data.get('candidate_email', ''),
+                    'vacancy_title': vacancy_title,
+                    'recommended_by_name': f"{rec_user.get('first_name', '')} {rec_user.get('last_name', '')}",
+                    'reward_amount': reward_amount
+                })
+            enqueue_tg(
+                cur,
+                rec_user.get('telegram_chat_id') if rec_user else None,
+                f"📋 <b>Рекомендация отправлена!</b>\n\nКандидат: <b>{body_data.get('candidate_name', '')}</b>\nВакансия: <b>{vacancy_title}</b>\n\nМы уведомим вас об изменении статуса."
+            )
+            conn.commit()
 
             return {
                 'statusCode': 201,
@@ -320,7 +965,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             )
             current_rec = cur.fetchone()
             old_status = current_rec['status'] if current_rec else None
-            
+
+            # Смена статуса, начисления и уведомления в outbox — одной транзакцией
+            conn.autocommit = False
             query = """
                 UPDATE t_p65890965_refstaff_project.recommendations 
                 SET status = %s, reviewed_at = CURRENT_TIMESTAMP,
@@ -376,7 +1023,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
                 reward = int(current_rec['reward_amount'])
                 vac_title = rec_vacancy['title'] if rec_vacancy else 'вакансию'
-                tg_notify(rec_employee.get('telegram_chat_id') if rec_employee else None,
+                enqueue_tg(cur, rec_employee.get('telegram_chat_id') if rec_employee else None,
                     f"🎉 <b>Кандидат принят на работу!</b>\n\n"
                     f"Кандидат <b>{candidate_name}</b> принят на вакансию «{vac_title}».\n\n"
                     f"💰 Вознаграждение <b>{reward:,} ₽</b> зачислено в ожидании выплаты.\n"
@@ -386,7 +1033,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
             elif new_status == 'rejected' and old_status != 'rejected':
                 vac_title = rec_vacancy['title'] if rec_vacancy else 'вакансию'
-                tg_notify(rec_employee.get('telegram_chat_id') if rec_employee else None,
+                enqueue_tg(cur, rec_employee.get('telegram_chat_id') if rec_employee else None,
                     f"❌ <b>Рекомендация отклонена</b>\n\n"
                     f"К сожалению, кандидат <b>{candidate_name}</b> на вакансию «{vac_title}» не подошёл.\n\n"
                     f"Не расстраивайтесь — рекомендуйте других кандидатов!"
@@ -394,7 +1041,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
             elif new_status == 'hired' and old_status != 'hired':
                 vac_title = rec_vacancy['title'] if rec_vacancy else 'вакансию'
-                tg_notify(rec_employee.get('telegram_chat_id') if rec_employee else None,
+                enqueue_tg(cur, rec_employee.get('telegram_chat_id') if rec_employee else None,
                     f"🏆 <b>Кандидат вышел на работу!</b>\n\n"
                     f"<b>{candidate_name}</b> официально приступил к работе на вакансии «{vac_title}».\n\n"
                     f"Отличная рекомендация!"
@@ -422,7 +1069,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         level = GREATEST(1, 1 + FLOOR((GREATEST(0, experience_points - 100)) / 100))
                     WHERE id = %s
                 """, (refund_amount, current_rec['recommended_by']))
-            
+
+            conn.commit()
             return {
                 'statusCode': 200,
                 'headers': {
@@ -498,8 +1146,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 RETURNING id, title, department, salary_display, status, reward_amount, payout_delay_days
             """
             
+            conn.autocommit = False
             cur.execute(query, params)
             updated_vacancy = cur.fetchone()
+            if updated_vacancy:
+                # OG-страницы в og-proxy обновит dispatch_outbox (или удалит, если вакансия больше не активна)
+                enqueue_notification(cur, 'og_page', {'type': 'vacancy', 'id': updated_vacancy['id']})
+            conn.commit()
             
             return {
                 'statusCode': 200,
@@ -933,6 +1586,38 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
+        elif method == 'POST' and resource == 'chats' and action == 'reconcile_unread':
+            # Сверяет chat_unread_counters с chat_messages и чинит расхождения (для cron)
+            body_data = json.loads(event.get('body') or '{}')
+            if not os.environ.get('ADMIN_SECRET') or body_data.get('admin_secret') != os.environ.get('ADMIN_SECRET'):
+                return {'statusCode': 403, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'forbidden'}), 'isBase64Encoded': False}
+            cur.execute("""
+                WITH actual AS (
+                    SELECT chat_id, sender_id, COUNT(*) FILTER (WHERE is_read = false) as unread_count
+                    FROM t_p65890965_refstaff_project.chat_messages
+                    GROUP BY chat_id, sender_id
+                ), diff AS (
+                    SELECT COALESCE(a.chat_id, c.chat_id) as chat_id,
+                           COALESCE(a.sender_id, c.sender_id) as sender_id,
+                           COALESCE(a.unread_count, 0) as unread_count
+                    FROM actual a
+                    FULL JOIN t_p65890965_refstaff_project.chat_unread_counters c
+                      ON c.chat_id = a.chat_id AND c.sender_id = a.sender_id
+                    WHERE c.unread_count IS DISTINCT FROM COALESCE(a.unread_count, 0)
+                )
+                INSERT INTO t_p65890965_refstaff_project.chat_unread_counters AS c (chat_id, sender_id, unread_count)
+                SELECT chat_id, sender_id, unread_count FROM diff
+                ON CONFLICT (chat_id, sender_id) DO UPDATE SET unread_count = EXCLUDED.unread_count
+                RETURNING chat_id
+            """)
+            fixed = len(cur.fetchall())
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'fixed': fixed}),
+                'isBase64Encoded': False
+            }
+
         elif method == 'POST' and resource == 'chats':
             body_data = json.loads(event.get('body', '{}'))
             company_id = body_data.get('company_id')
@@ -984,8 +1669,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     SELECT c.*, 
                            u.first_name || ' ' || u.last_name as employee_name,
                            u.position, u.avatar_url,
-                           (SELECT COUNT(*) FROM t_p65890965_refstaff_project.chat_messages 
-                            WHERE chat_id = c.id AND is_read = false AND sender_id != %s) as unread_count
+                           (SELECT COALESCE(SUM(unread_count), 0) FROM t_p65890965_refstaff_project.chat_unread_counters
+                            WHERE chat_id = c.id AND sender_id != %s) as unread_count
                     FROM t_p65890965_refstaff_project.chats c
                     JOIN t_p65890965_refstaff_project.users u ON c.employee_id = u.id
                     WHERE c.company_id = %s
@@ -996,8 +1681,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 query = """
                     SELECT c.*,
                            comp.name as company_name,
-                           (SELECT COUNT(*) FROM t_p65890965_refstaff_project.chat_messages 
-                            WHERE chat_id = c.id AND is_read = false AND sender_id != %s) as unread_count
+                           (SELECT COALESCE(SUM(unread_count), 0) FROM t_p65890965_refstaff_project.chat_unread_counters
+                            WHERE chat_id = c.id AND sender_id != %s) as unread_count
                     FROM t_p65890965_refstaff_project.chats c
                     JOIN t_p65890965_refstaff_project.companies comp ON c.company_id = comp.id
                     WHERE c.employee_id = %s
@@ -1039,7 +1724,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             attachment_name = None
             attachment_type = None
             attachment_size = None
-            attachment_data_b64 = None
+            attachment_sha256 = None
             
             if body_data.get('attachment_data'):
                 att_data = body_data['attachment_data']
@@ -1050,26 +1735,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 attachment_size = len(file_bytes)
                 
                 try:
-                    ext = att_data.get('name', 'file').rsplit('.', 1)[-1].lower()
-                    key = f"chat-attachments/{uuid.uuid4()}.{ext}"
-                    s3 = boto3.client(
-                        's3',
-                        endpoint_url='https://bucket.poehali.dev',
-                        aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-                        aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
-                    )
-                    s3.put_object(Bucket='files', Key=key, Body=file_bytes, ContentType=content_type)
-                    attachment_url = f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{key}"
-                except Exception:
-                    attachment_data_b64 = f"data:{content_type};base64,{att_data['base64']}"
-                    attachment_url = attachment_data_b64
+                    attachment_url, attachment_sha256 = store_attachment(file_bytes, content_type, att_data.get('name') or 'file')
+                except Exception as e:
+                    print(f"ATTACHMENT UPLOAD ERROR: {str(e)}")
+                    return {
+                        'statusCode': 502,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Не удалось загрузить вложение, попробуйте ещё раз'}),
+                        'isBase64Encoded': False
+                    }
             
             insert_message = """
                 INSERT INTO t_p65890965_refstaff_project.chat_messages 
-                (chat_id, sender_id, message, attachment_url, attachment_name, attachment_type, attachment_size, attachment_data)
+                (chat_id, sender_id, message, attachment_url, attachment_name, attachment_type, attachment_size, attachment_sha256)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 RETURNING id, chat_id, sender_id, message, is_read, created_at,
-                          attachment_url, attachment_name, attachment_type, attachment_size, attachment_data
+                          attachment_url, attachment_name, attachment_type, attachment_size
             """
             cur.execute(insert_message, (
                 body_data.get('chat_id'),
@@ -1079,7 +1760,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 attachment_name,
                 attachment_type,
                 attachment_size,
-                attachment_data_b64
+                attachment_sha256
             ))
             new_message = cur.fetchone()
             
@@ -1087,7 +1768,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 "UPDATE t_p65890965_refstaff_project.chats SET last_message_at = CURRENT_TIMESTAMP WHERE id = %s",
                 (body_data.get('chat_id'),)
             )
-            
+            # Будим long-poll подписчиков чата; autocommit — уведомление уходит сразу
+            cur.execute("SELECT pg_notify(%s, %s)", (chat_channel(new_message['chat_id']), str(new_message['id'])))
+
             return {
                 'statusCode': 201,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -1101,31 +1784,65 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
             # Проверяем что запрашивающий — участник чата (employee или employer той же компании)
             if requester_id:
-                cur.execute("SELECT employee_id, company_id FROM t_p65890965_refstaff_project.chats WHERE id = %s", (chat_id,))
-                chat_row = cur.fetchone()
-                if chat_row:
-                    cur.execute("SELECT company_id, role FROM t_p65890965_refstaff_project.users WHERE id = %s", (requester_id,))
-                    user_row = cur.fetchone()
-                    allowed = False
-                    if user_row:
-                        if str(chat_row['employee_id']) == str(requester_id):
-                            allowed = True
-                        elif user_row['role'] in ('employer', 'admin') and str(user_row['company_id']) == str(chat_row['company_id']):
-                            allowed = True
-                    if not allowed:
-                        return {'statusCode': 403, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'Access denied'}), 'isBase64Encoded': False}
+                cur.execute("SELECT 1 FROM t_p65890965_refstaff_project.chats WHERE id = %s", (chat_id,))
+                if cur.fetchone() and not is_chat_member(cur, requester_id, chat_id):
+                    return {'statusCode': 403, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'Access denied'}), 'isBase64Encoded': False}
 
-            query = """
-                SELECT m.*,
-                       u.first_name || ' ' || u.last_name as sender_name,
-                       u.avatar_url as sender_avatar
-                FROM t_p65890965_refstaff_project.chat_messages m
-                JOIN t_p65890965_refstaff_project.users u ON m.sender_id = u.id
-                WHERE m.chat_id = %s
-                ORDER BY m.created_at ASC
-            """
-            cur.execute(query, (chat_id,))
-            messages = cur.fetchall()
+            # since=<id последнего полученного сообщения> — только новые сообщения;
+            # action=poll — если новых нет, ждём NOTIFY от POST messages до timeout секунд
+            if query_params.get('since') is not None:
+                try:
+                    since_id = int(query_params['since'])
+                    timeout = float(query_params.get('timeout') or MESSAGES_POLL_TIMEOUT)
+                    if not math.isfinite(timeout):
+                        raise ValueError('timeout must be finite')
+                    timeout = min(max(timeout, 0), MESSAGES_POLL_TIMEOUT)
+                    channel = chat_channel(chat_id)
+                except (TypeError, ValueError):
+                    return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'chat_id, since and timeout must be numbers'}), 'isBase64Encoded': False}
+
+                poll = query_params.get('action') == 'poll'
+                if poll:
+                    # Подписываемся до выборки, чтобы не пропустить сообщение между ними
+                    cur.execute(f'LISTEN {channel}')
+                try:
+                    messages = select_messages(cur, 'm.chat_id = %s AND m.id > %s', [chat_id, since_id], 'm.id ASC', f'LIMIT {MESSAGES_SINCE_LIMIT}')
+                    if poll and not messages and wait_for_notify(conn, timeout):
+                        messages = select_messages(cur, 'm.chat_id = %s AND m.id > %s', [chat_id, since_id], 'm.id ASC', f'LIMIT {MESSAGES_SINCE_LIMIT}')
+                finally:
+                    if poll:
+                        cur.execute(f'UNLISTEN {channel}')
+                        conn.notifies.clear()
+
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({
+                        'items': messages,
+                        'last_id': messages[-1]['id'] if messages else since_id,
+                        'has_more': len(messages) == MESSAGES_SINCE_LIMIT
+                    }, default=str),
+                    'isBase64Encoded': False
+                }
+
+            page, page_error = get_page_params(query_params)
+            if page_error:
+                return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': page_error}), 'isBase64Encoded': False}
+
+            where_clause = 'm.chat_id = %s'
+            params = [chat_id]
+            order_by = 'm.created_at ASC'
+            limit_clause = ''
+            if page:
+                # Без курсора отдаём последние сообщения чата, старые — через before
+                condition, cursor_params, order_by, backward = keyset_bounds('m.created_at', 'm.id', 'ASC', page, tail=True)
+                if condition:
+                    where_clause += f' AND {condition}'
+                    params.extend(cursor_params)
+                limit_clause = f"LIMIT {page['limit'] + 1}"
+
+            messages = select_messages(cur, where_clause, params, order_by, limit_clause)
+            result = keyset_page(messages, page, backward) if page else messages
             
             return {
                 'statusCode': 200,
@@ -1133,10 +1850,187 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
-                'body': json.dumps([dict(m) for m in messages], default=str),
+                'body': json.dumps(result, default=str),
                 'isBase64Encoded': False
             }
         
+        elif method == 'GET' and resource == 'attachments':
+            message_id = parse_row_id(query_params.get('message_id'))
+            if message_id is None:
+                return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'message_id must be a positive integer'}), 'isBase64Encoded': False}
+            if not os.environ.get('JWT_SECRET'):
+                # Без секрета ни один токен не проверить — это ошибка конфигурации, а не 401 клиента
+                return {'statusCode': 500, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'JWT_SECRET is not configured'}), 'isBase64Encoded': False}
+            session = session_user(event, query_params)
+            if not session:
+                return {'statusCode': 401, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'Unauthorized'}), 'isBase64Encoded': False}
+            cur.execute(
+                "SELECT chat_id, attachment_url, attachment_data, attachment_name FROM t_p65890965_refstaff_project.chat_messages WHERE id = %s",
+                (message_id,)
+            )
+            att = cur.fetchone()
+            if att and not is_chat_member(cur, session.get('user_id'), att['chat_id']):
+                return {'statusCode': 403, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'Access denied'}), 'isBase64Encoded': False}
+            inline = att and (att['attachment_data'] or (att['attachment_url'] or '').startswith('data:'))
+            if not att or not (inline or att['attachment_url']):
+                return {'statusCode': 404, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'Attachment not found'}), 'isBase64Encoded': False}
+            if not inline:
+                return {'statusCode': 302, 'headers': {'Location': att['attachment_url'], 'Access-Control-Allow-Origin': '*'}, 'body': '', 'isBase64Encoded': False}
+            file_bytes, content_type = parse_data_url(att['attachment_data'] or att['attachment_url'])
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': content_type,
+                    'Content-Disposition': f"inline; filename*=UTF-8''{urllib.parse.quote(att['attachment_name'] or 'file')}",
+                    'Cache-Control': 'private, max-age=86400',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': base64.b64encode(file_bytes).decode(),
+                'isBase64Encoded': True
+            }
+
+        elif method == 'POST' and resource == 'outbox' and action == 'dispatch':
+            # Доставка уведомлений из notification_outbox; вызывать по cron раз в минуту
+            body_data = json.loads(event.get('body') or '{}')
+            if not os.environ.get('ADMIN_SECRET') or body_data.get('admin_secret') != os.environ.get('ADMIN_SECRET'):
+                return {'statusCode': 403, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'forbidden'}), 'isBase64Encoded': False}
+            result = dispatch_outbox(cur, min(int(body_data.get('batch', OUTBOX_BATCH)), 500))
+            cur.execute("SELECT COUNT(*) as cnt FROM t_p65890965_refstaff_project.notification_outbox WHERE status IN ('pending', 'sending')")
+            result['pending'] = cur.fetchone()['cnt']
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps(result),
+                'isBase64Encoded': False
+            }
+
+        elif method == 'POST' and resource == 'attachments' and action == 'migrate':
+            # Переносит вложения, сохранённые base64 в chat_messages, во внешнее хранилище.
+            # Вызывать повторно с after_id = last_id прошлого ответа, пока remaining не станет 0.
+            body_data = json.loads(event.get('body') or '{}')
+            if not os.environ.get('ADMIN_SECRET') or body_data.get('admin_secret') != os.environ.get('ADMIN_SECRET'):
+                return {'statusCode': 403, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'forbidden'}), 'isBase64Encoded': False}
+            batch = body_data.get('batch', ATTACHMENT_MIGRATE_BATCH)
+            if isinstance(batch, bool) or not isinstance(batch, int) or batch < 1:
+                return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'batch must be a positive integer'}), 'isBase64Encoded': False}
+            after_id = parse_after_id(body_data.get('after_id'))
+            if after_id is None:
+                return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'after_id must be a non-negative integer'}), 'isBase64Encoded': False}
+
+            def migrate_attachment(row):
+                file_bytes, content_type = parse_data_url(row['data_url'])
+                url, digest = store_attachment(file_bytes, content_type, row['attachment_name'] or 'file')
+                return url, digest, len(file_bytes)
+
+            result = migrate_batch(
+                cur,
+                """
+                SELECT id, attachment_name, COALESCE(attachment_data, attachment_url) as data_url
+                FROM t_p65890965_refstaff_project.chat_messages
+                WHERE (attachment_data IS NOT NULL OR attachment_url LIKE 'data:%%') AND id > %s
+                ORDER BY id
+                LIMIT %s
+                """,
+                """
+                UPDATE t_p65890965_refstaff_project.chat_messages
+                SET attachment_url = %s, attachment_sha256 = %s, attachment_size = %s, attachment_data = NULL
+                WHERE id = %s
+                """,
+                """
+                SELECT COUNT(*) as cnt FROM t_p65890965_refstaff_project.chat_messages
+                WHERE (attachment_data IS NOT NULL OR attachment_url LIKE 'data:%%') AND id > %s
+                """,
+                migrate_attachment, after_id, min(batch, 100)
+            )
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps(result),
+                'isBase64Encoded': False
+            }
+
+        elif method == 'GET' and resource == 'resumes':
+            recommendation_id = parse_row_id(query_params.get('recommendation_id'))
+            if recommendation_id is None:
+                return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'recommendation_id must be a positive integer'}), 'isBase64Encoded': False}
+            if not os.environ.get('JWT_SECRET'):
+                # Без секрета ни один токен не проверить — это ошибка конфигурации, а не 401 клиента
+                return {'statusCode': 500, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'JWT_SECRET is not configured'}), 'isBase64Encoded': False}
+            session = session_user(event, query_params)
+            if not session:
+                return {'statusCode': 401, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'Unauthorized'}), 'isBase64Encoded': False}
+            cur.execute("""
+                SELECT r.resume_url, r.candidate_name, r.recommended_by, v.company_id
+                FROM t_p65890965_refstaff_project.recommendations r
+                JOIN t_p65890965_refstaff_project.vacancies v ON r.vacancy_id = v.id
+                WHERE r.id = %s
+            """, (recommendation_id,))
+            rec_row = cur.fetchone()
+            if rec_row:
+                # Резюме видят автор рекомендации и employer/admin компании вакансии
+                cur.execute("SELECT company_id, role FROM t_p65890965_refstaff_project.users WHERE id = %s", (session.get('user_id'),))
+                user_row = cur.fetchone()
+                allowed = user_row and (
+                    str(rec_row['recommended_by']) == str(session.get('user_id'))
+                    or (user_row['role'] in ('employer', 'admin') and str(user_row['company_id']) == str(rec_row['company_id']))
+                )
+                if not allowed:
+                    return {'statusCode': 403, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'Access denied'}), 'isBase64Encoded': False}
+            if not rec_row or not rec_row['resume_url']:
+                return {'statusCode': 404, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'Resume not found'}), 'isBase64Encoded': False}
+            if not rec_row['resume_url'].startswith('data:'):
+                return {'statusCode': 302, 'headers': {'Location': rec_row['resume_url'], 'Access-Control-Allow-Origin': '*'}, 'body': '', 'isBase64Encoded': False}
+            file_bytes, content_type = parse_data_url(rec_row['resume_url'])
+            ext = (mimetypes.guess_extension(content_type) or '.bin').lstrip('.')
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': content_type,
+                    'Content-Disposition': f"attachment; filename*=UTF-8''{urllib.parse.quote((rec_row['candidate_name'] or 'resume') + '.' + ext)}",
+                    'Cache-Control': 'private, max-age=86400',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': base64.b64encode(file_bytes).decode(),
+                'isBase64Encoded': True
+            }
+
+        elif method == 'POST' and resource == 'resumes' and action == 'migrate':
+            # Переносит резюме, сохранённые data URL в recommendations.resume_url, в S3.
+            # Вызывать повторно с after_id = last_id прошлого ответа, пока remaining не станет 0.
+            body_data = json.loads(event.get('body') or '{}')
+            if not os.environ.get('ADMIN_SECRET') or body_data.get('admin_secret') != os.environ.get('ADMIN_SECRET'):
+                return {'statusCode': 403, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'forbidden'}), 'isBase64Encoded': False}
+            batch = body_data.get('batch', RESUME_MIGRATE_BATCH)
+            if isinstance(batch, bool) or not isinstance(batch, int) or batch < 1:
+                return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'batch must be a positive integer'}), 'isBase64Encoded': False}
+            after_id = parse_after_id(body_data.get('after_id'))
+            if after_id is None:
+                return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'after_id must be a non-negative integer'}), 'isBase64Encoded': False}
+
+            def migrate_resume(row):
+                file_bytes, content_type = parse_data_url(row['resume_url'])
+                url, _digest = store_attachment(file_bytes, content_type, '', prefix=RESUME_PREFIX)
+                return (url,)
+
+            result = migrate_batch(
+                cur,
+                """
+                SELECT id, resume_url FROM t_p65890965_refstaff_project.recommendations
+                WHERE resume_url LIKE 'data:%%' AND id > %s
+                ORDER BY id
+                LIMIT %s
+                """,
+                "UPDATE t_p65890965_refstaff_project.recommendations SET resume_url = %s WHERE id = %s",
+                "SELECT COUNT(*) as cnt FROM t_p65890965_refstaff_project.recommendations WHERE resume_url LIKE 'data:%%' AND id > %s",
+                migrate_resume, after_id, min(batch, 100)
+            )
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps(result),
+                'isBase64Encoded': False
+            }
+
         elif method == 'GET' and resource == 'stats':
             company_id = query_params.get('company_id', '1')
             
@@ -1165,7 +2059,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps(dict(stats), default=str),
                 'isBase64Encoded': False
             }
-        
+
+        elif method == 'GET' and resource == 'pool':
+            # Внутреннее состояние пула — только для админа, секрет в заголовке (у GET нет тела)
+            headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+            secret = os.environ.get('ADMIN_SECRET')
+            if not secret or not hmac.compare_digest(headers.get('x-admin-secret') or '', secret):
+                return {'statusCode': 403, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'forbidden'}), 'isBase64Encoded': False}
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps(DB_POOL.stats()),
+                'isBase64Encoded': False
+            }
+
         elif method == 'GET' and resource == 'notifications':
             user_id = query_params.get('user_id')
             notifications = []
@@ -1297,129 +2204,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if not company_id:
                 return {'statusCode': 400, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'company_id required'}), 'isBase64Encoded': False}
 
-            vacancy_status = 'all' if role == 'employer' else 'active'
-            vac_where = 'WHERE v.company_id = %s'
-            vac_params = [company_id]
-            if vacancy_status != 'all':
-                vac_where += ' AND v.status = %s'
-                vac_params.append(vacancy_status)
-
-            cur.execute(f"""
-                SELECT v.id, v.title, v.department, v.salary_display, v.status,
-                       v.reward_amount, v.payout_delay_days, v.requirements, v.description, v.motivation,
-                       v.referral_token, v.created_at,
-                       COUNT(r.id) as recommendations_count,
-                       u.first_name || ' ' || u.last_name as created_by_name
-                FROM t_p65890965_refstaff_project.vacancies v
-                LEFT JOIN t_p65890965_refstaff_project.recommendations r ON v.id = r.vacancy_id
-                LEFT JOIN t_p65890965_refstaff_project.users u ON v.created_by = u.id
-                {vac_where}
-                GROUP BY v.id, u.first_name, u.last_name
-                ORDER BY v.created_at DESC
-            """, vac_params)
-            vacancies = [dict(r) for r in cur.fetchall()]
-
-            cur.execute("""
-                SELECT id, first_name, last_name, position, department, level, experience_points,
-                       total_recommendations, successful_hires, total_earnings, wallet_pending,
-                       wallet_balance, avatar_url, email, phone, telegram, vk, is_admin, is_fired
-                FROM t_p65890965_refstaff_project.users
-                WHERE company_id = %s AND role = 'employee'
-                ORDER BY successful_hires DESC, total_recommendations DESC
-            """, (company_id,))
-            employees = [dict(r) for r in cur.fetchall()]
-
-            rec_where = ['v.company_id = %s']
-            rec_params = [company_id]
-            if role == 'employee' and user_id:
-                rec_where.append('r.recommended_by = %s')
-                rec_params.append(user_id)
-            cur.execute(f"""
-                SELECT r.*, v.title as vacancy_title, v.payout_delay_days,
-                       u.first_name || ' ' || u.last_name as recommended_by_name
-                FROM t_p65890965_refstaff_project.recommendations r
-                JOIN t_p65890965_refstaff_project.vacancies v ON r.vacancy_id = v.id
-                JOIN t_p65890965_refstaff_project.users u ON r.recommended_by = u.id
-                WHERE {' AND '.join(rec_where)}
-                ORDER BY r.created_at DESC
-            """, rec_params)
-            recommendations = [dict(r) for r in cur.fetchall()]
-
-            cur.execute("""
-                SELECT id, name, employee_count, invite_token, logo_url, description,
-                       website, industry, inn, telegram, vk, created_at, subscription_tier,
-                       to_char(subscription_expires_at, 'YYYY-MM-DD"T"HH24:MI:SS"Z"') as subscription_expires_at,
-                       payout_methods
-                FROM t_p65890965_refstaff_project.companies WHERE id = %s
-            """, (company_id,))
-            company_row = cur.fetchone()
-            company = dict(company_row) if company_row else None
-
-            news = []
-            archived_filter = "" if role == 'employer' else "AND n.is_archived = false"
-            cur.execute(f"""
-                SELECT n.id, n.title, n.content, n.category, n.created_at, n.updated_at, n.is_archived,
-                       u.first_name || ' ' || u.last_name as author,
-                       (SELECT COUNT(*) FROM t_p65890965_refstaff_project.news_likes WHERE news_id = n.id) as likes,
-                       (SELECT json_agg(json_build_object('id', nc.id, 'author_name', nc.author_name, 'text', nc.text, 'created_at', nc.created_at) ORDER BY nc.created_at ASC)
-                        FROM t_p65890965_refstaff_project.news_comments nc WHERE nc.news_id = n.id) as comments
-                FROM t_p65890965_refstaff_project.news n
-                LEFT JOIN t_p65890965_refstaff_project.users u ON n.author_id = u.id
-                WHERE n.company_id = %s {archived_filter}
-                ORDER BY n.created_at DESC
-            """, (company_id,))
-            news = [dict(r) for r in cur.fetchall()]
-
-            chats = []
-            if role == 'employer' and user_id:
-                cur.execute("""
-                    SELECT c.*, u.first_name || ' ' || u.last_name as employee_name,
-                           u.position, u.avatar_url,
-                           (SELECT COUNT(*) FROM t_p65890965_refstaff_project.chat_messages
-                            WHERE chat_id = c.id AND is_read = false AND sender_id != %s) as unread_count
-                    FROM t_p65890965_refstaff_project.chats c
-                    JOIN t_p65890965_refstaff_project.users u ON c.employee_id = u.id
-                    WHERE c.company_id = %s
-                    ORDER BY c.last_message_at DESC NULLS LAST
-                """, (user_id, company_id))
-                chats = [dict(r) for r in cur.fetchall()]
-
-            payouts = []
-
-            wallet = None
-            if role == 'employee' and user_id:
-                cur.execute("""
-                    SELECT wallet_balance, wallet_pending
-                    FROM t_p65890965_refstaff_project.users WHERE id = %s
-                """, (user_id,))
-                w = cur.fetchone()
-                cur.execute("""
-                    SELECT id, amount, type, description, created_at
-                    FROM t_p65890965_refstaff_project.wallet_transactions
-                    WHERE user_id = %s ORDER BY created_at DESC LIMIT 50
-                """, (user_id,))
-                transactions = [dict(r) for r in cur.fetchall()]
-                cur.execute("""
-                    SELECT id, amount, unlock_date, status
-                    FROM t_p65890965_refstaff_project.pending_payouts
-                    WHERE user_id = %s AND status = 'pending' ORDER BY unlock_date ASC
-                """, (user_id,))
-                pending = [dict(r) for r in cur.fetchall()]
-                wallet = {'wallet': dict(w) if w else {}, 'transactions': transactions, 'pending_payouts': pending}
-
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'vacancies': vacancies,
-                    'employees': employees,
-                    'recommendations': recommendations,
-                    'company': company,
-                    'news': news,
-                    'chats': chats,
-                    'payouts': payouts,
-                    'wallet': wallet,
-                }, default=str),
+                'body': load_dashboard(cur, company_id, user_id, role),
                 'isBase64Encoded': False
             }
 
@@ -1525,7 +2313,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     return {'statusCode': 201, 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}, 'body': json.dumps(dict(row), default=str), 'isBase64Encoded': False}
 
         cur.close()
-        conn.close()
         
         return {
             'statusCode': 404,
@@ -1549,4 +2336,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             },
             'body': json.dumps({'error': str(e)}),
             'isBase64Encoded': False
-        }
\ No newline at end of file
+        }
+    finally:
+        if conn is not None:
+            DB_POOL.release(conn)
\ No newline at end of file
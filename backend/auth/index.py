@@ -14,6 +14,7 @@ from decimal import Decimal
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import urllib.request
+from http_response import http_response
 
 NOTIFY_URL = 'https://functions.poehali.dev/3c081b85-b149-4f98-a70a-f773cb440d06'
 SEND_EMAIL_URL = 'https://functions.poehali.dev/268341d7-c5b3-4c4f-a5fb-50277c318250'
@@ -107,6 +108,7 @@ def verify_jwt(token: str) -> Optional[Dict[str, Any]]:
     except Exception:
         return None
 
+@http_response()
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
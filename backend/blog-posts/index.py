@@ -2,20 +2,49 @@
 Блог: генерация SEO-статей через GPT и публикация на сайте.
 GET  /?action=list            — список опубликованных статей
 GET  /?action=get&slug=...    — получить статью по slug
+GET  /?action=search&q=...    — полнотекстовый поиск по статьям (limit, after — курсор)
 POST /?action=generate        — сгенерировать новую статью (admin)
+POST /?action=cron            — сгенерировать и опубликовать пачку статей (admin)
 POST /?action=delete          — удалить статью (admin)
+POST /?action=relink          — перелинковать ключевые фразы во всём архиве (admin)
 """
+import base64
+import hashlib
 import json
 import os
+import random
 import re
+import threading
+import time
 import urllib.request
 import urllib.error
 import psycopg2
-from datetime import datetime
-
-POLZA_BASE_URL = 'https://api.polza.ai/api/v1'
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from functools import lru_cache
+from email.utils import formatdate, parsedate_to_datetime
+from psycopg2.extras import execute_values
+from http_response import http_response
+
+POLZA_BASE_URL = os.environ.get('POLZA_BASE_URL', 'https://api.polza.ai/api/v1')  # в тестах — локальный фейковый сервер
+GPT_TIMEOUT = 90
 MODEL = 'openai/gpt-4o-mini'
 SCHEMA = os.environ.get('MAIN_DB_SCHEMA', 't_p65890965_refstaff_project')
+RSS_ITEMS = 50
+SITEMAP_MAX_URLS = 50000  # лимит протокола sitemaps.org на один файл
+VIEW_FLUSH_INTERVAL = 5  # секунд: созревший буфер сбрасывает следующий запрос к инстансу
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+SEARCH_QUERY_MAX = 200  # символов в запросе
+SEARCH_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" … "'
+STATS_BULK_MAX = 100  # статей за один запрос ?action=stats_bulk (страница списка)
+VIEW_FLUSH_MAX = 500  # столько уникальных (post_id, session_id) — сбрасываем, не дожидаясь интервала
+VIEW_BUFFER_LIMIT = 2 * VIEW_FLUSH_MAX  # больше просмотров инстанс не держит, даже если БД недоступна
+MAX_POST_ID = 2 ** 31 - 1  # post_id — INTEGER в БД
+CRON_MAX_COUNT = 5  # статей за один вызов ?action=cron
+CRON_CONCURRENCY = 3  # одновременных запросов к GPT
+CRON_ATTEMPTS = 3  # генераций на одно место в пачке, если GPT вернул дубль
+CRON_TIME_BUDGET = int(os.environ.get('BLOG_CRON_TIME_BUDGET', 240))  # секунд на генерацию, остаток — на публикацию
 
 CORS_HEADERS = {
     'Access-Control-Allow-Origin': '*',
@@ -206,12 +235,20 @@ def get_existing_articles(conn) -> tuple:
     return topics, titles
 
 
-def titles_are_similar(title_a: str, title_b: str, threshold: float = 0.55) -> bool:
+STOP_WORDS = {'в', 'и', 'на', 'с', 'по', 'для', 'как', 'что', 'от', 'к', 'о', 'из', 'не', 'или', 'а', 'но'}
+TOPIC_THRESHOLD = 0.45
+TITLE_THRESHOLD = 0.55
+_NON_WORD_RE = re.compile(r'[^а-яёa-z0-9\s]')
+
+
+@lru_cache(maxsize=4096)
+def title_words(text: str) -> frozenset:
+    return frozenset(_NON_WORD_RE.sub('', (text or '').lower()).split()) - STOP_WORDS
+
+
+def titles_are_similar(title_a: str, title_b: str, threshold: float = TITLE_THRESHOLD) -> bool:
     """Простая проверка на схожесть через общие слова (без внешних библиотек)."""
-    STOP_WORDS = {'в', 'и', 'на', 'с', 'по', 'для', 'как', 'что', 'от', 'к', 'о', 'из', 'не', 'или', 'а', 'но'}
-    def words(t):
-        return set(re.sub(r'[^а-яёa-z0-9\s]', '', t.lower()).split()) - STOP_WORDS
-    wa, wb = words(title_a), words(title_b)
+    wa, wb = title_words(title_a), title_words(title_b)
     if not wa or not wb:
         return False
     intersection = wa & wb
@@ -219,6 +256,97 @@ def titles_are_similar(title_a: str, title_b: str, threshold: float = 0.55) -> b
     return len(intersection) / shorter >= threshold
 
 
+class ArticleIndex:
+    """Множества слов всех написанных тем и заголовков с обратными индексами — та же
+    метрика, что titles_are_similar, но без попарного перебора «пул × история».
+
+    Занятость тем пула ведётся инкрементально: новая статья сравнивается только с темами
+    пула, у которых есть общие с ней слова. Индекс живёт в памяти инстанса и дочитывает
+    из БД только статьи с id больше последнего виденного."""
+
+    def __init__(self, pool: list):
+        self.pool = pool
+        self.pool_words = [title_words(t) for t in pool]
+        self.pool_postings = {}
+        for i, words in enumerate(self.pool_words):
+            for word in words:
+                self.pool_postings.setdefault(word, []).append(i)
+        self.taken = [False] * len(pool)
+        # kind ('topic' / 'title') -> [(текст, слова)] и слово -> номера записей
+        self.entries = {'topic': [], 'title': []}
+        self.postings = {'topic': {}, 'title': {}}
+        self.last_id = 0
+        self.count = 0
+
+    def add(self, topic: str, title: str):
+        for kind, text in (('topic', topic), ('title', title)):
+            words = title_words(text)
+            entry_no = len(self.entries[kind])
+            self.entries[kind].append((text, words))
+            for word in words:
+                self.postings[kind].setdefault(word, []).append(entry_no)
+            self._mark_taken(words)
+        self.count += 1
+
+    def _mark_taken(self, words: frozenset):
+        if not words:
+            return
+        common = {}
+        for word in words:
+            for i in self.pool_postings.get(word, ()):
+                common[i] = common.get(i, 0) + 1
+        for i, n in common.items():
+            if n / min(len(words), len(self.pool_words[i])) >= TOPIC_THRESHOLD:
+                self.taken[i] = True
+
+    def free_topics(self) -> list:
+        return [t for t, taken in zip(self.pool, self.taken) if not taken]
+
+    def find_similar(self, kind: str, text: str, threshold: float) -> str | None:
+        """Первая (по порядку вставки) запись kind, похожая на text, или None."""
+        words = title_words(text)
+        if not words:
+            return None
+        common = {}
+        for word in words:
+            for entry_no in self.postings[kind].get(word, ()):
+                common[entry_no] = common.get(entry_no, 0) + 1
+        entries = self.entries[kind]
+        for entry_no in sorted(common):
+            entry_text, entry_words = entries[entry_no]
+            if common[entry_no] / min(len(words), len(entry_words)) >= threshold:
+                return entry_text
+        return None
+
+
+_article_index = None
+_article_index_year = None
+
+
+def get_article_index(conn) -> ArticleIndex:
+    """Индекс статей, догнанный до текущего состояния blog_posts.
+    Если после дочитывания число статей не сходится (были удаления), индекс строится заново."""
+    global _article_index, _article_index_year
+    year = datetime.utcnow().year
+    if _article_index is None or _article_index_year != year:
+        _article_index = ArticleIndex([t.format(year=year) for t in TOPIC_POOLS])
+        _article_index_year = year
+    query = f'SELECT id, topic, title FROM {SCHEMA}.blog_posts WHERE id > %s ORDER BY id'
+    with conn.cursor() as cur:
+        cur.execute(f'SELECT COUNT(*) FROM {SCHEMA}.blog_posts')
+        total = cur.fetchone()[0]
+        cur.execute(query, (_article_index.last_id,))
+        rows = cur.fetchall()
+        if _article_index.count + len(rows) != total:
+            _article_index = ArticleIndex(_article_index.pool)
+            cur.execute(query, (0,))
+            rows = cur.fetchall()
+    for post_id, topic, title in rows:
+        _article_index.add(topic or '', title or '')
+        _article_index.last_id = post_id
+    return _article_index
+
+
 def call_gpt(prompt: str) -> str:
     api_key = os.environ['POLZA_AI_API_KEY']
     payload = {
@@ -234,7 +362,7 @@ def call_gpt(prompt: str) -> str:
         headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {api_key}'},
         method='POST'
     )
-    with urllib.request.urlopen(req, timeout=90) as r:
+    with urllib.request.urlopen(req, timeout=GPT_TIMEOUT) as r:
         result = json.loads(r.read())
     return result['choices'][0]['message']['content']
 
@@ -243,41 +371,112 @@ def fix_encoding(text: str) -> str:
     """Убирает символы-заменители (U+FFFD и похожие) которые появляются
     при обрезке UTF-8 на границе многобайтового символа."""
     # Убираем все Unicode replacement characters (одиночные и в группах)
-    text = re.sub(r'\ufffd+', '', text)
+    if '\ufffd' in text:
+        text = re.sub(r'\ufffd+', '', text)
     return text
 
 
+# Один проход regex по статье: останавливается только на ключевых фразах, готовых ссылках
+# <a>…</a> и комментариях; обычные теги пропускаются движком regex без Python-кода
+KEY_PHRASE_URLS = {phrase.lower(): url for phrase, url in reversed(KEY_PHRASES)}
+_KEY_PHRASE_ALT = '|'.join(re.escape(p) for p in sorted(KEY_PHRASE_URLS, key=len, reverse=True))
+KEY_PHRASE_RE = re.compile(_KEY_PHRASE_ALT, re.IGNORECASE)
+# Опережающая проверка первого символа: на остальных позициях движок не перебирает альтернативы
+_LINK_SCAN_FIRST = re.escape(''.join(sorted({c for p in KEY_PHRASE_URLS for c in (p[0], p[0].upper())} | {'<'})))
+_LINK_SCAN = (rf'(?=[{_LINK_SCAN_FIRST}])'
+              rf'(?:(?P<anchor><a[\s>].*?</a\s*>)|(?P<comment><!--.*?-->)|(?P<phrase>{_KEY_PHRASE_ALT}))')
+# Статья сканируется в нижнем регистре без IGNORECASE — так движок быстрее отбрасывает
+# позиции; регистронезависимый вариант нужен, только если lower() изменил длину текста
+LINK_SCAN_RE = re.compile(_LINK_SCAN, re.DOTALL)
+LINK_SCAN_ICASE_RE = re.compile(_LINK_SCAN, re.IGNORECASE | re.DOTALL)
+HTML_TAG_RE = re.compile(r'<[^>]*>')
+RELINK_BATCH = 200
+RELINK_TIME_BUDGET = 20  # секунд на один вызов ?action=relink; дальше — с after_id из ответа
+
+
 def inject_links(content: str) -> str:
-    """Вшивает ссылки в первые вхождения ключевых фраз. Сначала чистит артефакты кодировки."""
+    """Вшивает ссылки в первые вхождения ключевых фраз. Сначала чистит артефакты кодировки.
+    Атрибуты тегов, комментарии и текст внутри <a> не трогаются; фраза, уже стоящая в ссылке,
+    считается использованной — повторный прогон по статье ничего не меняет."""
     content = fix_encoding(content)
+    lowered = content.lower()
+    if not any(phrase in lowered for phrase in KEY_PHRASE_URLS):
+        return content
+    scan_text, scan_re = (lowered, LINK_SCAN_RE) if len(lowered) == len(content) else (content, LINK_SCAN_ICASE_RE)
     used = set()
-    for phrase, url in KEY_PHRASES:
-        if phrase in used:
+    out = []
+    pos = 0
+    for m in scan_re.finditer(scan_text):
+        if m.group('anchor') is not None:
+            inner_text = HTML_TAG_RE.sub(' ', m.group('anchor'))
+            used.update(p.group(0).lower() for p in KEY_PHRASE_RE.finditer(inner_text))
+            continue
+        if m.group('comment') is not None:
             continue
-        pattern = re.compile(re.escape(phrase), re.IGNORECASE)
-        def replacer(m, p=phrase, u=url, _used=used):
-            if p in _used:
-                return m.group(0)
-            _used.add(p)
-            return f'<a href="{u}" class="text-primary hover:underline font-medium">{m.group(0)}</a>'
-        content = pattern.sub(replacer, content, count=1)
-    return content
-
-
-def generate_article(existing_topics: list, existing_titles: list) -> dict:
-    import random
+        phrase = m.group('phrase').lower()
+        # Внутри тега (например, alt="…"): ближайшая слева '<' стоит после ближайшей '>'
+        if phrase in used or content.rfind('<', 0, m.start()) > content.rfind('>', 0, m.start()):
+            continue
+        used.add(phrase)
+        out.append(content[pos:m.start()])
+        out.append(f'<a href="{KEY_PHRASE_URLS[phrase]}" class="text-primary hover:underline font-medium">'
+                   f'{content[m.start():m.end()]}</a>')
+        pos = m.end()
+        if len(used) == len(KEY_PHRASE_URLS):
+            break
+    out.append(content[pos:])
+    return ''.join(out)
+
+
+def relink_archive(conn, after_id: int, dry_run: bool) -> dict:
+    """Прогоняет inject_links по всем статьям пачками по id; пишет только изменившиеся.
+    Укладывается в RELINK_TIME_BUDGET — незавершённый проход продолжается с after_id."""
+    started = time.monotonic()
+    scanned = updated = 0
+    done = False
+    while time.monotonic() - started < RELINK_TIME_BUDGET:
+        with conn.cursor() as cur:
+            cur.execute(
+                f'SELECT id, content FROM {SCHEMA}.blog_posts WHERE id > %s ORDER BY id LIMIT %s',
+                (after_id, RELINK_BATCH)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                done = True
+                break
+            changed = []
+            for post_id, content in rows:
+                relinked = inject_links(content or '')
+                if relinked != (content or ''):
+                    changed.append((post_id, relinked))
+            if changed and not dry_run:
+                execute_values(
+                    cur,
+                    f'UPDATE {SCHEMA}.blog_posts AS bp SET content = v.content '
+                    f'FROM (VALUES %s) AS v (id, content) WHERE bp.id = v.id',
+                    changed
+                )
+        scanned += len(rows)
+        updated += len(changed)
+        after_id = rows[-1][0]
+    return {'scanned': scanned, 'updated': updated, 'after_id': after_id, 'done': done, 'dry_run': dry_run}
+
+
+def pick_topic_hints(index: ArticleIndex, n: int) -> list:
+    """n подсказок из свободных тем пула, по возможности разных.
+    Нечёткое сравнение: тема из пула считается "занятой", если она похожа
+    на любую уже написанную тему или заголовок (GPT переформулирует темы своими словами)"""
+    available = index.free_topics() or index.pool
+    hints = random.sample(available, min(n, len(available)))
+    return hints + random.choices(available, k=n - len(hints))
+
+
+def generate_article(existing_topics: list, existing_titles: list, index: ArticleIndex, topic_hint: str | None = None) -> dict:
+    """Индекс только читается, поэтому функцию можно звать из нескольких потоков,
+    передавая каждому свою подсказку topic_hint."""
     current_year = datetime.utcnow().year
-    all_topics = [t.format(year=current_year) for t in TOPIC_POOLS]
-    # Нечёткое сравнение: тема из пула считается "занятой", если она похожа
-    # на любую уже написанную тему или заголовок (GPT переформулирует темы своими словами)
-    available = [
-        t for t in all_topics
-        if not any(titles_are_similar(t, existing, threshold=0.45) for existing in existing_topics)
-        and not any(titles_are_similar(t, existing, threshold=0.45) for existing in existing_titles)
-    ]
-    if not available:
-        available = all_topics
-    topic_hint = random.choice(available)
+    if topic_hint is None:
+        topic_hint = pick_topic_hints(index, 1)[0]
     existing_topics_str = '\n'.join(f'- {t}' for t in existing_topics) if existing_topics else 'нет'
     existing_titles_str = '\n'.join(f'- {t}' for t in existing_titles) if existing_titles else 'нет'
 
@@ -332,6 +531,139 @@ def generate_article(existing_topics: list, existing_titles: list) -> dict:
     return json.loads(raw)
 
 
+def save_draft(conn, article: dict) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            f'INSERT INTO {SCHEMA}.blog_post_drafts (topic, title, meta_description, content) '
+            f'VALUES (%s, %s, %s, %s)',
+            (article['topic'], article['title'], article['metaDescription'], article['content'])
+        )
+
+
+def generate_drafts(conn, count: int, deadline: float) -> list:
+    """Догенерирует черновики до count штук: до CRON_CONCURRENCY запросов к GPT одновременно,
+    у каждого своя подсказка темы. Принятая статья сразу пишется в blog_post_drafts, так что
+    таймаут функции теряет только те ответы GPT, что ещё не пришли. Возвращает ошибки по местам пачки."""
+    with conn.cursor() as cur:
+        cur.execute(f'SELECT topic, title FROM {SCHEMA}.blog_post_drafts')
+        drafts = cur.fetchall()
+    needed = count - len(drafts)
+    if needed <= 0:
+        return []
+
+    existing_topics, existing_titles = get_existing_articles(conn)
+    article_index = get_article_index(conn)
+    # Заголовки этой пачки и недопубликованных черновиков: параллельные запросы не видят ответов друг друга
+    batch_index = ArticleIndex([])
+    for topic, title in drafts:
+        batch_index.add(topic, title)
+    hints = pick_topic_hints(article_index, needed * CRON_ATTEMPTS)
+
+    errors = []
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers=min(CRON_CONCURRENCY, needed))
+
+    def submit(attempt: int):
+        future = executor.submit(generate_article, existing_topics, existing_titles, article_index, hints.pop())
+        pending[future] = attempt
+
+    try:
+        for _ in range(needed):
+            submit(1)
+        while pending:
+            done, _ = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                errors.extend({'ok': False, 'error': f'timeout: GPT не ответил за {CRON_TIME_BUDGET} с'} for _ in pending)
+                break
+            for future in done:
+                attempt = pending.pop(future)
+                try:
+                    article = future.result()
+                    dup = (
+                        article_index.find_similar('title', article['title'], TITLE_THRESHOLD)
+                        or batch_index.find_similar('title', article['title'], TITLE_THRESHOLD)
+                    )
+                    if not dup:
+                        article['content'] = inject_links(article['content'])
+                        save_draft(conn, article)
+                        batch_index.add(article['topic'], article['title'])
+                        continue
+                except Exception as e:
+                    errors.append({'ok': False, 'error': str(e)})
+                    continue
+                if attempt < CRON_ATTEMPTS and time.monotonic() < deadline:
+                    submit(attempt + 1)
+                else:
+                    errors.append({'ok': False, 'error': f'duplicate_title после {attempt} попыток: "{dup}"'})
+    finally:
+        # Не дожидаемся запросов, вышедших за бюджет: их места доберёт следующий вызов cron
+        executor.shutdown(wait=False, cancel_futures=True)
+    return errors
+
+
+def publish_drafts(conn) -> tuple:
+    """Переносит черновики в blog_posts одной транзакцией: занятые slug и заголовки — одним
+    запросом, вставка — пачкой. Возвращает (опубликованные статьи, отброшенные точные дубли)."""
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f'SELECT id, topic, title, meta_description, content FROM {SCHEMA}.blog_post_drafts '
+                f'ORDER BY id FOR UPDATE'
+            )
+            drafts = cur.fetchall()
+            if not drafts:
+                conn.commit()
+                return [], []
+            bases = {draft[0]: slugify(draft[1]) for draft in drafts}
+            cur.execute(
+                f'SELECT slug, NULL FROM {SCHEMA}.blog_posts WHERE slug LIKE ANY(%s) '
+                f'UNION ALL SELECT NULL, title FROM {SCHEMA}.blog_posts WHERE title = ANY(%s)',
+                ([f'{base}%' for base in set(bases.values())], [draft[2] for draft in drafts])
+            )
+            taken_slugs, taken_titles = set(), set()
+            for slug, title in cur.fetchall():
+                if slug is not None:
+                    taken_slugs.add(slug)
+                else:
+                    taken_titles.add(title)
+
+            rows, draft_by_slug, done_ids, skipped = [], {}, [], []
+            for draft_id, topic, title, meta_description, content in drafts:
+                if title in taken_titles:
+                    skipped.append({'ok': False, 'error': 'duplicate_title: точное совпадение'})
+                    done_ids.append(draft_id)
+                    continue
+                taken_titles.add(title)
+                slug = slug_base = bases[draft_id]
+                i = 1
+                while slug in taken_slugs:
+                    slug = f'{slug_base}-{i}'
+                    i += 1
+                taken_slugs.add(slug)
+                draft_by_slug[slug] = draft_id
+                rows.append((slug, title, meta_description, content, topic))
+
+            # slug мог занять параллельный ?action=generate — такой черновик останется до следующего вызова
+            inserted = execute_values(
+                cur,
+                f'INSERT INTO {SCHEMA}.blog_posts (slug, title, meta_description, content, topic) VALUES %s '
+                f'ON CONFLICT (slug) DO NOTHING RETURNING id, slug, title',
+                rows, page_size=len(rows), fetch=True
+            ) if rows else []
+            done_ids.extend(draft_by_slug[slug] for _, slug, _ in inserted)
+            cur.execute(f'DELETE FROM {SCHEMA}.blog_post_drafts WHERE id = ANY(%s)', (done_ids,))
+            enqueue_og_pages(cur, [slug for _, slug, _ in inserted])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+    published = [{'id': post_id, 'slug': slug, 'title': title, 'ok': True} for post_id, slug, title in inserted]
+    return published, skipped
+
+
 def notify_indexnow(urls: list[str]) -> None:
     """Отправляет список URL в IndexNow (Яндекс + Bing) для мгновенной индексации."""
     key = os.environ.get('INDEXNOW_KEY', '')
@@ -359,6 +691,377 @@ def notify_indexnow(urls: list[str]) -> None:
             pass
 
 
+def enqueue_og_pages(cur, slugs: list[str]) -> None:
+    """Ставит пересборку OG-страниц статей в notification_outbox (kind 'og_page') — в той же
+    транзакции, что и публикация/удаление. Доставляет dispatcher outbox в api с повторами;
+    пока страницы нет в хранилище, og-proxy строит её на лету."""
+    if slugs:
+        execute_values(
+            cur,
+            f'INSERT INTO {SCHEMA}.notification_outbox (kind, payload) VALUES %s',
+            [('og_page', json.dumps({'type': 'blog', 'id': slug})) for slug in slugs]
+        )
+
+
+def encode_search_cursor(rank: float, post_id: int) -> str:
+    raw = json.dumps([rank, post_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_search_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        rank, post_id = json.loads(raw)
+        return float(rank), int(post_id)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+
+def search_posts(conn, query: str, limit: int, after: tuple | None) -> tuple:
+    """Опубликованные статьи по релевантности: GIN-индекс по search_vector, ts_rank,
+    keyset-пагинация по (rank, id). Сниппеты ts_headline строятся только для отданной страницы.
+    Возвращает (статьи, курсор следующей страницы или None)."""
+    # ts_rank возвращает real: курсор сравниваем тоже как real, иначе граничная статья повторится
+    condition = 'AND (ts_rank(p.search_vector, q.query), p.id) < (%s::real, %s)' if after else ''
+    with conn.cursor() as cur:
+        cur.execute(
+            f'SELECT r.id, r.slug, r.title, r.meta_description, r.topic, r.published_at, r.rank, '
+            f"ts_headline('russian', regexp_replace(r.content, '<[^>]+>', ' ', 'g'), r.query, %s) "
+            f'FROM ('
+            f'  SELECT p.id, p.slug, p.title, p.meta_description, p.topic, p.published_at, p.content, q.query, '
+            f'         ts_rank(p.search_vector, q.query) AS rank '
+            f"  FROM {SCHEMA}.blog_posts p, websearch_to_tsquery('russian', %s) AS q(query) "
+            f'  WHERE p.is_published = TRUE AND p.search_vector @@ q.query {condition} '
+            f'  ORDER BY rank DESC, p.id DESC LIMIT %s'
+            f') r ORDER BY r.rank DESC, r.id DESC',
+            (SEARCH_HEADLINE_OPTIONS, query, *(after or ()), limit + 1)
+        )
+        rows = cur.fetchall()
+    posts = [
+        {'id': r[0], 'slug': r[1], 'title': fix_encoding(r[2] or ''), 'metaDescription': fix_encoding(r[3] or ''),
+         'topic': r[4], 'publishedAt': r[5].isoformat() if r[5] else None, 'snippet': fix_encoding(r[7] or '')}
+        for r in rows[:limit]
+    ]
+    next_cursor = encode_search_cursor(rows[limit - 1][6], rows[limit - 1][0]) if len(rows) > limit else None
+    return posts, next_cursor
+
+
+def xml_escape(s):
+    return (s or '').replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def build_rss(rows: list) -> str:
+    # lastBuildDate — публикация самой свежей статьи, а не время сборки: пересборка без новых
+    # статей даёт тот же документ, и ETag/Last-Modified в blog_feeds не меняются
+    dates = [row[4] for row in rows if row[4]]
+    built_rfc = (max(dates) if dates else datetime(2026, 1, 1)).strftime('%a, %d %b %Y %H:%M:%S +0000')
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/" xmlns:atom="http://www.w3.org/2005/Atom">',
+        '  <channel>',
+        f'    <title>{BRAND} — блог об HR и рекрутинге</title>',
+        f'    <link>{SITE_URL}/blog</link>',
+        f'    <description>Статьи о реферальном рекрутинге, HR-аналитике и подборе персонала</description>',
+        '    <language>ru</language>',
+        f'    <lastBuildDate>{built_rfc}</lastBuildDate>',
+        f'    <atom:link href="{SITE_URL}/blog/rss.xml" rel="self" type="application/rss+xml"/>',
+    ]
+    for slug, title, meta_description, content, published_at in rows:
+        pub_date = published_at.strftime('%a, %d %b %Y %H:%M:%S +0000') if published_at else built_rfc
+        lines += [
+            '    <item>',
+            f'      <title>{xml_escape(title)}</title>',
+            f'      <link>{SITE_URL}/blog/{slug}</link>',
+            f'      <guid isPermaLink="true">{SITE_URL}/blog/{slug}</guid>',
+            f'      <pubDate>{pub_date}</pubDate>',
+            f'      <description>{xml_escape(meta_description or "")}</description>',
+            f'      <content:encoded><![CDATA[{content or ""}]]></content:encoded>',
+            '    </item>',
+        ]
+    lines += ['  </channel>', '</rss>']
+    return '\n'.join(lines)
+
+
+def build_urlset(rows: list) -> str:
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for slug, published_at in rows:
+        lastmod = published_at.strftime('%Y-%m-%d') if published_at else '2026-01-01'
+        lines.append(
+            f'  <url>'
+            f'<loc>https://i-hunt.ru/blog/{slug}</loc>'
+            f'<lastmod>{lastmod}</lastmod>'
+            f'<changefreq>monthly</changefreq>'
+            f'<priority>0.7</priority>'
+            f'</url>'
+        )
+    lines.append('</urlset>')
+    return '\n'.join(lines)
+
+
+def build_sitemaps(rows: list) -> dict:
+    """{'sitemap': ...} — один urlset; сверх SITEMAP_MAX_URLS — sitemapindex и части 'sitemap-N'.
+    Части адресуются на домене сайта (/blog/sitemap/N, прокси в public/_redirects): поисковики
+    принимают из sitemapindex только URL того же хоста, что и сам индекс."""
+    if len(rows) <= SITEMAP_MAX_URLS:
+        return {'sitemap': build_urlset(rows)}
+    feeds = {}
+    index_lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                   '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for n, start in enumerate(range(0, len(rows), SITEMAP_MAX_URLS), 1):
+        shard = rows[start:start + SITEMAP_MAX_URLS]
+        feeds[f'sitemap-{n}'] = build_urlset(shard)
+        # Строки отсортированы по убыванию даты — первая в части и есть её lastmod
+        lastmod = shard[0][1].strftime('%Y-%m-%d') if shard[0][1] else '2026-01-01'
+        index_lines.append(
+            f'  <sitemap><loc>{SITE_URL}/blog/sitemap/{n}</loc>'
+            f'<lastmod>{lastmod}</lastmod></sitemap>'
+        )
+    index_lines.append('</sitemapindex>')
+    feeds['sitemap'] = '\n'.join(index_lines)
+    return feeds
+
+
+def rebuild_feeds(conn) -> None:
+    """Пересобирает RSS и sitemap в blog_feeds одной транзакцией.
+    Вызывается после генерации и удаления статей — GET-запросы только читают готовое."""
+    now = datetime.utcnow().replace(microsecond=0)
+    with conn.cursor() as cur:
+        cur.execute(
+            f'SELECT slug, title, meta_description, content, published_at FROM {SCHEMA}.blog_posts '
+            f'WHERE is_published=TRUE ORDER BY published_at DESC LIMIT %s',
+            (RSS_ITEMS,)
+        )
+        feeds = {'rss': build_rss(cur.fetchall())}
+        cur.execute(
+            f'SELECT slug, published_at FROM {SCHEMA}.blog_posts '
+            f'WHERE is_published=TRUE ORDER BY published_at DESC'
+        )
+        feeds.update(build_sitemaps(cur.fetchall()))
+
+    rows = [(name, body, hashlib.sha256(body.encode('utf-8')).hexdigest()[:32], now) for name, body in feeds.items()]
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            # Неизменившиеся артефакты сохраняют ETag и Last-Modified — у клиентов остаётся валидный кеш
+            execute_values(
+                cur,
+                f'INSERT INTO {SCHEMA}.blog_feeds (name, body, etag, updated_at) VALUES %s '
+                f'ON CONFLICT (name) DO UPDATE SET body = EXCLUDED.body, etag = EXCLUDED.etag, updated_at = EXCLUDED.updated_at '
+                f'WHERE blog_feeds.etag <> EXCLUDED.etag',
+                rows
+            )
+            cur.execute(f'DELETE FROM {SCHEMA}.blog_feeds WHERE name <> ALL(%s)', (list(feeds),))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+
+class ViewBuffer:
+    """Просмотры, ещё не записанные в БД: {post_id: {session_id, ...}}.
+    Фоновых потоков у функции нет (инстанс замораживается между вызовами),
+    поэтому сбрасывает буфер очередной запрос, заставший его «созревшим».
+
+    Сколько можно потерять: пока к инстансу идут запросы, буфер не старше VIEW_FLUSH_INTERVAL.
+    Если запросов больше нет, несброшенные просмотры лежат в памяти, пока инстанс не выгрузят,
+    и пропадают вместе с ним — при работающей БД это меньше VIEW_FLUSH_MAX, при недоступной —
+    до VIEW_BUFFER_LIMIT (сверх него add() просмотры не принимает)."""
+
+    def __init__(self):
+        self._pending = {}
+        self._size = 0
+        self._since = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, post_id: int, session_id: str) -> bool:
+        """False — буфер заполнен до VIEW_BUFFER_LIMIT, просмотр не учтён."""
+        with self._lock:
+            sessions = self._pending.get(post_id, ())
+            if session_id in sessions:
+                return True
+            if self._size >= VIEW_BUFFER_LIMIT:
+                return False
+            if not self._size:
+                self._since = time.monotonic()
+            self._pending.setdefault(post_id, set()).add(session_id)
+            self._size += 1
+            return True
+
+    def pending(self, post_id: int) -> int:
+        with self._lock:
+            return len(self._pending.get(post_id, ()))
+
+    def due(self) -> bool:
+        return self._size >= VIEW_FLUSH_MAX or (self._size and time.monotonic() - self._since >= VIEW_FLUSH_INTERVAL)
+
+    def take(self) -> list:
+        with self._lock:
+            rows = [(post_id, session_id) for post_id, sessions in self._pending.items() for session_id in sessions]
+            self._pending = {}
+            self._size = 0
+            return rows
+
+    def put_back(self, rows: list) -> int:
+        """Возвращает в буфер строки неудавшегося сброса, сколько влезет; отдаёт число потерянных."""
+        return sum(1 for post_id, session_id in rows if not self.add(post_id, session_id))
+
+
+VIEW_BUFFER = ViewBuffer()
+
+
+def flush_views(conn) -> int:
+    """Пишет накопленные просмотры одной транзакцией; счётчики растут только на новые пары."""
+    rows = VIEW_BUFFER.take()
+    if not rows:
+        return 0
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            # Просмотры несуществующих статей отсеиваются JOIN'ом, а не копятся в счётчиках
+            inserted = execute_values(
+                cur,
+                f'INSERT INTO {SCHEMA}.blog_post_views (post_id, session_id) '
+                f'SELECT v.post_id, v.session_id FROM (VALUES %s) AS v (post_id, session_id) '
+                f'JOIN {SCHEMA}.blog_posts bp ON bp.id = v.post_id '
+                f'ON CONFLICT DO NOTHING RETURNING post_id',
+                rows, page_size=len(rows), fetch=True
+            )
+            added = {}
+            for (post_id,) in inserted:
+                added[post_id] = added.get(post_id, 0) + 1
+            if added:
+                execute_values(
+                    cur,
+                    f'INSERT INTO {SCHEMA}.blog_post_view_counts (post_id, views) VALUES %s '
+                    f'ON CONFLICT (post_id) DO UPDATE SET views = blog_post_view_counts.views + EXCLUDED.views',
+                    sorted(added.items())
+                )
+        conn.commit()
+    except (psycopg2.DataError, psycopg2.IntegrityError):
+        # Повтор с теми же строками упадёт так же — пачку не возвращаем, чтобы не застрять на ней
+        conn.rollback()
+        print(f'blog views flush: dropped {len(rows)} rows')
+        raise
+    except Exception:
+        conn.rollback()
+        lost = VIEW_BUFFER.put_back(rows)
+        if lost:
+            print(f'blog views flush: buffer full, dropped {lost} rows')
+        raise
+    finally:
+        conn.autocommit = True
+    return sum(added.values())
+
+
+def flush_views_if_due(conn):
+    if VIEW_BUFFER.due():
+        try:
+            flush_views(conn)
+        except Exception as e:
+            print(f'blog views flush failed: {e}')
+
+
+def parse_post_id(value):
+    """post_id из запроса (строка или число) в пределах INTEGER; None — невалидный."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+    text = str(value).strip()
+    if not text.isdigit() or len(text) > 10:
+        return None
+    post_id = int(text)
+    return post_id if 1 <= post_id <= MAX_POST_ID else None
+
+
+def stored_views(cur, post_id) -> int:
+    try:
+        cur.execute(f'SELECT views FROM {SCHEMA}.blog_post_view_counts WHERE post_id=%s', (post_id,))
+    except psycopg2.Error as e:
+        # Счётчик — вспомогательные данные: без него статья отдаётся с ожидающими просмотрами
+        print(f'blog views read failed: {e}')
+        cur.connection.rollback()
+        return 0
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def reaction_tallies(cur, post_ids: list) -> dict:
+    """{post_id: {emoji: count}} из blog_post_reaction_counts (ведутся триггерами)."""
+    cur.execute(
+        f'SELECT post_id, emoji, reaction_count FROM {SCHEMA}.blog_post_reaction_counts '
+        f'WHERE post_id = ANY(%s) AND reaction_count > 0',
+        (post_ids,)
+    )
+    tallies = {post_id: {} for post_id in post_ids}
+    for post_id, emoji, count in cur.fetchall():
+        tallies[post_id][emoji] = count
+    return tallies
+
+
+def refresh_feeds(conn) -> None:
+    """Пересборка после публикации/удаления: статья уже сохранена, сбой ленты её не откатывает."""
+    try:
+        rebuild_feeds(conn)
+    except Exception as e:
+        print(f'blog feeds rebuild failed: {e}')
+
+
+def serve_feed(conn, name: str, content_type: str, headers: dict) -> dict:
+    """Отдаёт готовый артефакт с ETag/Last-Modified; 304, если у клиента актуальная копия."""
+    with conn.cursor() as cur:
+        cur.execute(f'SELECT body, etag, updated_at FROM {SCHEMA}.blog_feeds WHERE name=%s', (name,))
+        row = cur.fetchone()
+    if row is None and name in ('rss', 'sitemap'):
+        # Первое обращение после миграции — собираем лениво
+        rebuild_feeds(conn)
+        with conn.cursor() as cur:
+            cur.execute(f'SELECT body, etag, updated_at FROM {SCHEMA}.blog_feeds WHERE name=%s', (name,))
+            row = cur.fetchone()
+    if row is None:
+        return {'statusCode': 404, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'not found'})}
+
+    body, etag, updated_at = row
+    updated_at = updated_at.replace(tzinfo=timezone.utc)
+    cache_headers = {
+        **CORS_HEADERS,
+        'ETag': f'"{etag}"',
+        'Last-Modified': formatdate(updated_at.timestamp(), usegmt=True),
+        'Cache-Control': 'public, max-age=300',
+    }
+    request_headers = {k.lower(): v for k, v in headers.items()}
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is not None:
+        not_modified = f'"{etag}"' in [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+    else:
+        try:
+            not_modified = updated_at <= parsedate_to_datetime(request_headers.get('if-modified-since', ''))
+        except (TypeError, ValueError):
+            not_modified = False
+    if not_modified:
+        return {'statusCode': 304, 'headers': cache_headers, 'body': ''}
+    return {'statusCode': 200, 'headers': {**cache_headers, 'Content-Type': content_type}, 'body': body}
+
+
+# action → Cache-Control для GET; rss и sitemap задают свой в serve_feed
+CACHE_POLICIES = {
+    'list': 'public, max-age=60',
+    'get': 'public, max-age=60',
+    'search': 'public, max-age=60',
+    'list_with_views': 'private, no-cache',
+    'generate': 'no-store',  # GET для cron-job.org создаёт статью
+}
+
+
+def cache_policy(event: dict) -> str:
+    if event.get('httpMethod') != 'GET':
+        return 'no-store'
+    action = (event.get('queryStringParameters') or {}).get('action', 'list')
+    return CACHE_POLICIES.get(action, 'no-cache')
+
+
+@http_response(cache_policy)
 def handler(event: dict, context) -> dict:
     if event.get('httpMethod') == 'OPTIONS':
         return {'statusCode': 200, 'headers': CORS_HEADERS, 'body': ''}
@@ -384,6 +1087,7 @@ def handler(event: dict, context) -> dict:
     )
 
     conn = get_db()
+    flush_views_if_due(conn)
 
     # GET: список статей
     if method == 'GET' and action == 'list':
@@ -411,6 +1115,23 @@ def handler(event: dict, context) -> dict:
             'body': json.dumps({'posts': posts, 'total': total, 'page': page, 'perPage': per_page})
         }
 
+    # GET: поиск — ?action=search&q=...&limit=10, следующая страница — &after=<nextCursor>
+    if method == 'GET' and action == 'search':
+        query = (params.get('q') or '').strip()
+        if not query or len(query) > SEARCH_QUERY_MAX:
+            return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': f'q: от 1 до {SEARCH_QUERY_MAX} символов'})}
+        try:
+            limit = max(1, min(int(params.get('limit') or SEARCH_DEFAULT_LIMIT), SEARCH_MAX_LIMIT))
+            after = decode_search_cursor(params['after']) if params.get('after') else None
+        except ValueError as e:
+            return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': str(e)})}
+        posts, next_cursor = search_posts(conn, query, limit, after)
+        return {
+            'statusCode': 200,
+            'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
+            'body': json.dumps({'posts': posts, 'nextCursor': next_cursor, 'limit': limit})
+        }
+
     # GET: одна статья по slug
     if method == 'GET' and action == 'get':
         slug = params.get('slug', '')
@@ -440,15 +1161,16 @@ def handler(event: dict, context) -> dict:
             return {'statusCode': 403, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'forbidden'})}
 
         existing_topics, existing_titles = get_existing_articles(conn)
+        article_index = get_article_index(conn)
 
         # До 5 попыток генерации, если GPT вернул похожую тему или заголовок
         article = None
         last_duplicate = None
         for _attempt in range(5):
-            candidate = generate_article(existing_topics, existing_titles)
+            candidate = generate_article(existing_topics, existing_titles, article_index)
             duplicate_of = (
-                next((t for t in existing_titles if titles_are_similar(candidate['title'], t)), None)
-                or next((t for t in existing_topics if titles_are_similar(candidate['topic'], t, threshold=0.45)), None)
+                article_index.find_similar('title', candidate['title'], TITLE_THRESHOLD)
+                or article_index.find_similar('topic', candidate['topic'], TOPIC_THRESHOLD)
             )
             if not duplicate_of:
                 article = candidate
@@ -493,7 +1215,9 @@ def handler(event: dict, context) -> dict:
                 (slug, article['title'], article['metaDescription'], content_with_links, article['topic'])
             )
             post_id = cur.fetchone()[0]
+            enqueue_og_pages(cur, [slug])
 
+        refresh_feeds(conn)
         notify_indexnow([f'https://i-hunt.ru/blog/{slug}'])
 
         return {
@@ -509,63 +1233,34 @@ def handler(event: dict, context) -> dict:
         if admin_secret != os.environ.get('ADMIN_SECRET', ''):
             return {'statusCode': 403, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'forbidden'})}
 
-        count = min(int(body_data.get('count', 1)), 5)  # максимум 5 за раз
-
-        results = []
-        existing_topics, existing_titles = get_existing_articles(conn)
-
-        for _ in range(count):
-            try:
-                # До 3 попыток генерации при дубле
-                article = None
-                last_dup = None
-                for _attempt in range(3):
-                    candidate = generate_article(existing_topics, existing_titles)
-                    dup = next((t for t in existing_titles if titles_are_similar(candidate['title'], t)), None)
-                    if not dup:
-                        article = candidate
-                        break
-                    last_dup = dup
-
-                if article is None:
-                    results.append({'ok': False, 'error': f'duplicate_title после 3 попыток: "{last_dup}"'})
-                    continue
+        count = min(int(body_data.get('count', 1)), CRON_MAX_COUNT)
+        deadline = time.monotonic() + CRON_TIME_BUDGET
 
-                content_with_links = inject_links(article['content'])
-                slug_base = slugify(article['topic'])
-                slug = slug_base
-                with conn.cursor() as cur:
-                    i = 1
-                    while True:
-                        cur.execute(f'SELECT 1 FROM {SCHEMA}.blog_posts WHERE slug=%s', (slug,))
-                        if not cur.fetchone():
-                            break
-                        slug = f'{slug_base}-{i}'
-                        i += 1
-                    cur.execute(f'SELECT 1 FROM {SCHEMA}.blog_posts WHERE title=%s', (article['title'],))
-                    if cur.fetchone():
-                        results.append({'ok': False, 'error': 'duplicate_title: точное совпадение'})
-                        continue
-                    cur.execute(
-                        f'INSERT INTO {SCHEMA}.blog_posts (slug, title, meta_description, content, topic) '
-                        f'VALUES (%s, %s, %s, %s, %s) RETURNING id',
-                        (slug, article['title'], article['metaDescription'], content_with_links, article['topic'])
-                    )
-                    post_id = cur.fetchone()[0]
-                existing_topics.append(article['topic'])
-                existing_titles.append(article['title'])
-                results.append({'id': post_id, 'slug': slug, 'title': article['title'], 'ok': True})
-            except Exception as e:
-                results.append({'ok': False, 'error': str(e)})
+        # Одна пачка за раз; блокировка сессионная — оборванный таймаутом вызов отпускает её вместе с соединением
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_try_advisory_lock(hashtext(%s))', ('blog-posts-cron',))
+            if not cur.fetchone()[0]:
+                return {
+                    'statusCode': 409,
+                    'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': 'cron_running'})
+                }
+        try:
+            # Черновики прошлого вызова, оборванного таймаутом, засчитываются в эту пачку
+            errors = generate_drafts(conn, count, deadline)
+            published, skipped = publish_drafts(conn)
+        finally:
+            with conn.cursor() as cur:
+                cur.execute('SELECT pg_advisory_unlock(hashtext(%s))', ('blog-posts-cron',))
 
-        new_urls = [f"https://i-hunt.ru/blog/{r['slug']}" for r in results if r.get('ok')]
-        if new_urls:
-            notify_indexnow(new_urls)
+        if published:
+            refresh_feeds(conn)
+            notify_indexnow([f"https://i-hunt.ru/blog/{r['slug']}" for r in published])
 
         return {
             'statusCode': 200,
             'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
-            'body': json.dumps({'success': True, 'generated': len([r for r in results if r.get('ok')]), 'results': results})
+            'body': json.dumps({'success': True, 'generated': len(published), 'results': published + skipped + errors})
         }
 
     # GET: верификационный файл IndexNow — поисковики проверяют владение доменом
@@ -580,103 +1275,39 @@ def handler(event: dict, context) -> dict:
 
     # GET: RSS-лента для Яндекс.Дзен и других агрегаторов
     if method == 'GET' and action == 'rss':
-        with conn.cursor() as cur:
-            cur.execute(
-                f'SELECT slug, title, meta_description, content, published_at FROM {SCHEMA}.blog_posts '
-                f'WHERE is_published=TRUE ORDER BY published_at DESC LIMIT 50'
-            )
-            rows = cur.fetchall()
-
-        def xml_escape(s):
-            return (s or '').replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
-
-        now_rfc = datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S +0000')
-        lines = [
-            '<?xml version="1.0" encoding="UTF-8"?>',
-            '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/" xmlns:atom="http://www.w3.org/2005/Atom">',
-            '  <channel>',
-            f'    <title>{BRAND} — блог об HR и рекрутинге</title>',
-            f'    <link>{SITE_URL}/blog</link>',
-            f'    <description>Статьи о реферальном рекрутинге, HR-аналитике и подборе персонала</description>',
-            '    <language>ru</language>',
-            f'    <lastBuildDate>{now_rfc}</lastBuildDate>',
-            f'    <atom:link href="{SITE_URL}/blog/rss.xml" rel="self" type="application/rss+xml"/>',
-        ]
-        for slug, title, meta_description, content, published_at in rows:
-            pub_date = published_at.strftime('%a, %d %b %Y %H:%M:%S +0000') if published_at else now_rfc
-            lines += [
-                '    <item>',
-                f'      <title>{xml_escape(title)}</title>',
-                f'      <link>{SITE_URL}/blog/{slug}</link>',
-                f'      <guid isPermaLink="true">{SITE_URL}/blog/{slug}</guid>',
-                f'      <pubDate>{pub_date}</pubDate>',
-                f'      <description>{xml_escape(meta_description or "")}</description>',
-                f'      <content:encoded><![CDATA[{content or ""}]]></content:encoded>',
-                '    </item>',
-            ]
-        lines += ['  </channel>', '</rss>']
-        return {
-            'statusCode': 200,
-            'headers': {**CORS_HEADERS, 'Content-Type': 'application/rss+xml; charset=utf-8'},
-            'body': '\n'.join(lines)
-        }
+        return serve_feed(conn, 'rss', 'application/rss+xml; charset=utf-8', headers)
 
-    # GET: динамический sitemap всех опубликованных статей (XML)
+    # GET: sitemap всех опубликованных статей (XML); ?page=N — часть sitemapindex
     if method == 'GET' and action == 'sitemap':
-        with conn.cursor() as cur:
-            cur.execute(
-                f'SELECT slug, published_at FROM {SCHEMA}.blog_posts '
-                f'WHERE is_published=TRUE ORDER BY published_at DESC'
-            )
-            rows = cur.fetchall()
-        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
-                 '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
-        for slug, published_at in rows:
-            lastmod = published_at.strftime('%Y-%m-%d') if published_at else '2026-01-01'
-            lines.append(
-                f'  <url>'
-                f'<loc>https://i-hunt.ru/blog/{slug}</loc>'
-                f'<lastmod>{lastmod}</lastmod>'
-                f'<changefreq>monthly</changefreq>'
-                f'<priority>0.7</priority>'
-                f'</url>'
-            )
-        lines.append('</urlset>')
-        return {
-            'statusCode': 200,
-            'headers': {**CORS_HEADERS, 'Content-Type': 'application/xml; charset=utf-8'},
-            'body': '\n'.join(lines)
-        }
+        page = params.get('page')
+        name = f'sitemap-{page}' if page and page.isdigit() else 'sitemap'
+        return serve_feed(conn, name, 'application/xml; charset=utf-8', headers)
 
     # POST: зафиксировать просмотр статьи
     if method == 'POST' and action == 'view':
-        post_id = body_data.get('post_id')
-        session_id = body_data.get('session_id', '')[:64]
-        if not post_id or not session_id:
+        post_id = parse_post_id(body_data.get('post_id'))
+        session_id = body_data.get('session_id')
+        if post_id is None or not isinstance(session_id, str) or not session_id:
             return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'missing params'})}
+        session_id = session_id[:64]
+        # Просмотр попадает в буфер; в БД его запишет ближайший сброс. Повтор той же сессии
+        # отсеется при сбросе, поэтому до него число может быть завышено на ожидающие просмотры.
+        # Переполненный буфер (БД долго недоступна) просмотр не принимает — число просто не растёт.
+        VIEW_BUFFER.add(post_id, session_id)
+        flush_views_if_due(conn)
         with conn.cursor() as cur:
-            cur.execute(
-                f'INSERT INTO {SCHEMA}.blog_post_views (post_id, session_id) VALUES (%s, %s) ON CONFLICT DO NOTHING',
-                (post_id, session_id)
-            )
-            cur.execute(f'SELECT COUNT(*) FROM {SCHEMA}.blog_post_views WHERE post_id=%s', (post_id,))
-            count = cur.fetchone()[0]
+            count = stored_views(cur, post_id) + VIEW_BUFFER.pending(post_id)
         return {'statusCode': 200, 'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'}, 'body': json.dumps({'views': count})}
 
     # GET: статистика статьи (просмотры + реакции)
     if method == 'GET' and action == 'stats':
-        post_id = params.get('post_id')
+        post_id = parse_post_id(params.get('post_id', ''))
         session_id = params.get('session_id', '')[:64]
-        if not post_id:
+        if post_id is None:
             return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'missing post_id'})}
         with conn.cursor() as cur:
-            cur.execute(f'SELECT COUNT(*) FROM {SCHEMA}.blog_post_views WHERE post_id=%s', (post_id,))
-            views = cur.fetchone()[0]
-            cur.execute(
-                f'SELECT emoji, COUNT(*) as cnt FROM {SCHEMA}.blog_post_reactions WHERE post_id=%s GROUP BY emoji',
-                (post_id,)
-            )
-            reactions = {row[0]: row[1] for row in cur.fetchall()}
+            views = stored_views(cur, post_id) + VIEW_BUFFER.pending(post_id)
+            reactions = reaction_tallies(cur, [post_id])[post_id]
             my_reaction = None
             if session_id:
                 cur.execute(
@@ -694,7 +1325,8 @@ def handler(event: dict, context) -> dict:
         session_id = body_data.get('session_id', '')[:64]
         emoji = body_data.get('emoji', '')[:8]
         allowed = ['👍', '🔥', '💡', '❤️', '😮']
-        if not post_id or not session_id or emoji not in allowed:
+        post_id = parse_post_id(post_id)
+        if post_id is None or not session_id or emoji not in allowed:
             return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'invalid params'})}
         with conn.cursor() as cur:
             cur.execute(
@@ -715,13 +1347,33 @@ def handler(event: dict, context) -> dict:
                     (post_id, session_id, emoji, emoji)
                 )
                 my_reaction = emoji
+            reactions = reaction_tallies(cur, [post_id])[post_id]
+        return {'statusCode': 200, 'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
+                'body': json.dumps({'reactions': reactions, 'my_reaction': my_reaction})}
+
+    # GET: просмотры и реакции сразу для страницы статей — ?action=stats_bulk&post_ids=1,2,3
+    if method == 'GET' and action == 'stats_bulk':
+        raw_ids = [p.strip() for p in params.get('post_ids', '').split(',') if p.strip()]
+        post_ids = list(dict.fromkeys(parse_post_id(p) for p in raw_ids))
+        if not raw_ids or len(raw_ids) > STATS_BULK_MAX or None in post_ids:
+            return {'statusCode': 400, 'headers': CORS_HEADERS,
+                    'body': json.dumps({'error': f'post_ids: 1-{STATS_BULK_MAX} comma-separated ids'})}
+        with conn.cursor() as cur:
             cur.execute(
-                f'SELECT emoji, COUNT(*) FROM {SCHEMA}.blog_post_reactions WHERE post_id=%s GROUP BY emoji',
-                (post_id,)
+                f'SELECT post_id, views FROM {SCHEMA}.blog_post_view_counts WHERE post_id = ANY(%s)',
+                (post_ids,)
             )
-            reactions = {row[0]: row[1] for row in cur.fetchall()}
+            views = dict(cur.fetchall())
+            reactions = reaction_tallies(cur, post_ids)
+        stats = {
+            str(post_id): {
+                'views': views.get(post_id, 0) + VIEW_BUFFER.pending(post_id),
+                'reactions': reactions[post_id],
+            }
+            for post_id in post_ids
+        }
         return {'statusCode': 200, 'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
-                'body': json.dumps({'reactions': reactions, 'my_reaction': my_reaction})}
+                'body': json.dumps({'stats': stats})}
 
     # GET: список статей с количеством просмотров (для админки)
     if method == 'GET' and action == 'list_with_views':
@@ -734,11 +1386,10 @@ def handler(event: dict, context) -> dict:
         with conn.cursor() as cur:
             cur.execute(
                 f'''SELECT bp.id, bp.slug, bp.title, bp.topic, bp.published_at,
-                           COUNT(bpv.id) AS views
+                           COALESCE(vc.views, 0) AS views
                     FROM {SCHEMA}.blog_posts bp
-                    LEFT JOIN {SCHEMA}.blog_post_views bpv ON bpv.post_id = bp.id
+                    LEFT JOIN {SCHEMA}.blog_post_view_counts vc ON vc.post_id = bp.id
                     WHERE bp.is_published = TRUE
-                    GROUP BY bp.id, bp.slug, bp.title, bp.topic, bp.published_at
                     ORDER BY {"views" if sort == "views" else "bp.published_at"} {order}
                     LIMIT 200'''
             )
@@ -751,13 +1402,31 @@ def handler(event: dict, context) -> dict:
         return {'statusCode': 200, 'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
                 'body': json.dumps({'posts': posts, 'total': len(posts)})}
 
+    # POST: перелинковка всего архива — ?action=relink, body {"after_id": 0, "dry_run": false}
+    if method == 'POST' and action == 'relink':
+        if not os.environ.get('ADMIN_SECRET') or admin_secret != os.environ['ADMIN_SECRET']:
+            return {'statusCode': 403, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'forbidden'})}
+        after_id = body_data.get('after_id', 0)
+        if isinstance(after_id, bool) or not isinstance(after_id, int) or not 0 <= after_id <= MAX_POST_ID:
+            return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'after_id must be a non-negative integer'})}
+        result = relink_archive(conn, after_id, bool(body_data.get('dry_run')))
+        if result['updated'] and not result['dry_run']:
+            refresh_feeds(conn)
+        return {'statusCode': 200, 'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
+                'body': json.dumps(result)}
+
     # POST: удаление статьи
     if method == 'POST' and action == 'delete':
         if admin_secret != os.environ.get('ADMIN_SECRET', ''):
             return {'statusCode': 403, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'forbidden'})}
         post_id = body_data.get('id')
         with conn.cursor() as cur:
-            cur.execute(f'DELETE FROM {SCHEMA}.blog_posts WHERE id=%s', (post_id,))
+            cur.execute(f'DELETE FROM {SCHEMA}.blog_posts WHERE id=%s RETURNING slug', (post_id,))
+            deleted = cur.fetchone()
+            if deleted:
+                enqueue_og_pages(cur, [deleted[0]])
+        if deleted:
+            refresh_feeds(conn)
         return {
             'statusCode': 200,
             'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
@@ -8,6 +8,7 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import jwt
+from http_response import http_response
 
 SCHEMA = os.environ.get('MAIN_DB_SCHEMA', 't_p65890965_refstaff_project')
 CORS = {
@@ -31,6 +32,10 @@ def get_user_id(event):
     except Exception:
         return None
 
+def cache_policy(event: dict) -> str:
+    return 'private, no-cache' if event.get('httpMethod') == 'GET' else 'no-store'
+
+@http_response(cache_policy)
 def handler(event: dict, context) -> dict:
     if event.get('httpMethod') == 'OPTIONS':
         return {'statusCode': 200, 'headers': CORS, 'body': ''}
@@ -2,7 +2,14 @@ import json
 import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from http_response import http_response
 
+
+def cache_policy(event: dict) -> str:
+    return 'private, no-cache' if event.get('httpMethod') == 'GET' else 'no-store'
+
+
+@http_response(cache_policy)
 def handler(event: dict, context) -> dict:
     '''API для получения информации о компании по invite_token'''
     
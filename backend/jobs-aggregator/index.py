@@ -1,11 +1,26 @@
 """
 Агрегатор HR-вакансий с trudvsem.ru.
-Поддерживает фильтрацию по позиции, городу, зарплате, опыту.
+Поддерживает фильтрацию по позиции, городу, зарплате, опыту, полнотекстовый поиск (q) и sort=date|salary.
+Отвечает из локального индекса external_vacancies; POST ?action=sync (X-Admin-Secret) инкрементально
+догружает его из trudvsem. Пока индекс не наполнен — запрашивает trudvsem напрямую.
 """
 import json
+import os
+import re
+import hmac
+import threading
+import time
 import urllib.request
 import urllib.parse
 import urllib.error
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from functools import lru_cache
+import psycopg2
+import psycopg2.extras
+from psycopg2.extras import RealDictCursor
+from http_response import http_response
 
 CORS_HEADERS = {
     'Access-Control-Allow-Origin': '*',
@@ -14,6 +29,8 @@ CORS_HEADERS = {
     'Content-Type': 'application/json',
 }
 
+SCHEMA = 't_p65890965_refstaff_project'
+
 HR_POSITIONS = {
     'recruiter': 'рекрутер',
     'hr_manager': 'HR менеджер',
@@ -36,16 +53,125 @@ POSITION_KEYWORDS = {
 
 PER_PAGE = 20
 
+TRUDVSEM_API_URL = os.environ.get('TRUDVSEM_API_URL', 'https://opendata.trudvsem.ru/api/v1/vacancies')
+FETCH_TIMEOUT = 8
+FANOUT_DEADLINE = 9  # секунд на весь position=all; не успевшие позиции пропускаем
+
+CACHE_TTL = 300         # ответ свежий — отдаём из кеша
+CACHE_STALE_TTL = 1800  # устаревший, но ещё годный — обновляем в запросе, при неудаче отдаём его
+REVALIDATE_BUDGET = 1.5  # секунд на обновление устаревшей записи внутри запроса
+CACHE_ERROR_TTL = 30    # неполный ответ (таймаут, сбой trudvsem) — ненадолго и без stale
+CACHE_MAX_ENTRIES = 256
+
+# Живут между тёплыми вызовами функции. Запросы, не уложившиеся в дедлайн,
+# досиживают свой таймаут в пуле — поэтому потоков вдвое больше позиций.
+FETCH_POOL = ThreadPoolExecutor(max_workers=2 * len(HR_POSITIONS))
+_cache = OrderedDict()  # key -> (fresh_until, stale_until, result)
+_refreshing = set()
+_cache_lock = threading.Lock()
+
+SYNC_PAGE_SIZE = 100      # максимум trudvsem
+SYNC_MAX_PAGES = 10       # страниц на позицию за один вызов sync; остальное — в следующий
+SYNC_OVERLAP = 3600       # окна modifiedFrom перекрываются на час — на случай расхождения часов
+FULL_RESYNC_DAYS = 7
+INDEX_RETENTION_DAYS = 14
+EXPERIENCE_RANGES = {'no': (0, 0), '1-3': (1, 3), '3-6': (3, 6), '6+': (6, 100)}
+_index_ready = False
+
+
+_TITLE_TRANSLATION = str.maketrans({'ё': 'е', '-': ' ', '_': ' ', '‐': ' ', '–': ' ', '—': ' '})
+
+
+def normalize_title(text: str) -> str:
+    """Нижний регистр, ё → е, дефисы и подчёркивания → пробел, пробелы схлопнуты:
+    «HR-менеджер» и «hr  менеджер» сравниваются одинаково."""
+    return ' '.join(text.lower().translate(_TITLE_TRANSLATION).split())
+
+
+_PATTERN_CHARS = {' ': r'[\s\-_‐–—]+', 'е': '[её]'}
+
+
+def _trie_pattern(words) -> str:
+    """Альтернация в виде префиксного дерева: «hr(?:d|g|bp| менеджер…)» вместо «hrd|hrg|…» —
+    в каждой точке строки regex отбрасывает неподходящее по первому символу.
+    Пробел в слове совпадает с любым разделителем, «е» — и с «ё», так что заголовок
+    достаточно перевести в нижний регистр."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def emit(node: dict) -> str:
+        branches = [_PATTERN_CHARS.get(ch, re.escape(ch)) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return emit(trie)
+
+
+def build_keyword_matcher(position_keywords: dict) -> tuple:
+    """Одна регулярка на все ключевые слова. Каждое слово — основа без окончания
+    («подбор персонал»), поэтому ищем подстроку. Для каждого слова заранее собираем
+    позиции всех слов, которые являются его префиксом: они совпадают в той же точке."""
+    keyword_positions = {}
+    for position_key, keywords in position_keywords.items():
+        for kw in keywords:
+            keyword_positions.setdefault(normalize_title(kw), set()).add(position_key)
+    for kw in keyword_positions:
+        for other, positions in keyword_positions.items():
+            if kw != other and kw.startswith(other):
+                keyword_positions[kw] = keyword_positions[kw] | positions
+    # lookahead даёт совпадения, начинающиеся в каждой позиции строки, в том числе перекрывающиеся
+    return re.compile(f'(?=({_trie_pattern(keyword_positions)}))'), keyword_positions
+
+
+KEYWORD_RE, KEYWORD_POSITIONS = build_keyword_matcher(POSITION_KEYWORDS)
+
+
+@lru_cache(maxsize=4096)
+def classify_title(title: str) -> frozenset:
+    """Все HR-позиции, которым соответствует название вакансии, за один проход по строке."""
+    matches = KEYWORD_RE.findall(title.lower())
+    if not matches:
+        return frozenset()
+    return frozenset().union(*(_match_positions(m) for m in matches))
+
+
+@lru_cache(maxsize=1024)
+def _match_positions(matched: str) -> frozenset:
+    """Позиции по совпавшему фрагменту («hr-менеджер», «hr менеджер» → одно ключевое слово)."""
+    return frozenset(KEYWORD_POSITIONS[normalize_title(matched)])
+
 
 def is_relevant(title: str, position_key: str) -> bool:
     """Проверяет, что название вакансии соответствует HR-должности."""
-    title_lower = title.lower()
-    keywords = POSITION_KEYWORDS.get(position_key, [])
-    return any(kw in title_lower for kw in keywords)
+    return position_key in classify_title(title)
+
+
+def format_salary(salary_min, salary_max, salary_raw: str = '') -> str:
+    if salary_min or salary_max:
+        parts = []
+        if salary_min:
+            parts.append(f"от {int(salary_min):,}".replace(',', ' '))
+        if salary_max:
+            parts.append(f"до {int(salary_max):,}".replace(',', ' '))
+        return ' — '.join(parts) + ' ₽'
+    return salary_raw or ''
+
+
+def _to_int(value) -> int | None:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
 
 
 def fetch_trudvsem(position_key: str, city: str, salary_from: int | None,
-                   experience: str | None, page: int) -> dict:
+                   experience: str | None, page: int, timeout: float = FETCH_TIMEOUT) -> dict:
     """Загружает вакансии с trudvsem.ru через открытый API."""
     text = HR_POSITIONS.get(position_key, 'HR менеджер')
     offset = page * PER_PAGE
@@ -64,11 +190,11 @@ def fetch_trudvsem(position_key: str, city: str, salary_from: int | None,
     if salary_from:
         params['salary_min'] = salary_from
 
-    url = 'https://opendata.trudvsem.ru/api/v1/vacancies?' + urllib.parse.urlencode(params)
+    url = TRUDVSEM_API_URL + '?' + urllib.parse.urlencode(params)
     req = urllib.request.Request(url, headers={'User-Agent': 'iHUNT/1.0'})
 
     try:
-        with urllib.request.urlopen(req, timeout=8) as resp:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
             data = json.loads(resp.read().decode())
             results = data.get('results', {})
             items = results.get('vacancies', [])
@@ -84,18 +210,7 @@ def fetch_trudvsem(position_key: str, city: str, salary_from: int | None,
 
                 salary_min = v.get('salary_min')
                 salary_max = v.get('salary_max')
-                salary_raw = v.get('salary', '')
-
-                salary_str = ''
-                if salary_min or salary_max:
-                    parts = []
-                    if salary_min:
-                        parts.append(f"от {int(salary_min):,}".replace(',', ' '))
-                    if salary_max:
-                        parts.append(f"до {int(salary_max):,}".replace(',', ' '))
-                    salary_str = ' — '.join(parts) + ' ₽'
-                elif salary_raw:
-                    salary_str = salary_raw
+                salary_str = format_salary(salary_min, salary_max, v.get('salary', ''))
 
                 employment = v.get('employment', '')
                 region_name = v.get('region', {}).get('name', '')
@@ -132,12 +247,310 @@ def fetch_trudvsem(position_key: str, city: str, salary_from: int | None,
         return {'vacancies': [], 'total': 0, 'pages': 0, 'error': str(e)}
 
 
+def aggregate(position: str, city: str, salary_from: int | None, experience: str | None, page: int,
+              deadline: float = FANOUT_DEADLINE) -> dict:
+    """Для position=all опрашивает все позиции параллельно, но не дольше deadline секунд."""
+    timeout = min(FETCH_TIMEOUT, deadline)
+    if position != 'all':
+        return fetch_trudvsem(position, city, salary_from, experience, page, timeout)
+
+    futures = [FETCH_POOL.submit(fetch_trudvsem, pos, city, salary_from, experience, 0, timeout) for pos in HR_POSITIONS]
+    done, not_done = wait(futures, timeout=deadline)
+    seen_ids = set()
+    merged = []
+    errors = []
+    for future in futures:
+        if future not in done:
+            continue
+        r = future.result()
+        if r.get('error'):
+            errors.append(r['error'])
+        for v in r.get('vacancies', []):
+            if v['id'] not in seen_ids:
+                seen_ids.add(v['id'])
+                merged.append(v)
+    if not_done:
+        errors.append(f'timeout: {len(not_done)} of {len(futures)} positions')
+    merged.sort(key=lambda v: v.get('published_at', ''), reverse=True)
+    result = {'vacancies': merged[:PER_PAGE], 'total': len(merged), 'pages': 1}
+    if errors:
+        result['error'] = '; '.join(errors)
+    return result
+
+
+def _cache_put(key: tuple, result: dict):
+    now = time.monotonic()
+    if result.get('error'):
+        entry = (now + CACHE_ERROR_TTL, now + CACHE_ERROR_TTL, result)
+    else:
+        entry = (now + CACHE_TTL, now + CACHE_STALE_TTL, result)
+    with _cache_lock:
+        _cache[key] = entry
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def cached_aggregate(key: tuple) -> tuple:
+    """TTL-кеш со stale-while-revalidate. Устаревшая запись обновляется в самом запросе
+    (после ответа функцию замораживают, фоновые потоки не доживают): на trudvsem даётся
+    REVALIDATE_BUDGET, неполный или опоздавший ответ не вытесняет stale-запись.
+    Возвращает (result, 'HIT' | 'REVALIDATED' | 'STALE' | 'MISS')."""
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry:
+            _cache.move_to_end(key)
+    if entry:
+        fresh_until, stale_until, result = entry
+        now = time.monotonic()
+        if now < fresh_until:
+            return result, 'HIT'
+        if now < stale_until:
+            with _cache_lock:
+                revalidate = key not in _refreshing
+                _refreshing.add(key)
+            if not revalidate:
+                return result, 'STALE'
+            try:
+                fresh = aggregate(*key, deadline=REVALIDATE_BUDGET)
+            finally:
+                with _cache_lock:
+                    _refreshing.discard(key)
+            if fresh.get('error'):
+                return result, 'STALE'
+            _cache_put(key, fresh)
+            return fresh, 'REVALIDATED'
+    result = aggregate(*key)
+    _cache_put(key, result)
+    return result, 'MISS'
+
+
+# ── Локальный индекс вакансий ────────────────────────────────────────────────
+
+def get_db():
+    conn = psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=RealDictCursor)
+    conn.autocommit = True
+    return conn
+
+
+def normalize_vacancy(v: dict) -> dict | None:
+    """Вакансия trudvsem → строка external_vacancies; None, если это не HR-должность."""
+    title = v.get('job-name', '') or ''
+    matched = classify_title(title)
+    positions = [key for key in POSITION_KEYWORDS if key in matched]
+    if not positions or not v.get('id'):
+        return None
+    return {
+        'id': f"tv_{v['id']}",
+        'title': title,
+        'company': (v.get('company') or {}).get('name', ''),
+        'region': (v.get('region') or {}).get('name', ''),
+        'salary_from': _to_int(v.get('salary_min')),
+        'salary_to': _to_int(v.get('salary_max')),
+        'salary_text': v.get('salary', '') or '',
+        'experience_years': _to_int((v.get('requirement') or {}).get('experience')),
+        'schedule': v.get('schedule', '') or '',
+        'is_remote': 'удал' in (v.get('employment', '') or '').lower(),
+        'url': v.get('vac_url', '') or '',
+        'snippet': (v.get('duty', '') or '')[:300],
+        'positions': positions,
+        'published_at': v.get('creation-date') or None,
+    }
+
+
+def fetch_trudvsem_page(text: str, page: int, modified_from: datetime | None) -> list:
+    """Одна страница сырого ответа trudvsem. offset в их API — номер страницы."""
+    params = {'text': text, 'limit': SYNC_PAGE_SIZE, 'offset': page}
+    if modified_from:
+        params['modifiedFrom'] = modified_from.strftime('%Y-%m-%dT%H:%M:%SZ')
+    req = urllib.request.Request(TRUDVSEM_API_URL + '?' + urllib.parse.urlencode(params), headers={'User-Agent': 'iHUNT/1.0'})
+    with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT) as resp:
+        data = json.loads(resp.read().decode())
+    return [item.get('vacancy', {}) for item in (data.get('results') or {}).get('vacancies', [])]
+
+
+def sync_position(position_key: str, state: dict) -> dict:
+    """Догружает вакансии позиции, изменённые с modified_from, начиная со страницы next_page.
+    Возвращает {'rows', 'state', 'error'}; state — новое состояние для external_vacancy_sync."""
+    now = datetime.utcnow()
+    modified_from = state.get('modified_from')
+    page = state.get('next_page') or 0
+    window_started_at = state.get('window_started_at') if page else now
+    rows = {}
+    try:
+        complete = False
+        for _ in range(SYNC_MAX_PAGES):
+            items = fetch_trudvsem_page(HR_POSITIONS[position_key], page, modified_from)
+            for v in items:
+                row = normalize_vacancy(v)
+                if row:
+                    rows[row['id']] = row
+            page += 1
+            if len(items) < SYNC_PAGE_SIZE:
+                complete = True
+                break
+    except Exception as e:
+        return {'rows': list(rows.values()), 'state': {**state, 'next_page': page, 'window_started_at': window_started_at}, 'error': str(e)}
+
+    new_state = {**state, 'next_page': page, 'window_started_at': window_started_at}
+    if complete:
+        full_synced_at = window_started_at if modified_from is None else state.get('full_synced_at')
+        # Раз в FULL_RESYNC_DAYS проходим всё заново, иначе — только изменённое с начала прошлого окна
+        if full_synced_at and now - full_synced_at < timedelta(days=FULL_RESYNC_DAYS):
+            next_from = window_started_at - timedelta(seconds=SYNC_OVERLAP)
+        else:
+            next_from = None
+        new_state = {'modified_from': next_from, 'next_page': 0, 'window_started_at': None,
+                     'synced_at': now, 'full_synced_at': full_synced_at}
+    return {'rows': list(rows.values()), 'state': new_state, 'error': None}
+
+
+def sync_index(conn) -> dict:
+    """Один шаг инкрементальной синхронизации по всем позициям (параллельно)."""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT * FROM {SCHEMA}.external_vacancy_sync WHERE source = 'trudvsem'")
+        states = {r['position']: dict(r) for r in cur.fetchall()}
+
+    futures = {pos: FETCH_POOL.submit(sync_position, pos, states.get(pos, {})) for pos in HR_POSITIONS}
+    rows, report = {}, {}
+    for pos, future in futures.items():
+        r = future.result()
+        for row in r['rows']:
+            rows[row['id']] = row
+        report[pos] = {'fetched': len(r['rows']), 'complete': r['state']['next_page'] == 0, 'error': r['error']}
+        states[pos] = r['state']
+
+    columns = ['id', 'title', 'company', 'region', 'salary_from', 'salary_to', 'salary_text', 'experience_years',
+               'schedule', 'is_remote', 'url', 'snippet', 'positions', 'published_at']
+    with conn.cursor() as cur:
+        if rows:
+            psycopg2.extras.execute_values(cur, f"""
+                INSERT INTO {SCHEMA}.external_vacancies ({', '.join(columns)})
+                VALUES %s
+                ON CONFLICT (id) DO UPDATE SET
+                    {', '.join(f'{c} = EXCLUDED.{c}' for c in columns[1:])},
+                    last_seen_at = CURRENT_TIMESTAMP
+            """, [tuple(row[c] for c in columns) for row in rows.values()], page_size=500)
+        for pos, st in states.items():
+            cur.execute(f"""
+                INSERT INTO {SCHEMA}.external_vacancy_sync
+                    (source, position, modified_from, next_page, window_started_at, synced_at, full_synced_at)
+                VALUES ('trudvsem', %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (source, position) DO UPDATE SET
+                    modified_from = EXCLUDED.modified_from, next_page = EXCLUDED.next_page,
+                    window_started_at = EXCLUDED.window_started_at, synced_at = EXCLUDED.synced_at,
+                    full_synced_at = EXCLUDED.full_synced_at
+            """, (pos, st.get('modified_from'), st.get('next_page') or 0, st.get('window_started_at'),
+                  st.get('synced_at'), st.get('full_synced_at')))
+        # Закрытые вакансии trudvsem просто перестаёт отдавать — удаляем не встречавшиеся дольше срока
+        cur.execute(f"DELETE FROM {SCHEMA}.external_vacancies WHERE last_seen_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 day'",
+                    (INDEX_RETENTION_DAYS,))
+        removed = cur.rowcount
+    return {'upserted': len(rows), 'removed': removed, 'positions': report}
+
+
+def index_ready(cur) -> bool:
+    """Индексом можно отвечать, когда по каждой позиции прошёл хотя бы один полный проход."""
+    global _index_ready
+    if not _index_ready:
+        cur.execute(f"SELECT COUNT(*) AS cnt FROM {SCHEMA}.external_vacancy_sync WHERE source = 'trudvsem' AND full_synced_at IS NOT NULL")
+        _index_ready = cur.fetchone()['cnt'] >= len(HR_POSITIONS)
+    return _index_ready
+
+
+def experience_label(years: int | None) -> str:
+    if years is None:
+        return ''
+    return 'Без опыта' if years == 0 else f'Опыт от {years} лет'
+
+
+def search_index(cur, position: str, city: str, salary_from: int | None, experience: str | None,
+                 q: str, sort: str, page: int) -> dict:
+    """Фильтр, сортировка и пагинация по локальному индексу; total — точный COUNT по фильтру."""
+    conditions, params = [], []
+    if position != 'all':
+        conditions.append('positions @> ARRAY[%s]::text[]')
+        params.append(position)
+    if city.lower() in ('remote', 'удалённо', 'удаленно'):
+        conditions.append('is_remote')
+    elif city:
+        conditions.append('lower(region) LIKE %s')
+        params.append(city.lower().replace('%', '').replace('_', '') + '%')
+    if salary_from:
+        conditions.append('COALESCE(salary_to, salary_from) >= %s')
+        params.append(salary_from)
+    if experience in EXPERIENCE_RANGES:
+        low, high = EXPERIENCE_RANGES[experience]
+        conditions.append('COALESCE(experience_years, 0) BETWEEN %s AND %s')
+        params.extend([low, high])
+    if q:
+        conditions.append("search @@ websearch_to_tsquery('russian', %s)")
+        params.append(q)
+    where = ' AND '.join(conditions) or 'TRUE'
+
+    if sort == 'salary':
+        order_by = 'COALESCE(salary_to, salary_from) DESC NULLS LAST, id DESC'
+    elif q:
+        order_by = "ts_rank(search, websearch_to_tsquery('russian', %s)) DESC, published_at DESC NULLS LAST, id DESC"
+    else:
+        order_by = 'published_at DESC NULLS LAST, id DESC'
+    order_params = [q] if (q and sort != 'salary') else []
+
+    cur.execute(f"SELECT COUNT(*) AS cnt FROM {SCHEMA}.external_vacancies WHERE {where}", params)
+    total = cur.fetchone()['cnt']
+    cur.execute(f"""
+        SELECT id, title, company, region, salary_from, salary_to, salary_text, experience_years,
+               schedule, is_remote, url, snippet, published_at
+        FROM {SCHEMA}.external_vacancies
+        WHERE {where}
+        ORDER BY {order_by}
+        LIMIT %s OFFSET %s
+    """, params + order_params + [PER_PAGE, page * PER_PAGE])
+    vacancies = [{
+        'id': r['id'],
+        'source': 'trudvsem',
+        'title': r['title'],
+        'company': r['company'],
+        'city': r['region'],
+        'salary': format_salary(r['salary_from'], r['salary_to'], r['salary_text']),
+        'salary_from': r['salary_from'],
+        'salary_to': r['salary_to'],
+        'experience': experience_label(r['experience_years']),
+        'schedule': r['schedule'],
+        'is_remote': r['is_remote'],
+        'url': r['url'],
+        'published_at': r['published_at'].isoformat() if r['published_at'] else '',
+        'snippet': r['snippet'],
+    } for r in cur.fetchall()]
+    return {'vacancies': vacancies, 'total': total, 'pages': max(1, -(-total // PER_PAGE))}
+
+
+def cache_policy(event: dict) -> str:
+    """Индекс обновляется синхронизацией раз в 10–15 минут — выдачу можно держать 5 минут."""
+    return 'public, max-age=300' if event.get('httpMethod') == 'GET' else 'no-store'
+
+
+@http_response(cache_policy)
 def handler(event: dict, context) -> dict:
     """Агрегирует HR-вакансии с trudvsem.ru с фильтрацией."""
     if event.get('httpMethod') == 'OPTIONS':
         return {'statusCode': 200, 'headers': CORS_HEADERS, 'body': ''}
 
     params = event.get('queryStringParameters') or {}
+
+    # POST ?action=sync — шаг инкрементальной синхронизации индекса; cron раз в 10–15 минут
+    if event.get('httpMethod') == 'POST' and params.get('action') == 'sync':
+        headers = event.get('headers') or {}
+        secret = headers.get('X-Admin-Secret') or headers.get('x-admin-secret') or ''
+        if not os.environ.get('ADMIN_SECRET') or not hmac.compare_digest(secret, os.environ['ADMIN_SECRET']):
+            return {'statusCode': 403, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'forbidden'})}
+        conn = get_db()
+        try:
+            result = sync_index(conn)
+        finally:
+            conn.close()
+        return {'statusCode': 200, 'headers': CORS_HEADERS, 'body': json.dumps(result, ensure_ascii=False)}
+
     position = params.get('position', 'all')
     city = params.get('city', '').strip()
     salary_from_raw = params.get('salary_from', '')
@@ -146,19 +559,26 @@ def handler(event: dict, context) -> dict:
 
     salary_from = int(salary_from_raw) if salary_from_raw.isdigit() else None
 
-    if position == 'all':
-        seen_ids = set()
-        merged = []
-        for pos in HR_POSITIONS.keys():
-            r = fetch_trudvsem(pos, city, salary_from, experience or None, 0)
-            for v in r.get('vacancies', []):
-                if v['id'] not in seen_ids:
-                    seen_ids.add(v['id'])
-                    merged.append(v)
-        merged.sort(key=lambda v: v.get('published_at', ''), reverse=True)
-        tv_result = {'vacancies': merged[:PER_PAGE], 'total': len(merged), 'pages': 1}
-    else:
-        tv_result = fetch_trudvsem(position, city, salary_from, experience or None, page_tv)
+    # Основной путь — локальный индекс; пока он не наполнен (или БД недоступна) — trudvsem напрямую
+    tv_result = None
+    if os.environ.get('DATABASE_URL') and (position == 'all' or position in HR_POSITIONS):
+        try:
+            conn = get_db()
+            try:
+                with conn.cursor() as cur:
+                    if index_ready(cur):
+                        tv_result = search_index(cur, position, city, salary_from, experience or None,
+                                                 params.get('q', '').strip(), params.get('sort', 'date'), page_tv)
+                        cache_status = 'INDEX'
+            finally:
+                conn.close()
+        except psycopg2.Error as e:
+            print(f'jobs index unavailable: {e}')
+
+    if tv_result is None:
+        # page для position=all не используется — он всегда собирается с первой страницы
+        key = (position, city, salary_from, experience or None, 0 if position == 'all' else page_tv)
+        tv_result, cache_status = cached_aggregate(key)
 
     body = {
         'trudvsem': {
@@ -172,6 +592,6 @@ def handler(event: dict, context) -> dict:
 
     return {
         'statusCode': 200,
-        'headers': CORS_HEADERS,
+        'headers': {**CORS_HEADERS, 'X-Cache': cache_status},
         'body': json.dumps(body, ensure_ascii=False),
     }
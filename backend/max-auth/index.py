@@ -16,6 +16,9 @@ import hashlib
 import hmac
 import base64
 import requests as http_requests
+import time
+from messenger import MessengerClient
+from http_response import http_response
 
 DB_SCHEMA = 't_p65890965_refstaff_project'
 MAX_API = 'https://platform-api.max.ru'
@@ -35,9 +38,12 @@ def max_api_request(token: str, method: str, path: str, payload: dict = None):
     return r.json()
 
 
+MESSENGER = MessengerClient()
+
+
 def max_send(token: str, user_id: int, text: str):
     """Отправляет сообщение пользователю в MAX."""
-    return max_api_request(token, 'POST', f'/messages?user_id={user_id}', {'text': text})
+    return MESSENGER.post(token, user_id, f'{MAX_API}/messages?user_id={user_id}', {'text': text}, headers={'Authorization': token})
 
 
 def generate_code() -> str:
@@ -78,6 +84,7 @@ def resp(status: int, body: dict):
     }
 
 
+@http_response()
 def handler(event: dict, context) -> dict:
     if event.get('httpMethod') == 'OPTIONS':
         return {'statusCode': 200, 'headers': cors(), 'body': ''}
@@ -0,0 +1,125 @@
+# Сгенерировано scripts/sync_shared.py из shared/messenger.py — не редактировать, правьте shared/messenger.py.
+"""
+Отправка сообщений в Telegram Bot API и MAX с учётом их лимитов.
+
+Каноничный исходник: shared/messenger.py. Облачные функции деплоятся каждая из своей папки,
+поэтому в backend/<функция>/messenger.py лежит копия, которую пишет scripts/sync_shared.py.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class MessengerError(Exception):
+    def __init__(self, status: int, description: str, retry_after: float = None):
+        super().__init__(f'HTTP {status}: {description}')
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """rate токенов в секунду, запас — capacity. Токен выдаётся в долг: reserve()
+    сразу возвращает, сколько ждать, и конкурирующие потоки встают в очередь."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self):
+        """Возвращает токен, взятый reserve(), если запрос так и не был отправлен."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds: float):
+        """После 429: следующий токен — не раньше чем через seconds."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class MessengerClient:
+    """Отправка в Telegram Bot API и MAX: keep-alive через requests.Session (живёт между
+    тёплыми вызовами), token bucket на бота и на получателя, повтор после 429 по retry_after.
+    Если ждать пришлось бы дольше max_wait — MessengerError со status=429 и retry_after."""
+
+    def __init__(self, bot_rate: float = 30, recipient_rate: float = 1, max_wait: float = 3, timeout: float = 10):
+        self.session = requests.Session()
+        self.bot_rate = bot_rate
+        self.recipient_rate = recipient_rate
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: tuple, rate: float) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= 10000:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = TokenBucket(rate, max(rate, 1))
+            return bucket
+
+    def post(self, bot_key: str, recipient, url: str, payload: dict, headers: dict = None) -> dict:
+        buckets = [self._bucket(('bot', bot_key), self.bot_rate),
+                   self._bucket(('recipient', bot_key, str(recipient)), self.recipient_rate)]
+        waited = 0.0
+        while True:
+            delay = max(b.reserve() for b in buckets)
+            if waited + delay > self.max_wait:
+                # Запрос не уходит — токены возвращаем, иначе отказ сдвигает очередь остальным
+                for b in buckets:
+                    b.refund()
+                raise MessengerError(429, 'local rate limit', retry_after=delay)
+            time.sleep(delay)
+            waited += delay
+            r = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+            try:
+                body = r.json()
+            except ValueError:
+                body = {}
+            if r.status_code == 429:
+                # Telegram кладёт retry_after в parameters, MAX — в заголовок Retry-After
+                retry_after = float(r.headers.get('Retry-After') or (body.get('parameters') or {}).get('retry_after') or 1)
+                for b in buckets:
+                    b.pause(retry_after)
+                if waited + retry_after > self.max_wait:
+                    raise MessengerError(429, body.get('description') or 'Too Many Requests', retry_after)
+                continue
+            if r.status_code >= 400 or body.get('ok') is False:
+                raise MessengerError(r.status_code, body.get('description') or body.get('message') or r.text[:200])
+            return body
+
+    def send_many(self, messages: list, workers: int = 8) -> list:
+        """Рассылка: messages — [(bot_key, recipient, url, payload, headers)]. Сообщения уходят
+        параллельно в workers потоков, лимиты бота и получателей соблюдает post(), так что
+        медленный или заблокированный чат не задерживает остальных. Возвращает список той же
+        длины: ответ API или исключение, с которым не удалось отправить сообщение."""
+        def send(message):
+            try:
+                return self.post(*message)
+            except Exception as e:
+                return e
+
+        if not messages:
+            return []
+        with ThreadPoolExecutor(max_workers=min(workers, len(messages))) as executor:
+            return list(executor.map(send, messages))
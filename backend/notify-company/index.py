@@ -6,8 +6,10 @@ from email.mime.multipart import MIMEMultipart
 from email.header import Header
 import psycopg2
 import psycopg2.extras
+from http_response import http_response
 
 
+@http_response()
 def handler(event, context):
     """Отправка email-уведомлений администраторам компании о событиях в ЛК"""
 
@@ -1,90 +1,350 @@
 import json
+import os
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont
 import io
 import base64
+import boto3
+
+# Меняется при любой правке оформления — старые картинки в кеше перестают совпадать по ключу
+TEMPLATE_VERSION = '2'
+RENDER_PREFIX = 'og-images'
+WIDTH, HEIGHT = 1200, 630
+TEXT_X = 80
+TITLE_MAX_WIDTH = 1160 - 40 - TEXT_X  # правый край карточки минус поле
+TITLE_MAX_LINES = 3
+
+# Порядок — предпочтение сервера среди явно принимаемых клиентом форматов.
+# Без явного image/webp или image/jpeg (краулеры соцсетей шлют */*) отдаём PNG.
+OUTPUT_FORMATS = {
+    'webp': ('image/webp', 'webp'),
+    'png': ('image/png', 'png'),
+    'jpeg': ('image/jpeg', 'jpg'),
+}
+MEMORY_CACHE_MAX_BYTES = 32 * 1024 * 1024
+LOCAL_CACHE_MAX_FILES = 2000
+S3_CACHE_MAX_BYTES = int(os.environ.get('OG_RENDER_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+S3_CACHE_LOW_WATER = 0.9      # вытесняем до 90% лимита, чтобы не чистить после каждого рендера
+S3_EVICT_PROBABILITY = 0.02   # доля рендеров, после которых проверяется размер кеша в бакете
+S3_TOUCH_AFTER = 86400        # попадание обновляет LastModified не чаще раза в сутки
+
+
+@lru_cache(maxsize=1)
+def get_fonts() -> tuple:
+    """Шрифты грузятся с диска один раз на инстанс функции: (title, dept, brand)."""
+    try:
+        return (
+            ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 60),
+            ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', 36),
+            ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 48),
+        )
+    except Exception:
+        default = ImageFont.load_default()
+        return default, default, default
+
+
+@lru_cache(maxsize=1)
+def get_base_template() -> Image.Image:
+    """Фон, карточка и логотип одинаковы для всех картинок — рисуем один раз на инстанс."""
+    img = Image.new('RGB', (WIDTH, HEIGHT), color='#f8fafc')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([(40, 40), (WIDTH - 40, HEIGHT - 40)], fill='#ffffff', outline='#e2e8f0', width=2)
+    draw.text((TEXT_X, 80), 'iHUNT', font=get_fonts()[2], fill='#3b82f6')
+    return img
+
+
+def wrap_text(text: str, font, max_width: int) -> list:
+    """Перенос по словам с учётом реальной ширины строки в пикселях."""
+    lines = []
+    current_line = ''
+    for word in text.split():
+        test_line = current_line + ' ' + word if current_line else word
+        if current_line and font.getlength(test_line) > max_width:
+            lines.append(current_line)
+            current_line = word
+        else:
+            current_line = test_line
+    if current_line:
+        lines.append(current_line)
+    return lines
+
+
+def choose_format(accept: str) -> str:
+    """Формат из заголовка Accept: явно названный тип с q > 0; иначе PNG."""
+    accepted = {}
+    for part in (accept or '').split(','):
+        mime, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[mime.strip().lower()] = q
+    for fmt, (mime, _) in OUTPUT_FORMATS.items():
+        if accepted.get(mime, 0) > 0:
+            return fmt
+    return 'png'
+
+
+def encode_image(img: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        # Плоские заливки и текст: lossless меньше и чище lossy, method=1 — быстрее при том же размере
+        img.save(buffer, format='WEBP', lossless=True, quality=50, method=1)
+    elif fmt == 'jpeg':
+        img.save(buffer, format='JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        # Несколько плоских цветов и сглаженный текст — палитра почти без потерь.
+        # optimize=True экономит ~10% байт ценой почти троекратного времени кодирования.
+        img.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class S3RenderStorage:
+    """Бакет poehali.dev; клиент создаётся один раз на инстанс функции.
+    LRU по LastModified: попадание копирует объект сам в себя (раз в S3_TOUCH_AFTER),
+    а evict() удаляет самые давно использованные, пока префикс og-images/ больше max_bytes."""
+
+    def __init__(self, max_bytes: int):
+        self._client = None
+        self.max_bytes = max_bytes
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client(
+                's3',
+                endpoint_url='https://bucket.poehali.dev',
+                aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+                aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
+            )
+        return self._client
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            obj = self.client.get_object(Bucket='files', Key=key)
+            data = obj['Body'].read()
+        except Exception:
+            return None
+        if time.time() - obj['LastModified'].timestamp() > S3_TOUCH_AFTER:
+            try:
+                self.client.copy_object(Bucket='files', Key=key, CopySource={'Bucket': 'files', 'Key': key},
+                                        MetadataDirective='REPLACE', ContentType=obj.get('ContentType') or 'application/octet-stream')
+            except Exception as e:
+                print(f'og-image cache touch failed: {e}')
+        return data
+
+    def put(self, key: str, data: bytes, content_type: str):
+        self.client.put_object(Bucket='files', Key=key, Body=data, ContentType=content_type)
+        if random.random() < S3_EVICT_PROBABILITY:
+            try:
+                self.evict()
+            except Exception as e:
+                print(f'og-image cache eviction failed: {e}')
+
+    def evict(self) -> int:
+        """Удаляет самые давно использованные картинки до S3_CACHE_LOW_WATER от лимита."""
+        objects = []
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket='files', Prefix=f'{RENDER_PREFIX}/'):
+            objects.extend(page.get('Contents', []))
+        total = sum(obj['Size'] for obj in objects)
+        if total <= self.max_bytes:
+            return 0
+        stale = []
+        for obj in sorted(objects, key=lambda o: o['LastModified']):
+            if total <= self.max_bytes * S3_CACHE_LOW_WATER:
+                break
+            stale.append(obj['Key'])
+            total -= obj['Size']
+        for i in range(0, len(stale), 1000):  # delete_objects принимает до 1000 ключей
+            self.client.delete_objects(Bucket='files', Delete={'Objects': [{'Key': k} for k in stale[i:i + 1000]], 'Quiet': True})
+        return len(stale)
+
+
+class LocalRenderStorage:
+    """Кеш на локальном диске с LRU-вытеснением по mtime (чтение обновляет mtime)."""
+
+    def __init__(self, root: str, max_files: int):
+        self.root = root
+        self.max_files = max_files
+
+    def get(self, key: str) -> bytes | None:
+        path = os.path.join(self.root, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, key: str, data: bytes, content_type: str):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self._evict()
+
+    def _evict(self):
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            files.extend(os.path.join(dirpath, n) for n in names)
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda p: os.path.getmtime(p))
+        for path in files[:len(files) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+if os.environ.get('OG_RENDER_STORAGE') == 'local':
+    STORAGE = LocalRenderStorage(os.environ.get('OG_RENDER_LOCAL_DIR', '/tmp/og-images'), LOCAL_CACHE_MAX_FILES)
+elif os.environ.get('AWS_ACCESS_KEY_ID'):
+    STORAGE = S3RenderStorage(S3_CACHE_MAX_BYTES)
+else:
+    STORAGE = None
+
+
+class MemoryLRU:
+    """Готовые картинки в памяти инстанса, вытеснение по суммарному размеру."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and self._items:
+                _, old = self._items.popitem(last=False)
+                self.size -= len(old)
+
+
+MEMORY_CACHE = MemoryLRU(MEMORY_CACHE_MAX_BYTES)
+
+
+def render_key(title: str, department: str, salary: str, fmt: str) -> str:
+    """Ключ по содержимому: одинаковые параметры — та же картинка и тот же ETag."""
+    raw = json.dumps([TEMPLATE_VERSION, title, department, salary, fmt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def render_image(vacancy_title: str, department: str, salary: str, fmt: str) -> bytes:
+    img = get_base_template().copy()
+    draw = ImageDraw.Draw(img)
+    title_font, dept_font, _ = get_fonts()
+
+    y_position = 250
+    for line in wrap_text(vacancy_title, title_font, TITLE_MAX_WIDTH)[:TITLE_MAX_LINES]:
+        draw.text((TEXT_X, y_position), line, font=title_font, fill='#1e293b')
+        y_position += 80
+
+    if department:
+        draw.text((TEXT_X, y_position + 20), department, font=dept_font, fill='#64748b')
+
+    if salary:
+        draw.text((TEXT_X, y_position + 80), f'💰 {salary}', font=dept_font, fill='#16a34a')
+
+    return encode_image(img, fmt)
+
+
+def get_image(key: str, vacancy_title: str, department: str, salary: str, fmt: str) -> tuple:
+    """Память → хранилище → рендер. Возвращает (bytes, источник)."""
+    data = MEMORY_CACHE.get(key)
+    if data is not None:
+        return data, 'memory'
+    content_type, ext = OUTPUT_FORMATS[fmt]
+    storage_key = f'{RENDER_PREFIX}/{key[:2]}/{key}.{ext}'
+    data = STORAGE.get(storage_key) if STORAGE else None
+    source = 'storage'
+    if data is None:
+        data = render_image(vacancy_title, department, salary, fmt)
+        source = 'render'
+        if STORAGE:
+            try:
+                STORAGE.put(storage_key, data, content_type)
+            except Exception as e:
+                print(f'og-image cache put failed: {e}')
+    MEMORY_CACHE.put(key, data)
+    return data, source
+
 
 def handler(event: dict, context) -> dict:
     '''Генерация Open Graph изображения для вакансии'''
-    
+
     method = event.get('httpMethod', 'GET')
-    
+
     if method == 'OPTIONS':
         return {
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
+                'Access-Control-Allow-Headers': 'Content-Type, If-None-Match'
             },
             'body': '',
             'isBase64Encoded': False
         }
-    
-    query_params = event.get('queryStringParameters', {})
+
+    query_params = event.get('queryStringParameters') or {}
     vacancy_title = query_params.get('title', 'Вакансия')
     department = query_params.get('department', '')
     salary = query_params.get('salary', '')
-    
+
+    request_headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    fmt = choose_format(request_headers.get('accept', ''))
+
+    key = render_key(vacancy_title, department, salary, fmt)
+    etag = f'"{key[:32]}"'
+    cache_headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Cache-Control': 'public, max-age=86400',
+        'ETag': etag,
+        'Vary': 'Accept'
+    }
+
+    # Картинка определяется параметрами целиком — на If-None-Match отвечаем, даже не рендеря
+    if_none_match = request_headers.get('if-none-match', '')
+    if etag in [t.strip().removeprefix('W/') for t in if_none_match.split(',')] or if_none_match.strip() == '*':
+        return {'statusCode': 304, 'headers': cache_headers, 'body': '', 'isBase64Encoded': False}
+
     try:
-        img = Image.new('RGB', (1200, 630), color='#ffffff')
-        draw = ImageDraw.Draw(img)
-        
-        draw.rectangle([(0, 0), (1200, 630)], fill='#f8fafc')
-        draw.rectangle([(40, 40), (1160, 590)], fill='#ffffff', outline='#e2e8f0', width=2)
-        
-        try:
-            title_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 60)
-            dept_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', 36)
-            brand_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 48)
-        except Exception:
-            title_font = ImageFont.load_default()
-            dept_font = ImageFont.load_default()
-            brand_font = ImageFont.load_default()
-        
-        draw.text((80, 80), 'iHUNT', font=brand_font, fill='#3b82f6')
-        
-        title_lines = []
-        words = vacancy_title.split()
-        current_line = ''
-        for word in words:
-            test_line = current_line + ' ' + word if current_line else word
-            if len(test_line) > 25:
-                if current_line:
-                    title_lines.append(current_line)
-                current_line = word
-            else:
-                current_line = test_line
-        if current_line:
-            title_lines.append(current_line)
-        
-        y_position = 250
-        for line in title_lines[:3]:
-            draw.text((80, y_position), line, font=title_font, fill='#1e293b')
-            y_position += 80
-        
-        if department:
-            draw.text((80, y_position + 20), department, font=dept_font, fill='#64748b')
-        
-        if salary:
-            draw.text((80, y_position + 80), f'💰 {salary}', font=dept_font, fill='#16a34a')
-        
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        image_data = base64.b64encode(buffer.read()).decode('utf-8')
-        
+        image_bytes, source = get_image(key, vacancy_title, department, salary, fmt)
+        image_data = base64.b64encode(image_bytes).decode('utf-8')
+
         return {
             'statusCode': 200,
             'headers': {
-                'Content-Type': 'image/png',
-                'Access-Control-Allow-Origin': '*',
-                'Cache-Control': 'public, max-age=86400'
+                'Content-Type': OUTPUT_FORMATS[fmt][0],
+                'X-Render-Cache': source,
+                **cache_headers
             },
             'body': image_data,
             'isBase64Encoded': True
         }
-        
+
     except Exception as e:
         return {
             'statusCode': 500,
@@ -94,4 +354,4 @@ def handler(event: dict, context) -> dict:
             },
             'body': json.dumps({'error': str(e)}),
             'isBase64Encoded': False
-        }
\ No newline at end of file
+        }
@@ -2,11 +2,22 @@
 Прокси для Open Graph мета-тегов вакансий iHUNT.
 Боты соцсетей (VK, Telegram, Facebook) получают статичный HTML с мета-тегами,
 браузеры — редирект на React SPA.
+HTML заранее лежит в og_pages (POST ?action=prerender); чего там нет — строится на лету.
 """
 
+import hmac
 import json
 import os
+import re
+import threading
+import time
+import urllib.parse
 import urllib.request
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2.extras import execute_values
+from http_response import http_response
 
 API_URL = 'https://functions.poehali.dev/fad87b35-32bf-4090-9a18-d8ecce13f24a'
 BLOG_API_URL = 'https://functions.poehali.dev/24adc9a7-714f-4df9-a6b0-3874d99d1577'
@@ -17,6 +28,14 @@ REFERRAL_IMAGE = 'https://cdn.poehali.dev/projects/8d04a195-3369-41af-824b-a8333
 EMPLOYEE_IMAGE = 'https://cdn.poehali.dev/projects/8d04a195-3369-41af-824b-a8333098d2fe/bucket/1a4f08a4-f047-444f-aab6-82e0357b0c94.jpg'
 BLOG_IMAGE = 'https://i-hunt.ru/blog-og-image.png'
 
+SCHEMA = os.environ.get('MAIN_DB_SCHEMA', 't_p65890965_refstaff_project')
+
+# Шаринг ссылки в чат — десятки заходов ботов за секунды; правки вакансий доходят через TTL
+META_TTL = 300
+NEGATIVE_TTL = 60
+META_CACHE_MAX = 2048
+HTML_CACHE_MAX = 2048
+
 BOT_AGENTS = [
     'vkshare', 'facebookexternalhit', 'twitterbot', 'telegrambot',
     'whatsapp', 'linkedinbot', 'slackbot', 'discordbot', 'bot',
@@ -35,6 +54,95 @@ def is_bot(user_agent: str) -> bool:
     return any(b in ua for b in BOT_AGENTS)
 
 
+class TTLCache:
+    """LRU в памяти инстанса с собственным сроком жизни у каждой записи."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def put(self, key, value, ttl: float):
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+# Пустой dict — закешированное «не найдено», None — промах кеша
+META_CACHE = TTLCache(META_CACHE_MAX)
+HTML_CACHE = TTLCache(HTML_CACHE_MAX)
+
+_db_conn = None
+_db_lock = threading.Lock()
+
+
+def get_db():
+    """Одно соединение на инстанс функции; переоткрывается, если оборвалось."""
+    global _db_conn
+    if _db_conn is None or _db_conn.closed:
+        _db_conn = psycopg2.connect(os.environ['DATABASE_URL'])
+        _db_conn.autocommit = True
+    return _db_conn
+
+
+def query_one(sql: str, params: tuple) -> dict:
+    global _db_conn
+    with _db_lock:
+        try:
+            with get_db().cursor() as cur:
+                cur.execute(sql, params)
+                row = cur.fetchone()
+                columns = [d[0] for d in cur.description]
+        except psycopg2.Error:
+            if _db_conn is not None:
+                _db_conn.close()
+            _db_conn = None
+            raise
+    return dict(zip(columns, row)) if row else {}
+
+
+def fix_encoding(text: str) -> str:
+    """Как в blog-posts: убирает U+FFFD, оставшиеся от обрезки UTF-8."""
+    return re.sub(r'\ufffd+', '', text)
+
+
+def db_blog_post(slug: str) -> dict:
+    row = query_one(
+        f'SELECT title, meta_description FROM {SCHEMA}.blog_posts WHERE slug=%s AND is_published=TRUE',
+        (slug,)
+    )
+    if not row:
+        return {}
+    return {'title': fix_encoding(row['title'] or ''), 'metaDescription': fix_encoding(row['meta_description'] or '')}
+
+
+def db_vacancy(column: str, value: str) -> dict:
+    if column == 'id' and not value.isdigit():
+        return {}
+    return query_one(
+        f'SELECT id, title, department, salary_display, requirements FROM {SCHEMA}.vacancies WHERE {column} = %s',
+        (int(value) if column == 'id' else value,)
+    )
+
+
 def fetch_blog_post(slug: str) -> dict:
     url = f'{BLOG_API_URL}?action=get&slug={slug}'
     req = urllib.request.Request(url)
@@ -59,6 +167,163 @@ def fetch_vacancy_by_token(token: str) -> dict:
     return data if isinstance(data, dict) and data.get('id') else {}
 
 
+def load_meta(page_type: str, key: str) -> dict:
+    """Метаданные страницы: кеш → БД напрямую → HTTP к api/blog-posts (если БД недоступна)."""
+    cache_key = (page_type, key)
+    meta = META_CACHE.get(cache_key)
+    if meta is not None:
+        return meta
+    try:
+        if not os.environ.get('DATABASE_URL'):
+            raise RuntimeError('DATABASE_URL is not set')
+        if page_type == 'blog':
+            meta = db_blog_post(key)
+        elif page_type == 'vacancy':
+            meta = db_vacancy('id', key)
+        else:
+            meta = db_vacancy('referral_token', key)
+    except Exception as e:
+        print(f'og-proxy db read failed, falling back to http: {e}')
+        if page_type == 'blog':
+            meta = fetch_blog_post(key)
+        elif page_type == 'vacancy':
+            meta = fetch_vacancy_by_id(key)
+        else:
+            meta = fetch_vacancy_by_token(key)
+    META_CACHE.put(cache_key, meta, META_TTL if meta else NEGATIVE_TTL)
+    return meta
+
+
+def render_page(page_type: str, page_id: str, meta: dict) -> str:
+    """HTML страницы без ?ref — общий для ответа на лету и для предрендера."""
+    if page_type == 'blog':
+        redirect_url = f'{APP_URL}/blog/{page_id}'
+        if meta:
+            title = f'{meta.get("title", "Статья")} | Блог iHUNT'
+            description = meta.get('metaDescription', 'Экспертные статьи о реферальном рекрутинге и HR от iHUNT')
+        else:
+            title = 'Блог iHUNT — статьи о реферальном рекрутинге и HR'
+            description = 'Экспертные статьи о реферальном найме, HR-автоматизации и снижении стоимости подбора персонала.'
+        return build_html(title, description, BLOG_IMAGE, redirect_url, redirect_url)
+
+    if page_type == 'vacancy':
+        redirect_url = f'{APP_URL}/vacancy/{page_id}'
+        image = VACANCY_IMAGE
+    else:
+        redirect_url = f'{APP_URL}/r/{page_id}'
+        image = REFERRAL_IMAGE
+
+    if meta:
+        title = f'{meta.get("title", "Вакансия")} — {meta.get("department", "")} | iHUNT'
+        salary = meta.get('salary_display', '')
+        requirements = meta.get('requirements', '') or ''
+        description = requirements[:160] if requirements else f'Вакансия {meta.get("title", "")}. Заработная плата: {salary}'
+    else:
+        title = 'Вакансия | iHUNT'
+        description = 'Реферальный рекрутинг — нанимайте лучших через рекомендации сотрудников'
+
+    return build_html(title, description, image, redirect_url, redirect_url)
+
+
+def with_ref(html: str, token: str, ref: str) -> str:
+    """Подставляет ?ref= в ссылки реферальной страницы: в хранилище она одна на токен."""
+    base = f'{APP_URL}/r/{token}"'
+    return html.replace(base, f'{APP_URL}/r/{token}?ref={urllib.parse.quote(ref, safe="")}"')
+
+
+def stored_page(page_type: str, page_id: str) -> str | None:
+    if not os.environ.get('DATABASE_URL'):
+        return None
+    try:
+        row = query_one(
+            f'SELECT html FROM {SCHEMA}.og_pages WHERE page_type=%s AND page_id=%s',
+            (page_type, page_id)
+        )
+    except Exception as e:
+        print(f'og-proxy store read failed: {e}')
+        return None
+    return row.get('html')
+
+
+VACANCY_PAGE_COLUMNS = 'id, title, department, salary_display, requirements, referral_token, status'
+UPSERT_PAGES = (
+    f'INSERT INTO {SCHEMA}.og_pages (page_type, page_id, html) VALUES %s '
+    f'ON CONFLICT (page_type, page_id) DO UPDATE SET html = EXCLUDED.html, updated_at = CURRENT_TIMESTAMP'
+)
+
+
+def vacancy_pages(row: dict) -> list:
+    pages = [('vacancy', str(row['id']), render_page('vacancy', str(row['id']), row))]
+    if row.get('referral_token'):
+        pages.append(('referral', row['referral_token'], render_page('referral', row['referral_token'], row)))
+    return pages
+
+
+def prerender_all() -> dict:
+    """Полная пересборка хранилища одной транзакцией: боты до коммита видят прежние страницы."""
+    with _db_lock:
+        conn = get_db()
+        try:
+            conn.autocommit = False
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT {VACANCY_PAGE_COLUMNS} FROM {SCHEMA}.vacancies WHERE status = 'active'")
+                columns = [d[0] for d in cur.description]
+                pages = []
+                for row in cur.fetchall():
+                    pages.extend(vacancy_pages(dict(zip(columns, row))))
+                cur.execute(f'SELECT slug, title, meta_description FROM {SCHEMA}.blog_posts WHERE is_published=TRUE')
+                posts = cur.fetchall()
+                for slug, title, meta_description in posts:
+                    meta = {'title': fix_encoding(title or ''), 'metaDescription': fix_encoding(meta_description or '')}
+                    pages.append(('blog', slug, render_page('blog', slug, meta)))
+                cur.execute(f'DELETE FROM {SCHEMA}.og_pages')
+                execute_values(cur, UPSERT_PAGES, pages, page_size=500)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.autocommit = True
+    return {'pages': len(pages), 'posts': len(posts)}
+
+
+def prerender_pages(pages: list) -> dict:
+    """Точечная пересборка: [{'type': 'vacancy', 'id': 12}, {'type': 'blog', 'id': 'slug'}].
+    Неактивная вакансия или снятая статья удаляются из хранилища."""
+    upserts, deletes = [], []
+    for page in pages:
+        page_type, page_id = page.get('type'), str(page.get('id') or '')
+        if page_type == 'vacancy' and page_id.isdigit():
+            row = query_one(f'SELECT {VACANCY_PAGE_COLUMNS} FROM {SCHEMA}.vacancies WHERE id = %s', (int(page_id),))
+            if row and row['status'] == 'active':
+                upserts.extend(vacancy_pages(row))
+            else:
+                deletes.append(('vacancy', page_id))
+                if row and row.get('referral_token'):
+                    deletes.append(('referral', row['referral_token']))
+        elif page_type == 'blog' and page_id:
+            post = db_blog_post(page_id)
+            if post:
+                upserts.append(('blog', page_id, render_page('blog', page_id, post)))
+            else:
+                deletes.append(('blog', page_id))
+    with _db_lock:
+        with get_db().cursor() as cur:
+            if upserts:
+                execute_values(cur, UPSERT_PAGES, upserts)
+            if deletes:
+                execute_values(cur, f'DELETE FROM {SCHEMA}.og_pages WHERE (page_type, page_id) IN (VALUES %s)', deletes)
+    return {'updated': len(upserts), 'deleted': len(deletes)}
+
+
+def html_response(html: str, max_age: int) -> dict:
+    return {
+        'statusCode': 200,
+        'headers': {**CORS_HEADERS, 'Content-Type': 'text/html; charset=utf-8', 'Cache-Control': f'public, max-age={max_age}'},
+        'body': html
+    }
+
+
 def build_html(title: str, description: str, image: str, url: str, redirect_url: str) -> str:
     return f'''<!DOCTYPE html>
 <html lang="ru">
@@ -87,6 +352,7 @@ def build_html(title: str, description: str, image: str, url: str, redirect_url:
 </html>'''
 
 
+@http_response()
 def handler(event: dict, context) -> dict:
     """Прокси OG-мета-тегов для ботов соцсетей — вакансии и рефералы"""
 
@@ -100,6 +366,33 @@ def handler(event: dict, context) -> dict:
     page_type = query.get('type', '')
     page_id = query.get('id', '')
 
+    if event.get('httpMethod') == 'POST' and query.get('action') == 'prerender':
+        secret = headers.get('X-Admin-Secret') or headers.get('x-admin-secret') or ''
+        if not os.environ.get('ADMIN_SECRET') or not hmac.compare_digest(secret, os.environ['ADMIN_SECRET']):
+            return {
+                'statusCode': 403,
+                'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
+                'body': json.dumps({'error': 'forbidden'})
+            }
+        try:
+            body = json.loads(event.get('body') or '{}')
+            pages = body.get('pages')
+            result = prerender_pages(pages) if pages else prerender_all()
+        except Exception as e:
+            return {
+                'statusCode': 500,
+                'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
+                'body': json.dumps({'error': str(e)})
+            }
+        # Кеши этого инстанса сбрасываем сразу, остальные догонят по TTL
+        HTML_CACHE.clear()
+        META_CACHE.clear()
+        return {
+            'statusCode': 200,
+            'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
+            'body': json.dumps(result)
+        }
+
     if not page_type:
         return {
             'statusCode': 400,
@@ -108,24 +401,6 @@ def handler(event: dict, context) -> dict:
         }
 
     try:
-        if page_type == 'blog':
-            slug = query.get('id', '')
-            redirect_url = f'{APP_URL}/blog/{slug}'
-            post = fetch_blog_post(slug) if slug else {}
-            if post:
-                title = f'{post.get("title", "Статья")} | Блог iHUNT'
-                description = post.get('metaDescription', 'Экспертные статьи о реферальном рекрутинге и HR от iHUNT')
-            else:
-                title = 'Блог iHUNT — статьи о реферальном рекрутинге и HR'
-                description = 'Экспертные статьи о реферальном найме, HR-автоматизации и снижении стоимости подбора персонала.'
-            image = BLOG_IMAGE
-            html = build_html(title, description, image, redirect_url, redirect_url)
-            return {
-                'statusCode': 200,
-                'headers': {**CORS_HEADERS, 'Content-Type': 'text/html; charset=utf-8', 'Cache-Control': 'public, max-age=3600'},
-                'body': html
-            }
-
         if page_type == 'employee':
             token = query.get('id', '')
             redirect_url = f'{APP_URL}/employee-register' + (f'?token={token}' if token else '')
@@ -133,28 +408,18 @@ def handler(event: dict, context) -> dict:
             description = 'Зарегистрируйся и рекомендуй вакансии своим знакомым — получай денежное вознаграждение за каждого успешного кандидата.'
             image = EMPLOYEE_IMAGE
             html = build_html(title, description, image, redirect_url, redirect_url)
-            return {
-                'statusCode': 200,
-                'headers': {**CORS_HEADERS, 'Content-Type': 'text/html; charset=utf-8', 'Cache-Control': 'public, max-age=300'},
-                'body': html
-            }
+            return html_response(html, 300)
 
-        if not page_id:
+        if page_type == 'blog':
+            max_age = 3600
+        elif not page_id:
             return {
                 'statusCode': 400,
                 'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
                 'body': json.dumps({'error': 'id is required'})
             }
-
-        if page_type == 'vacancy':
-            vacancy = fetch_vacancy_by_id(page_id)
-            redirect_url = f'{APP_URL}/vacancy/{page_id}'
-            image = VACANCY_IMAGE
-        elif page_type == 'referral':
-            ref_param = query.get('ref', '')
-            vacancy = fetch_vacancy_by_token(page_id)
-            redirect_url = f'{APP_URL}/r/{page_id}' + (f'?ref={ref_param}' if ref_param else '')
-            image = REFERRAL_IMAGE
+        elif page_type in ('vacancy', 'referral'):
+            max_age = 300
         else:
             return {
                 'statusCode': 400,
@@ -162,31 +427,28 @@ def handler(event: dict, context) -> dict:
                 'body': json.dumps({'error': 'unknown type'})
             }
 
-        if vacancy:
-            title = f'{vacancy.get("title", "Вакансия")} — {vacancy.get("department", "")} | iHUNT'
-            salary = vacancy.get('salary_display', '')
-            requirements = vacancy.get('requirements', '') or ''
-            description = requirements[:160] if requirements else f'Вакансия {vacancy.get("title", "")}. Заработная плата: {salary}'
-        else:
-            title = 'Вакансия | iHUNT'
-            description = 'Реферальный рекрутинг — нанимайте лучших через рекомендации сотрудников'
+        # Готовый HTML по type+id(+ref): повторные заходы ботов не строят страницу заново
+        ref_param = query.get('ref', '') if page_type == 'referral' else ''
+        html_key = (page_type, page_id, ref_param)
+        html = HTML_CACHE.get(html_key)
+        if html is not None:
+            return html_response(html, max_age)
 
-        canonical_url = redirect_url
-        html = build_html(title, description, image, canonical_url, redirect_url)
+        html = stored_page(page_type, page_id) if page_id else None
+        found = html is not None
+        if html is None:
+            meta = load_meta(page_type, page_id) if page_id else {}
+            found = bool(meta)
+            html = render_page(page_type, page_id, meta)
+        if ref_param:
+            html = with_ref(html, page_id, ref_param)
 
-        return {
-            'statusCode': 200,
-            'headers': {
-                **CORS_HEADERS,
-                'Content-Type': 'text/html; charset=utf-8',
-                'Cache-Control': 'public, max-age=300'
-            },
-            'body': html
-        }
+        HTML_CACHE.put(html_key, html, META_TTL if found else NEGATIVE_TTL)
+        return html_response(html, max_age)
 
     except Exception as e:
         return {
             'statusCode': 500,
             'headers': {**CORS_HEADERS, 'Content-Type': 'application/json'},
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
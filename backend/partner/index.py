@@ -11,7 +11,9 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime, timedelta
 import urllib.request
-import requests as http_requests
+import time
+from messenger import MessengerClient, MessengerError
+from http_response import http_response
 
 CORS_HEADERS = {
     'Access-Control-Allow-Origin': '*',
@@ -71,20 +73,22 @@ def generate_token(n=16) -> str:
     return os.urandom(n).hex()
 
 
+MESSENGER = MessengerClient()
+
+
 def tg_send(token: str, chat_id: int, text: str):
     url = f'https://api.telegram.org/bot{token}/sendMessage'
     payload = {'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'}
-    data = json.dumps(payload).encode()
-    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
-    with urllib.request.urlopen(req, timeout=10) as r:
-        return json.loads(r.read())
+    return MESSENGER.post(token, chat_id, url, payload)
 
 
 def max_send(token: str, user_id: int, text: str):
     url = f'{MAX_API}/messages?user_id={user_id}'
-    headers = {'Authorization': token, 'Content-Type': 'application/json'}
-    r = http_requests.post(url, json={'text': text}, headers=headers, timeout=10)
-    return r.json()
+    try:
+        return MESSENGER.post(token, user_id, url, {'text': text}, headers={'Authorization': token})
+    except MessengerError as e:
+        print(f'max_send failed: {e}')
+        return {}
 
 
 def notify_partner(partner: dict, tg_bot_token: str, max_bot_token: str, msg: str):
@@ -142,6 +146,7 @@ def resp(status: int, body: dict):
     return {'statusCode': status, 'headers': CORS_HEADERS, 'body': json.dumps(body, ensure_ascii=False, default=str)}
 
 
+@http_response()
 def handler(event: dict, context) -> dict:
     """Партнёрская программа: вход через Telegram/MAX, рефералы с комиссией, профиль с реквизитами."""
     if event.get('httpMethod') == 'OPTIONS':
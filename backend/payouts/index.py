@@ -12,10 +12,14 @@ from typing import Dict, Any
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import urllib.request
+from messenger import MessengerClient
+from http_response import http_response
 
 NOTIFY_URL = 'https://functions.poehali.dev/3c081b85-b149-4f98-a70a-f773cb440d06'
 TG_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
 
+MESSENGER = MessengerClient()
+
 def send_notification(payload):
     try:
         data = json.dumps(payload).encode('utf-8')
@@ -29,10 +33,8 @@ def tg_notify(chat_id, text: str):
     if not chat_id or not TG_BOT_TOKEN:
         return
     try:
-        url = f'https://api.telegram.org/bot{TG_BOT_TOKEN}/sendMessage'
-        data = json.dumps({'chat_id': int(chat_id), 'text': text, 'parse_mode': 'HTML'}).encode()
-        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
-        urllib.request.urlopen(req, timeout=5)
+        MESSENGER.post(TG_BOT_TOKEN, chat_id, f'https://api.telegram.org/bot{TG_BOT_TOKEN}/sendMessage',
+                       {'chat_id': int(chat_id), 'text': text, 'parse_mode': 'HTML'})
     except Exception:
         pass
 
@@ -42,6 +44,7 @@ def get_db_connection():
     conn.autocommit = True
     return conn
 
+@http_response()
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method = event.get('httpMethod', 'GET')
     
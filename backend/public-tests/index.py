@@ -11,6 +11,7 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from http_response import http_response
 
 SCHEMA = 't_p65890965_refstaff_project'
 POLZA_BASE_URL = 'https://api.polza.ai/api/v1'
@@ -203,6 +204,11 @@ def send_result_email(to_email, job_title, candidate_name, candidate_phone,
         server.send_message(msg)
 
 
+def cache_policy(event: dict) -> str:
+    return 'private, no-cache' if event.get('httpMethod') == 'GET' else 'no-store'
+
+
+@http_response(cache_policy)
 def handler(event: dict, context) -> dict:
     """Публичные тесты: генерация, редактирование, прохождение кандидатом, PDF на почту."""
 
@@ -6,7 +6,9 @@ import psycopg2
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from http_response import http_response
 
+@http_response()
 def handler(event: dict, context) -> dict:
     '''API для запроса восстановления пароля - отправляет ссылку на email'''
     
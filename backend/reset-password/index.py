@@ -4,7 +4,9 @@ import hashlib
 import hmac
 from datetime import datetime
 import psycopg2
+from http_response import http_response
 
+@http_response()
 def handler(event: dict, context) -> dict:
     '''API для сброса пароля по токену из email'''
     
@@ -5,8 +5,10 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
 from typing import Dict, Any
+from http_response import http_response
 
 
+@http_response()
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     API для отправки email писем с подтверждением регистрации.
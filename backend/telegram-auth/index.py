@@ -12,13 +12,19 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime, timedelta
 import urllib.request
+import time
+from messenger import MessengerClient
 import hashlib
 import hmac
 import base64
+from http_response import http_response
 
 DB_SCHEMA = 't_p65890965_refstaff_project'
 
 
+MESSENGER = MessengerClient()
+
+
 def get_db():
     return psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=RealDictCursor)
 
@@ -28,11 +34,8 @@ def tg_send(token: str, chat_id: int, text: str, reply_markup: dict = None):
     payload = {'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'}
     if reply_markup:
         payload['reply_markup'] = reply_markup
-    data = json.dumps(payload).encode()
-    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
     try:
-        with urllib.request.urlopen(req, timeout=8) as resp:
-            return json.loads(resp.read())
+        return MESSENGER.post(token, chat_id, url, payload)
     except Exception as e:
         print(f'tg_send failed: {e}')
         return None
@@ -87,6 +90,7 @@ def resp(status: int, body: dict):
     }
 
 
+@http_response()
 def handler(event: dict, context) -> dict:
     if event.get('httpMethod') == 'OPTIONS':
         return {'statusCode': 200, 'headers': cors_headers(), 'body': ''}
@@ -1,49 +1,184 @@
 import json
 import os
+import io
 import base64
-import uuid
+import binascii
+import hashlib
 import boto3
+from botocore.exceptions import BotoCoreError, ClientError
 import psycopg2
 import psycopg2.extras
+from PIL import Image, ImageOps
+from http_response import http_response
+from batch_migrate import migrate_batch, parse_after_id
 
+AVATAR_SIZES = (64, 256)
+AVATAR_MAIN_SIZE = 256
+AVATAR_PREFIX = 'avatars'
+BACKFILL_BATCH = 20
+SCHEMA = os.environ.get('MAIN_DB_SCHEMA', 't_p65890965_refstaff_project')
 
+CORS_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+
+class S3AvatarStorage:
+    """Бакет poehali.dev; клиент создаётся один раз на инстанс функции."""
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client(
+                's3',
+                endpoint_url='https://bucket.poehali.dev',
+                aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+                aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
+            )
+        return self._client
+
+    def put(self, key: str, data: bytes, content_type: str):
+        self.client.put_object(Bucket='files', Key=key, Body=data, ContentType=content_type,
+                               CacheControl='public, max-age=31536000, immutable')
+
+    def url(self, key: str) -> str:
+        return f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{key}"
+
+
+class LocalAvatarStorage:
+    """Хранилище на локальном диске — для тестов и локального запуска."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def put(self, key: str, data: bytes, content_type: str):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def url(self, key: str) -> str:
+        return f'{self.base_url}/{key}'
+
+
+if os.environ.get('AVATAR_STORAGE') == 'local':
+    STORAGE = LocalAvatarStorage(
+        os.environ.get('AVATAR_LOCAL_DIR', '/tmp/avatars'),
+        os.environ.get('AVATAR_LOCAL_URL', 'file:///tmp/avatars')
+    )
+else:
+    STORAGE = S3AvatarStorage()
+
+
+def make_thumbnails(image_bytes: bytes) -> dict:
+    """Квадратные WebP-миниатюры {размер: bytes}; исходник кадрируется по центру."""
+    img = Image.open(io.BytesIO(image_bytes))
+    img = ImageOps.exif_transpose(img)
+    img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    thumbs = {}
+    for size in AVATAR_SIZES:
+        thumb = ImageOps.fit(img, (size, size), method=Image.LANCZOS)
+        buffer = io.BytesIO()
+        thumb.save(buffer, format='WEBP', quality=82, method=4)
+        thumbs[size] = buffer.getvalue()
+    return thumbs
+
+
+def store_avatar(image_bytes: bytes) -> dict:
+    """Сохраняет миниатюры по ключу из SHA-256 исходника, возвращает {размер: url}."""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    urls = {}
+    for size, data in make_thumbnails(image_bytes).items():
+        key = f'{AVATAR_PREFIX}/{digest[:2]}/{digest}_{size}.webp'
+        STORAGE.put(key, data, 'image/webp')
+        urls[size] = STORAGE.url(key)
+    return urls
+
+
+def decode_image_data(image_data: str) -> bytes:
+    """Принимает data URL или «голый» base64; на битых данных — binascii.Error/ValueError."""
+    if not isinstance(image_data, str):
+        raise ValueError('image_data must be a string')
+    b64 = image_data.split(',', 1)[1] if ',' in image_data else image_data
+    return base64.b64decode(b64, validate=True)
+
+
+def backfill(cur, after_id: int, batch: int) -> dict:
+    """Конвертирует аватары, сохранённые data URL в users.avatar_url, в WebP-миниатюры (id > after_id)."""
+    def convert(row):
+        return (store_avatar(decode_image_data(row['avatar_url']))[AVATAR_MAIN_SIZE],)
+
+    result = migrate_batch(
+        cur,
+        f"SELECT id, avatar_url FROM {SCHEMA}.users WHERE avatar_url LIKE 'data:%%' AND id > %s ORDER BY id LIMIT %s",
+        f"UPDATE {SCHEMA}.users SET avatar_url = %s WHERE id = %s",
+        f"SELECT COUNT(*) as cnt FROM {SCHEMA}.users WHERE avatar_url LIKE 'data:%%' AND id > %s",
+        convert, after_id, batch
+    )
+    return {'converted': result.pop('migrated'), **result}
+
+
+@http_response()
 def handler(event: dict, context) -> dict:
-    """Загрузка аватара пользователя в S3 и обновление avatar_url в БД"""
+    """Загрузка аватара: WebP-миниатюры 64/256 px в S3, в avatar_url — короткая ссылка"""
     if event.get('httpMethod') == 'OPTIONS':
         return {'statusCode': 200, 'headers': {'Access-Control-Allow-Origin': '*', 'Access-Control-Allow-Methods': 'POST, OPTIONS', 'Access-Control-Allow-Headers': 'Content-Type', 'Access-Control-Max-Age': '86400'}, 'body': ''}
 
     body = json.loads(event.get('body') or '{}')
+    params = event.get('queryStringParameters') or {}
+
+    # POST ?action=backfill — перенос старых data URL аватаров;
+    # вызывать с after_id = last_id прошлого ответа, пока remaining > 0
+    if params.get('action') == 'backfill':
+        if not os.environ.get('ADMIN_SECRET') or body.get('admin_secret') != os.environ.get('ADMIN_SECRET'):
+            return {'statusCode': 403, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'forbidden'})}
+        batch = body.get('batch', BACKFILL_BATCH)
+        if isinstance(batch, bool) or not isinstance(batch, int) or batch < 1:
+            return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'batch must be a positive integer'})}
+        after_id = parse_after_id(body.get('after_id'))
+        if after_id is None:
+            return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'after_id must be a non-negative integer'})}
+        conn = psycopg2.connect(os.environ['DATABASE_URL'])
+        conn.autocommit = True
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        result = backfill(cur, after_id, min(batch, 100))
+        cur.close()
+        conn.close()
+        return {'statusCode': 200, 'headers': CORS_HEADERS, 'body': json.dumps(result)}
+
     user_id = body.get('user_id')
     image_data = body.get('image_data')  # base64 строка (data:image/jpeg;base64,...)
 
     if not user_id or not image_data:
-        return {'statusCode': 400, 'headers': {'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'user_id and image_data required'})}
-
-    # Разбираем base64
-    if ',' in image_data:
-        header, b64 = image_data.split(',', 1)
-        content_type = header.split(':')[1].split(';')[0] if ':' in header else 'image/jpeg'
-    else:
-        b64 = image_data
-        content_type = 'image/jpeg'
+        return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'user_id and image_data required'})}
 
-    ext = content_type.split('/')[-1].replace('jpeg', 'jpg')
-    image_bytes = base64.b64decode(b64)
+    try:
+        image_bytes = decode_image_data(image_data)
+    except (binascii.Error, ValueError):
+        return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'image_data is not valid base64'})}
 
     # Ограничение 2MB
     if len(image_bytes) > 2 * 1024 * 1024:
-        return {'statusCode': 400, 'headers': {'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'error': 'Image too large, max 2MB'})}
+        return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'Image too large, max 2MB'})}
 
-    # Сохраняем как data URL прямо в БД (S3 недоступен)
-    cdn_url = f"data:{content_type};base64,{b64}"
+    try:
+        urls = store_avatar(image_bytes)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'Invalid image'})}
+    except (BotoCoreError, ClientError):
+        return {'statusCode': 502, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'Avatar storage unavailable'})}
 
-    # Сохраняем URL в БД
-    schema = os.environ.get('MAIN_DB_SCHEMA', 't_p65890965_refstaff_project')
+    # В БД — только короткая ссылка на миниатюру 256 px
     conn = psycopg2.connect(os.environ['DATABASE_URL'])
     conn.autocommit = True
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute(f"UPDATE {schema}.users SET avatar_url = %s WHERE id = %s", (cdn_url, user_id))
+    cur.execute(f"UPDATE {SCHEMA}.users SET avatar_url = %s WHERE id = %s", (urls[AVATAR_MAIN_SIZE], user_id))
     cur.close()
     conn.close()
 
-    return {'statusCode': 200, 'headers': {'Access-Control-Allow-Origin': '*'}, 'body': json.dumps({'avatar_url': cdn_url})}
\ No newline at end of file
+    return {'statusCode': 200, 'headers': CORS_HEADERS, 'body': json.dumps({
+        'avatar_url': urls[AVATAR_MAIN_SIZE],
+        'thumbnails': {str(size): url for size, url in urls.items()},
+    })}
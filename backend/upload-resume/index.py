@@ -1,21 +1,220 @@
 """
 Загрузка резюме кандидата.
-Принимает файл в base64, сохраняет в БД и возвращает data URL для хранения.
+Принимает файл в base64 (целиком или частями), кладёт в S3 по ключу из SHA-256
+содержимого и возвращает короткую ссылку для recommendations.resume_url.
 Args: event - dict с httpMethod, body (base64 файл + имя)
+      POST ?action=chunk — загрузка частями до 2 МБ: upload_id, chunk_index, total_chunks, chunk_data
 Returns: JSON с resume_url
 """
 
 import json
 import os
+import re
 import base64
-import uuid
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email.mime.text import MIMEText
-from email import encoders
+import binascii
+import hashlib
+import boto3
+from botocore.exceptions import ClientError
+from http_response import http_response
 
+RESUME_PREFIX = 'resumes'
+CHUNK_PREFIX = 'resume-uploads'
+MAX_RESUME_SIZE = 20 * 1024 * 1024
+MAX_CHUNKS = 64
+MAX_CHUNK_SIZE = 2 * 1024 * 1024  # тело запроса облачной функции ограничено ~3.5 МБ, base64 даёт +33%
 
+CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'doc': 'application/msword',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+UNSUPPORTED_TYPE = f'file_name must end with .{", .".join(CONTENT_TYPES)}'
+
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'}
+
+
+class S3ResumeStorage:
+    """Бакет poehali.dev; клиент создаётся один раз на инстанс функции."""
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client(
+                's3',
+                endpoint_url='https://bucket.poehali.dev',
+                aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+                aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
+            )
+        return self._client
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket='files', Key=key)
+            return True
+        except Exception:
+            return False
+
+    def put(self, key: str, data: bytes, content_type: str):
+        self.client.put_object(Bucket='files', Key=key, Body=data, ContentType=content_type)
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket='files', Key=key)['Body'].read()
+
+    def list(self, prefix: str) -> list:
+        """[(ключ, размер)] по возрастанию ключа."""
+        resp = self.client.list_objects_v2(Bucket='files', Prefix=prefix)
+        return sorted((obj['Key'], obj['Size']) for obj in resp.get('Contents', []))
+
+    def create_exclusive(self, key: str) -> bool:
+        """Условная запись (If-None-Match: *): True только у того, кто создал объект первым."""
+        try:
+            self.client.put_object(Bucket='files', Key=key, Body=b'', IfNoneMatch='*')
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                return False
+            raise
+
+    def delete(self, keys: list):
+        if keys:
+            self.client.delete_objects(Bucket='files', Delete={'Objects': [{'Key': k} for k in keys]})
+
+    def url(self, key: str) -> str:
+        return f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{key}"
+
+
+class LocalResumeStorage:
+    """Хранилище на локальном диске — для тестов и локального запуска."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.root, key))
+
+    def put(self, key: str, data: bytes, content_type: str):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def get(self, key: str) -> bytes:
+        with open(os.path.join(self.root, key), 'rb') as f:
+            return f.read()
+
+    def list(self, prefix: str) -> list:
+        directory = os.path.join(self.root, os.path.dirname(prefix))
+        if not os.path.isdir(directory):
+            return []
+        keys = [f'{os.path.dirname(prefix)}/{name}' for name in os.listdir(directory)]
+        return sorted((k, os.path.getsize(os.path.join(self.root, k))) for k in keys if k.startswith(prefix))
+
+    def create_exclusive(self, key: str) -> bool:
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def delete(self, keys: list):
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.root, key))
+            except FileNotFoundError:
+                pass
+
+    def url(self, key: str) -> str:
+        return f'{self.base_url}/{key}'
+
+
+if os.environ.get('RESUME_STORAGE') == 'local':
+    STORAGE = LocalResumeStorage(
+        os.environ.get('RESUME_LOCAL_DIR', '/tmp/resumes'),
+        os.environ.get('RESUME_LOCAL_URL', 'file:///tmp/resumes')
+    )
+else:
+    STORAGE = S3ResumeStorage()
+
+
+def resume_ext(file_name) -> str:
+    """Расширение из имени файла клиента ('pdf' без расширения); '' — если его нет в CONTENT_TYPES.
+    Оно попадает в ключ хранилища, поэтому принимаем только известные форматы."""
+    if not isinstance(file_name, str):
+        return ''
+    ext = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else 'pdf'
+    return ext if ext in CONTENT_TYPES else ''
+
+
+def store_resume(file_bytes: bytes, ext: str) -> str:
+    """Кладёт файл по ключу из SHA-256; повторная загрузка того же файла не дублирует объект."""
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    key = f'{RESUME_PREFIX}/{digest[:2]}/{digest}.{ext}'
+    if not STORAGE.exists(key):
+        STORAGE.put(key, file_bytes, CONTENT_TYPES[ext])
+    return STORAGE.url(key)
+
+
+def error(status: int, message: str) -> dict:
+    return {'statusCode': status, 'headers': CORS_HEADERS, 'body': json.dumps({'error': message})}
+
+
+def handle_chunk(body: dict) -> dict:
+    """Принимает одну часть файла; на последней части собирает файл и сохраняет его.
+    Размер проверяется на каждой части: одна часть — не больше MAX_CHUNK_SIZE, все принятые
+    части вместе — не больше MAX_RESUME_SIZE. Сборку выполняет только тот запрос, который
+    первым создал маркер <upload_id>.lock, — параллельные последние части не собирают
+    и не удаляют файл дважды."""
+    upload_id = str(body.get('upload_id', ''))
+    ext = resume_ext(body.get('file_name', 'resume.pdf'))
+    if not ext:
+        return error(400, UNSUPPORTED_TYPE)
+    try:
+        chunk_index = int(body.get('chunk_index'))
+        total_chunks = int(body.get('total_chunks'))
+    except (TypeError, ValueError):
+        return error(400, 'chunk_index and total_chunks are required')
+    if not re.fullmatch(r'[0-9a-f-]{8,64}', upload_id):
+        return error(400, 'upload_id must be a hex/uuid string')
+    if not 0 < total_chunks <= MAX_CHUNKS or not 0 <= chunk_index < total_chunks:
+        return error(400, 'invalid chunk_index/total_chunks')
+    if not body.get('chunk_data'):
+        return error(400, 'chunk_data is required')
+    try:
+        chunk = base64.b64decode(body['chunk_data'], validate=True)
+    except (binascii.Error, ValueError):
+        return error(400, 'chunk_data is not valid base64')
+    if len(chunk) > MAX_CHUNK_SIZE:
+        return error(400, 'Chunk too large, max 2MB')
+
+    part_prefix = f'{CHUNK_PREFIX}/{upload_id}/'
+    STORAGE.put(f'{part_prefix}{chunk_index:05d}', chunk, 'application/octet-stream')
+
+    parts = STORAGE.list(part_prefix)
+    if sum(size for _, size in parts) > MAX_RESUME_SIZE:
+        STORAGE.delete([key for key, _ in parts])
+        return error(400, 'File too large, max 20MB')
+    if len(parts) < total_chunks:
+        return {'statusCode': 200, 'headers': CORS_HEADERS, 'body': json.dumps({'received': len(parts), 'total': total_chunks})}
+
+    lock_key = f'{CHUNK_PREFIX}/{upload_id}.lock'
+    if not STORAGE.create_exclusive(lock_key):
+        return {'statusCode': 409, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'upload is already being finalized'})}
+    try:
+        file_bytes = b''.join(STORAGE.get(key) for key, _ in parts[:total_chunks])
+        resume_url = store_resume(file_bytes, ext)
+        STORAGE.delete([key for key, _ in parts])
+    finally:
+        STORAGE.delete([lock_key])
+    return {'statusCode': 200, 'headers': CORS_HEADERS, 'body': json.dumps({'resume_url': resume_url})}
+
+
+@http_response()
 def handler(event: dict, context) -> dict:
     if event.get('httpMethod') == 'OPTIONS':
         return {
@@ -30,30 +229,28 @@ def handler(event: dict, context) -> dict:
         }
 
     body = json.loads(event.get('body') or '{}')
+    params = event.get('queryStringParameters') or {}
+
+    if params.get('action') == 'chunk':
+        return handle_chunk(body)
+
     file_data = body.get('file_data')
-    file_name = body.get('file_name', 'resume.pdf')
-    candidate_name = body.get('candidate_name', '')
+    ext = resume_ext(body.get('file_name', 'resume.pdf'))
 
     if not file_data:
-        return {
-            'statusCode': 400,
-            'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'file_data is required'})
-        }
+        return error(400, 'file_data is required')
+    if not ext:
+        return error(400, UNSUPPORTED_TYPE)
 
-    ext = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else 'pdf'
-    content_types = {
-        'pdf': 'application/pdf',
-        'doc': 'application/msword',
-        'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-    }
-    content_type = content_types.get(ext, 'application/octet-stream')
-
-    # Формируем data URL для хранения в БД
-    resume_url = f"data:{content_type};base64,{file_data}"
+    try:
+        file_bytes = base64.b64decode(file_data.split(',', 1)[1] if file_data.startswith('data:') else file_data, validate=True)
+    except (binascii.Error, ValueError):
+        return error(400, 'file_data is not valid base64')
+    if len(file_bytes) > MAX_RESUME_SIZE:
+        return error(400, 'File too large, max 20MB')
 
     return {
         'statusCode': 200,
-        'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-        'body': json.dumps({'resume_url': resume_url})
-    }
\ No newline at end of file
+        'headers': CORS_HEADERS,
+        'body': json.dumps({'resume_url': store_resume(file_bytes, ext)})
+    }
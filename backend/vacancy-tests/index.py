@@ -8,6 +8,7 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import urllib.request
+from http_response import http_response
 
 SCHEMA = 't_p65890965_refstaff_project'
 POLZA_BASE_URL = 'https://api.polza.ai/api/v1'
@@ -163,6 +164,11 @@ correct_index — индекс правильного ответа (0-3). Воп
     return parsed.get('questions', [])
 
 
+def cache_policy(event: dict) -> str:
+    return 'private, no-cache' if event.get('httpMethod') == 'GET' else 'no-store'
+
+
+@http_response(cache_policy)
 def handler(event: dict, context) -> dict:
     """CRUD для тестов вакансий: генерация GPT, редактирование, публичное прохождение."""
 
@@ -3,8 +3,10 @@ import os
 import urllib.request
 import urllib.error
 from typing import Optional
+from http_response import http_response
 
 
+@http_response()
 def handler(event: dict, context) -> dict:
     """
     API для проверки ИНН компании через DaData.
@@ -0,0 +1,4 @@
+CREATE INDEX IF NOT EXISTS idx_recommendations_created_id ON t_p65890965_refstaff_project.recommendations(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_recommendations_recommended_by_created_id ON t_p65890965_refstaff_project.recommendations(recommended_by, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_vacancies_company_created_id ON t_p65890965_refstaff_project.vacancies(company_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_created_id ON t_p65890965_refstaff_project.chat_messages(chat_id, created_at, id);
@@ -0,0 +1,2 @@
+ALTER TABLE t_p65890965_refstaff_project.chat_messages ADD COLUMN IF NOT EXISTS attachment_sha256 VARCHAR(64) NULL;
+CREATE INDEX IF NOT EXISTS idx_chat_messages_attachment_sha256 ON t_p65890965_refstaff_project.chat_messages(attachment_sha256) WHERE attachment_sha256 IS NOT NULL;
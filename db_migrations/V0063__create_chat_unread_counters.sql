@@ -0,0 +1,55 @@
+-- Счётчики непрочитанных сообщений по (чат, отправитель).
+-- Непрочитанные для участника = сумма счётчиков остальных отправителей чата.
+CREATE TABLE IF NOT EXISTS t_p65890965_refstaff_project.chat_unread_counters (
+    chat_id INTEGER NOT NULL,
+    sender_id INTEGER NOT NULL,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chat_id, sender_id)
+);
+
+CREATE OR REPLACE FUNCTION t_p65890965_refstaff_project.chat_unread_counters_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO t_p65890965_refstaff_project.chat_unread_counters AS c (chat_id, sender_id, unread_count)
+        SELECT chat_id, sender_id, COUNT(*) FILTER (WHERE is_read = false)
+        FROM new_rows
+        GROUP BY chat_id, sender_id
+        ON CONFLICT (chat_id, sender_id) DO UPDATE SET unread_count = c.unread_count + EXCLUDED.unread_count;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE t_p65890965_refstaff_project.chat_unread_counters c
+        SET unread_count = GREATEST(0, c.unread_count - o.cnt)
+        FROM (
+            SELECT chat_id, sender_id, COUNT(*) FILTER (WHERE is_read = false) AS cnt
+            FROM old_rows
+            GROUP BY chat_id, sender_id
+        ) o
+        WHERE c.chat_id = o.chat_id AND c.sender_id = o.sender_id AND o.cnt > 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS chat_messages_unread_insert ON t_p65890965_refstaff_project.chat_messages;
+CREATE TRIGGER chat_messages_unread_insert
+    AFTER INSERT ON t_p65890965_refstaff_project.chat_messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p65890965_refstaff_project.chat_unread_counters_apply();
+
+DROP TRIGGER IF EXISTS chat_messages_unread_update ON t_p65890965_refstaff_project.chat_messages;
+CREATE TRIGGER chat_messages_unread_update
+    AFTER UPDATE ON t_p65890965_refstaff_project.chat_messages
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p65890965_refstaff_project.chat_unread_counters_apply();
+
+DROP TRIGGER IF EXISTS chat_messages_unread_delete ON t_p65890965_refstaff_project.chat_messages;
+CREATE TRIGGER chat_messages_unread_delete
+    AFTER DELETE ON t_p65890965_refstaff_project.chat_messages
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p65890965_refstaff_project.chat_unread_counters_apply();
+
+INSERT INTO t_p65890965_refstaff_project.chat_unread_counters (chat_id, sender_id, unread_count)
+SELECT chat_id, sender_id, COUNT(*) FILTER (WHERE is_read = false)
+FROM t_p65890965_refstaff_project.chat_messages
+GROUP BY chat_id, sender_id
+ON CONFLICT (chat_id, sender_id) DO UPDATE SET unread_count = EXCLUDED.unread_count;
@@ -0,0 +1,17 @@
+-- Очередь уведомлений (transactional outbox): api пишет сюда в той же транзакции,
+-- что и бизнес-изменение; доставляет POST ?resource=outbox&action=dispatch.
+-- kind: 'company' — notify-company, 'telegram' — сообщение в Telegram.
+-- next_attempt_at у строки в статусе sending — срок аренды: после него строку заберёт следующий dispatch.
+CREATE TABLE IF NOT EXISTS t_p65890965_refstaff_project.notification_outbox (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_due ON t_p65890965_refstaff_project.notification_outbox(next_attempt_at, id) WHERE status IN ('pending', 'sending');
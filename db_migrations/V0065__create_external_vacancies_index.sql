@@ -0,0 +1,47 @@
+-- Локальный индекс вакансий trudvsem для jobs-aggregator.
+-- Наполняется инкрементально (POST ?action=sync), handler отвечает из него без похода во внешний API.
+CREATE TABLE IF NOT EXISTS t_p65890965_refstaff_project.external_vacancies (
+    id VARCHAR(100) PRIMARY KEY,
+    source VARCHAR(20) NOT NULL DEFAULT 'trudvsem',
+    title TEXT NOT NULL,
+    company TEXT NULL,
+    region TEXT NULL,
+    salary_from INTEGER NULL,
+    salary_to INTEGER NULL,
+    salary_text TEXT NULL,
+    experience_years INTEGER NULL,
+    schedule TEXT NULL,
+    is_remote BOOLEAN NOT NULL DEFAULT FALSE,
+    url TEXT NULL,
+    snippet TEXT NULL,
+    positions TEXT[] NOT NULL DEFAULT '{}',
+    published_at DATE NULL,
+    last_seen_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    search tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(company, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(snippet, '')), 'C')
+    ) STORED
+);
+
+CREATE INDEX IF NOT EXISTS idx_external_vacancies_search ON t_p65890965_refstaff_project.external_vacancies USING GIN (search);
+CREATE INDEX IF NOT EXISTS idx_external_vacancies_positions ON t_p65890965_refstaff_project.external_vacancies USING GIN (positions);
+CREATE INDEX IF NOT EXISTS idx_external_vacancies_published ON t_p65890965_refstaff_project.external_vacancies (published_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_external_vacancies_salary ON t_p65890965_refstaff_project.external_vacancies ((COALESCE(salary_to, salary_from)));
+CREATE INDEX IF NOT EXISTS idx_external_vacancies_region ON t_p65890965_refstaff_project.external_vacancies (lower(region) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_external_vacancies_last_seen ON t_p65890965_refstaff_project.external_vacancies (last_seen_at);
+
+-- Прогресс синхронизации по каждой позиции: окно modifiedFrom и страница внутри него,
+-- чтобы большой первичный импорт продолжался со следующего вызова, а не начинался заново.
+-- modified_from IS NULL — полный проход; он повторяется раз в неделю и обновляет last_seen_at
+-- у вакансий, которые давно не менялись.
+CREATE TABLE IF NOT EXISTS t_p65890965_refstaff_project.external_vacancy_sync (
+    source VARCHAR(20) NOT NULL,
+    position VARCHAR(50) NOT NULL,
+    modified_from TIMESTAMP NULL,
+    next_page INTEGER NOT NULL DEFAULT 0,
+    window_started_at TIMESTAMP NULL,
+    synced_at TIMESTAMP NULL,
+    full_synced_at TIMESTAMP NULL,
+    PRIMARY KEY (source, position)
+);
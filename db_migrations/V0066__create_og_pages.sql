@@ -0,0 +1,12 @@
+-- Готовый OG-HTML для ботов соцсетей: og-proxy отвечает одним чтением по ключу.
+-- Полностью пересобирается POST ?action=prerender в og-proxy; точечно — после изменения вакансии
+-- (outbox api, kind 'og_page') и публикации/удаления статьи в blog-posts.
+-- page_type: 'vacancy' (page_id = id), 'referral' (page_id = referral_token), 'blog' (page_id = slug).
+-- Хранятся только активные вакансии и опубликованные статьи, остальное og-proxy строит на лету.
+CREATE TABLE IF NOT EXISTS t_p65890965_refstaff_project.og_pages (
+    page_type VARCHAR(20) NOT NULL,
+    page_id VARCHAR(255) NOT NULL,
+    html TEXT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (page_type, page_id)
+);
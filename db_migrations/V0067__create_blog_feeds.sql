@@ -0,0 +1,9 @@
+-- Готовые RSS и sitemap блога: blog-posts пересобирает их только при генерации и удалении статей,
+-- GET ?action=rss / ?action=sitemap отдают строку отсюда с ETag и Last-Modified.
+-- name: 'rss', 'sitemap' (urlset или sitemapindex), 'sitemap-N' — части sitemap при > 50 000 URL.
+CREATE TABLE IF NOT EXISTS t_p65890965_refstaff_project.blog_feeds (
+    name VARCHAR(50) PRIMARY KEY,
+    body TEXT NOT NULL,
+    etag VARCHAR(64) NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
@@ -0,0 +1,11 @@
+-- Счётчик просмотров на статью: blog-posts копит просмотры в памяти и раз в несколько секунд
+-- сбрасывает их пачкой в blog_post_views (дедупликация по (post_id, session_id)),
+-- прибавляя сюда только реально новые строки. Чтение просмотров — одна строка по ключу.
+CREATE TABLE IF NOT EXISTS t_p65890965_refstaff_project.blog_post_view_counts (
+    post_id INTEGER PRIMARY KEY,
+    views BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO t_p65890965_refstaff_project.blog_post_view_counts (post_id, views)
+SELECT post_id, COUNT(*) FROM t_p65890965_refstaff_project.blog_post_views GROUP BY post_id
+ON CONFLICT (post_id) DO UPDATE SET views = EXCLUDED.views;
@@ -0,0 +1,55 @@
+-- Счётчики реакций по (статья, эмодзи): поддерживаются триггерами в той же транзакции,
+-- что и вставка/смена/удаление реакции, — blog-posts читает их вместо GROUP BY по всем реакциям.
+CREATE TABLE IF NOT EXISTS t_p65890965_refstaff_project.blog_post_reaction_counts (
+    post_id INTEGER NOT NULL,
+    emoji VARCHAR(8) NOT NULL,
+    reaction_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (post_id, emoji)
+);
+
+CREATE OR REPLACE FUNCTION t_p65890965_refstaff_project.blog_post_reaction_counts_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE t_p65890965_refstaff_project.blog_post_reaction_counts c
+        SET reaction_count = GREATEST(0, c.reaction_count - o.cnt)
+        FROM (
+            SELECT post_id, emoji, COUNT(*) AS cnt
+            FROM old_rows
+            GROUP BY post_id, emoji
+        ) o
+        WHERE c.post_id = o.post_id AND c.emoji = o.emoji;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO t_p65890965_refstaff_project.blog_post_reaction_counts AS c (post_id, emoji, reaction_count)
+        SELECT post_id, emoji, COUNT(*)
+        FROM new_rows
+        GROUP BY post_id, emoji
+        ON CONFLICT (post_id, emoji) DO UPDATE SET reaction_count = c.reaction_count + EXCLUDED.reaction_count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS blog_post_reactions_count_insert ON t_p65890965_refstaff_project.blog_post_reactions;
+CREATE TRIGGER blog_post_reactions_count_insert
+    AFTER INSERT ON t_p65890965_refstaff_project.blog_post_reactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p65890965_refstaff_project.blog_post_reaction_counts_apply();
+
+DROP TRIGGER IF EXISTS blog_post_reactions_count_update ON t_p65890965_refstaff_project.blog_post_reactions;
+CREATE TRIGGER blog_post_reactions_count_update
+    AFTER UPDATE ON t_p65890965_refstaff_project.blog_post_reactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p65890965_refstaff_project.blog_post_reaction_counts_apply();
+
+DROP TRIGGER IF EXISTS blog_post_reactions_count_delete ON t_p65890965_refstaff_project.blog_post_reactions;
+CREATE TRIGGER blog_post_reactions_count_delete
+    AFTER DELETE ON t_p65890965_refstaff_project.blog_post_reactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p65890965_refstaff_project.blog_post_reaction_counts_apply();
+
+INSERT INTO t_p65890965_refstaff_project.blog_post_reaction_counts (post_id, emoji, reaction_count)
+SELECT post_id, emoji, COUNT(*)
+FROM t_p65890965_refstaff_project.blog_post_reactions
+GROUP BY post_id, emoji
+ON CONFLICT (post_id, emoji) DO UPDATE SET reaction_count = EXCLUDED.reaction_count;
@@ -0,0 +1,12 @@
+-- Статьи, сгенерированные cron-пачкой blog-posts, но ещё не опубликованные.
+-- Каждая статья пишется сюда сразу после ответа GPT; в конце пачки все черновики одной
+-- транзакцией переносятся в blog_posts. Если функцию оборвал таймаут, черновики остаются
+-- и публикуются следующим вызовом cron — готовые ответы GPT не теряются.
+CREATE TABLE IF NOT EXISTS t_p65890965_refstaff_project.blog_post_drafts (
+    id SERIAL PRIMARY KEY,
+    topic VARCHAR(500) NOT NULL,
+    title VARCHAR(500) NOT NULL,
+    meta_description VARCHAR(500),
+    content TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,11 @@
+-- Полнотекстовый поиск по блогу (GET ?action=search в blog-posts): русская морфология,
+-- вес A — заголовок, B — мета-описание и тема, C — текст статьи без HTML-тегов.
+ALTER TABLE t_p65890965_refstaff_project.blog_posts
+    ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian'::regconfig, coalesce(title, '')), 'A')
+        || setweight(to_tsvector('russian'::regconfig, coalesce(meta_description, '') || ' ' || coalesce(topic, '')), 'B')
+        || setweight(to_tsvector('russian'::regconfig, regexp_replace(coalesce(content, ''), '<[^>]+>', ' ', 'g')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_blog_posts_search_vector
+    ON t_p65890965_refstaff_project.blog_posts USING GIN (search_vector);
@@ -0,0 +1,128 @@
+"""
+Бенчмарк POST ?action=cron в blog-posts (user-023) против локального фейкового LLM с искусственной задержкой.
+
+Поднимает HTTP-сервер, отвечающий как polza.ai /chat/completions (каждый ответ — статья с уникальным
+заголовком), направляет на него функцию через POLZA_BASE_URL и замеряет пачку из --count статей:
+  - последовательно (CRON_CONCURRENCY = 1, как до user-023) и параллельно;
+  - с бюджетом --budget секунд меньше, чем нужно на всю пачку: публикуется успевшее, остальное — timeout;
+  - с недопубликованным черновиком прошлого вызова: генерируются только недостающие статьи.
+Статьи пишутся в базу из DATABASE_URL и удаляются в конце. Запускать только на локальной/тестовой базе:
+    DATABASE_URL=postgresql://... python scripts/bench_blog_cron.py [--latency 2] [--count 5] [--budget 3]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_SECRET = 'bench-cron'
+
+
+class FakeLLM(BaseHTTPRequestHandler):
+    latency = 2.0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.lock:
+            FakeLLM.requests += 1
+        time.sleep(self.latency)
+        token = uuid.uuid4().hex
+        article = {
+            'topic': f'тема {token[:12]}',
+            'title': f'Выпуск {token[:8]} {token[8:16]}',
+            'metaDescription': 'Описание статьи для бенчмарка.',
+            'content': '<p>Реферальный найм: текст статьи для бенчмарка.</p>',
+        }
+        out = json.dumps({'choices': [{'message': {'content': json.dumps(article, ensure_ascii=False)}}]}).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+        except OSError:
+            pass  # функция уже не ждёт этот ответ
+
+    def log_message(self, *args):
+        pass
+
+
+def load_blog_posts():
+    function_dir = os.path.join(ROOT, 'backend', 'blog-posts')
+    sys.path.insert(0, function_dir)
+    spec = importlib.util.spec_from_file_location('blog_posts_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def cron(module, count: int) -> tuple:
+    FakeLLM.requests = 0
+    started = time.perf_counter()
+    response = module.handler({'httpMethod': 'POST', 'headers': {'X-Admin-Secret': ADMIN_SECRET},
+                               'queryStringParameters': {'action': 'cron'}, 'body': json.dumps({'count': count})}, None)
+    elapsed = time.perf_counter() - started
+    results = json.loads(response['body'])['results']
+    published = [r['id'] for r in results if r.get('ok')]
+    timeouts = sum(1 for r in results if str(r.get('error', '')).startswith('timeout'))
+    return elapsed, published, timeouts, FakeLLM.requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=2.0, help='задержка ответа LLM, с')
+    parser.add_argument('--count', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=3.0, help='урезанный CRON_TIME_BUDGET, с')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeLLM)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeLLM.latency = args.latency
+    os.environ.update(POLZA_BASE_URL=f'http://127.0.0.1:{server.server_port}', POLZA_AI_API_KEY='bench',
+                      ADMIN_SECRET=ADMIN_SECRET)
+    os.environ.pop('INDEXNOW_KEY', None)
+    module = load_blog_posts()
+    created = []
+
+    try:
+        for name, concurrency in (('последовательно', 1), ('параллельно', module.CRON_CONCURRENCY)):
+            module.CRON_CONCURRENCY = concurrency
+            elapsed, published, timeouts, calls = cron(module, args.count)
+            created += published
+            print(f'count={args.count}, {name:16} ({concurrency} к LLM): {elapsed:5.2f} s, '
+                  f'опубликовано {len(published)}, запросов к LLM {calls}')
+
+        budget = module.CRON_TIME_BUDGET
+        module.CRON_TIME_BUDGET = args.budget
+        elapsed, published, timeouts, calls = cron(module, args.count)
+        created += published
+        module.CRON_TIME_BUDGET = budget
+        print(f'count={args.count}, бюджет {args.budget:.0f} s: {elapsed:5.2f} s, опубликовано {len(published)}, '
+              f'timeout {timeouts}')
+        time.sleep(args.latency)  # ответы, не дождавшиеся бюджета, не должны попасть в следующий замер
+
+        conn = module.get_db()
+        module.save_draft(conn, {'topic': 'черновик прошлого вызова', 'title': f'Черновик {uuid.uuid4().hex[:8]}',
+                                 'metaDescription': 'm', 'content': '<p>текст</p>'})
+        elapsed, published, timeouts, calls = cron(module, args.count)
+        created += published
+        print(f'count={args.count}, есть 1 черновик: {elapsed:5.2f} s, опубликовано {len(published)}, '
+              f'запросов к LLM {calls}')
+    finally:
+        if created:
+            conn = module.get_db()
+            with conn.cursor() as cur:
+                cur.execute(f'DELETE FROM {module.SCHEMA}.blog_posts WHERE id = ANY(%s)', (created,))
+            module.refresh_feeds(conn)
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
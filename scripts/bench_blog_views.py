@@ -0,0 +1,125 @@
+"""
+Бенчмарк POST ?action=view в blog-posts (user-019): буфер просмотров со сбросом пачкой и счётчиком
+blog_post_view_counts против прежнего INSERT + COUNT(*) по blog_post_views на каждый просмотр.
+
+Засевает в базу из DATABASE_URL статью «bench-views» (по умолчанию с 20 000 просмотров) и при
+повторном запуске переиспользует её. Обе ветки идут по одному соединению — подключение к БД,
+которое handler открывает на каждый запрос, в замер не входит. Запускать только на локальной/тестовой базе:
+    DATABASE_URL=postgresql://... python scripts/bench_blog_views.py [--views 20000] [--requests 5000]
+
+Печатает просмотров в секунду и p50/p99 одного просмотра, число сбросов буфера и проверяет,
+что после финального сброса счётчик совпадает с COUNT(*).
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+S = 't_p65890965_refstaff_project'
+SLUG = 'bench-views'
+
+
+def load_blog_posts():
+    function_dir = os.path.join(ROOT, 'backend', 'blog-posts')
+    sys.path.insert(0, function_dir)
+    spec = importlib.util.spec_from_file_location('blog_posts_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(cur, views: int) -> int:
+    cur.execute(f'SELECT id FROM {S}.blog_posts WHERE slug = %s', (SLUG,))
+    row = cur.fetchone()
+    if row:
+        return row[0]
+    cur.execute(
+        f"INSERT INTO {S}.blog_posts (slug, title, content, topic, is_published) "
+        f"VALUES (%s, 'Бенчмарк просмотров', '<p>текст</p>', 'bench', false) RETURNING id",
+        (SLUG,)
+    )
+    post_id = cur.fetchone()[0]
+    execute_values(cur, f'INSERT INTO {S}.blog_post_views (post_id, session_id) VALUES %s',
+                   [(post_id, f'seed-{i}') for i in range(views)], page_size=5000)
+    cur.execute(f'INSERT INTO {S}.blog_post_view_counts (post_id, views) VALUES (%s, %s) '
+                f'ON CONFLICT (post_id) DO UPDATE SET views = EXCLUDED.views', (post_id, views))
+    return post_id
+
+
+def legacy_view(cur, post_id: int, session_id: str) -> int:
+    """Путь до user-019: вставка и пересчёт всех просмотров статьи."""
+    cur.execute(f'INSERT INTO {S}.blog_post_views (post_id, session_id) VALUES (%s, %s) ON CONFLICT DO NOTHING',
+                (post_id, session_id))
+    cur.execute(f'SELECT COUNT(*) FROM {S}.blog_post_views WHERE post_id=%s', (post_id,))
+    return cur.fetchone()[0]
+
+
+def buffered_view(module, conn, post_id: int, session_id: str) -> int:
+    """То же, что делает handler для POST ?action=view после разбора запроса."""
+    module.VIEW_BUFFER.add(post_id, session_id)
+    module.flush_views_if_due(conn)
+    with conn.cursor() as cur:
+        return module.stored_views(cur, post_id) + module.VIEW_BUFFER.pending(post_id)
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f'p50 {statistics.median(samples):6.2f} ms   p99 {p99:6.2f} ms'
+
+
+def run(name: str, fn, requests: int):
+    samples = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        begin = time.perf_counter()
+        fn(uuid.uuid4().hex)
+        samples.append((time.perf_counter() - begin) * 1000)
+    elapsed = time.perf_counter() - started
+    print(f'  {name:22} {requests / elapsed:9,.0f} views/s   {percentiles(samples)}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--views', type=int, default=20000, help='просмотров у статьи до замера')
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    module = load_blog_posts()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    conn.autocommit = True
+    cur = conn.cursor()
+    post_id = seed(cur, args.views)
+    cur.execute(f'SELECT COUNT(*) FROM {S}.blog_post_views WHERE post_id=%s', (post_id,))
+    print(f'статья {post_id}: {cur.fetchone()[0]:,} просмотров, {args.requests:,} новых сессий на ветку')
+
+    run('INSERT + COUNT(*)', lambda session: legacy_view(cur, post_id, session), args.requests)
+    cur.execute(f'UPDATE {S}.blog_post_view_counts SET views = '
+                f'(SELECT COUNT(*) FROM {S}.blog_post_views WHERE post_id=%s) WHERE post_id=%s', (post_id, post_id))
+
+    flushes = 0
+    flush = module.flush_views
+
+    def counted_flush(c):
+        nonlocal flushes
+        flushes += 1
+        return flush(c)
+
+    module.flush_views = counted_flush
+    run('буфер + счётчик', lambda session: buffered_view(module, conn, post_id, session), args.requests)
+    module.flush_views = flush
+    flush(conn)
+    cur.execute(f'SELECT COUNT(*) FROM {S}.blog_post_views WHERE post_id=%s', (post_id,))
+    counted = cur.fetchone()[0]
+    print(f'сбросов буфера: {flushes}; счётчик = COUNT(*): {module.stored_views(cur, post_id) == counted}')
+
+
+if __name__ == '__main__':
+    main()
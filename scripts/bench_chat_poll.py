@@ -0,0 +1,199 @@
+"""
+Бенчмарк long-poll сообщений чата (user-008): N подписчиков на один чат через GET resource=messages
+с since и action=poll, отправитель шлёт сообщения через POST resource=messages (pg_notify).
+
+Печатает задержку доставки (от начала POST до ответа подписчику), потерянные и повторно
+доставленные сообщения и сколько соединений Postgres держат подписчики: каждый ожидающий
+запрос занимает соединение из пула в LISTEN до MESSAGES_POLL_TIMEOUT секунд.
+Соединения функции считаются в pg_stat_activity по application_name (PGAPPNAME).
+
+Засевает в базу из DATABASE_URL компанию «bench-chat-poll» с одним чатом и при повторном запуске
+переиспользует её, отправленные сообщения удаляет в конце. Запускать только на локальной/тестовой базе:
+    DATABASE_URL=postgresql://... python scripts/bench_chat_poll.py [--pollers 20] [--messages 50] [--interval 0.1]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+S = 't_p65890965_refstaff_project'
+COMPANY_NAME = 'bench-chat-poll'
+APP_NAME = 'bench-chat-poll'
+
+
+def load_api():
+    function_dir = os.path.join(ROOT, 'backend', 'api')
+    sys.path.insert(0, function_dir)  # рядом с index.py лежат модули из shared/
+    spec = importlib.util.spec_from_file_location('api_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(cur) -> tuple:
+    """(chat_id, employee_id, employer_id) чата компании COMPANY_NAME."""
+    cur.execute(f'SELECT id FROM {S}.companies WHERE name = %s', (COMPANY_NAME,))
+    row = cur.fetchone()
+    if row:
+        company_id = row[0]
+    else:
+        cur.execute(f'INSERT INTO {S}.companies (name) VALUES (%s) RETURNING id', (COMPANY_NAME,))
+        company_id = cur.fetchone()[0]
+        for role in ('employer', 'employee'):
+            cur.execute(
+                f"INSERT INTO {S}.users (email, first_name, last_name, company_id, role) VALUES (%s, 'Bench', %s, %s, %s)",
+                (f'{role}-{company_id}@chat-poll.local', role.capitalize(), company_id, role)
+            )
+    cur.execute(f"SELECT id, role FROM {S}.users WHERE company_id = %s AND role IN ('employer', 'employee')", (company_id,))
+    users = {r[1]: r[0] for r in cur.fetchall()}
+    cur.execute(f'SELECT id FROM {S}.chats WHERE company_id = %s LIMIT 1', (company_id,))
+    row = cur.fetchone()
+    if not row:
+        cur.execute(f'INSERT INTO {S}.chats (company_id, employee_id) VALUES (%s, %s) RETURNING id',
+                    (company_id, users['employee']))
+        row = cur.fetchone()
+    return row[0], users['employee'], users['employer']
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f'p50 {statistics.median(samples):7.1f} ms   p99 {p99:7.1f} ms   max {samples[-1]:7.1f} ms'
+
+
+class Poller(threading.Thread):
+    """Клиент чата: повторяет GET ?action=poll&since=<last_id>, пока не получит expected разных
+    сообщений или не наступит deadline (потерянное сообщение ждать бесконечно незачем)."""
+
+    def __init__(self, api, chat_id: int, user_id: int, since_id: int, timeout: float, expected: int, deadline: float):
+        super().__init__(daemon=True)
+        self.api = api
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.since_id = since_id
+        self.timeout = timeout
+        self.received = []  # [(id, perf_counter)]
+        self.requests = 0
+        self.errors = 0
+        self.expected = expected
+        self.deadline = deadline
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.is_set() and time.perf_counter() < self.deadline:
+            response = self.api.handler({'httpMethod': 'GET', 'headers': {}, 'queryStringParameters': {
+                'resource': 'messages', 'chat_id': str(self.chat_id), 'user_id': str(self.user_id),
+                'since': str(self.since_id), 'action': 'poll', 'timeout': str(self.timeout)}}, None)
+            self.requests += 1
+            if response['statusCode'] != 200:
+                self.errors += 1
+                time.sleep(0.1)
+                continue
+            now = time.perf_counter()
+            data = json.loads(response['body'])
+            self.received += [(m['id'], now) for m in data['items']]
+            self.since_id = data['last_id']
+            if len({message_id for message_id, _ in self.received}) >= self.expected:
+                return
+
+
+class ConnectionMonitor(threading.Thread):
+    """Раз в period секунд считает соединения функции в pg_stat_activity."""
+
+    def __init__(self, period: float = 0.05):
+        super().__init__(daemon=True)
+        self.period = period
+        self.samples = []
+        self.stop = threading.Event()
+        self.conn = psycopg2.connect(os.environ['DATABASE_URL'], application_name='bench-chat-poll-monitor')
+        self.conn.autocommit = True
+
+    def count(self) -> int:
+        with self.conn.cursor() as cur:
+            cur.execute('SELECT COUNT(*) FROM pg_stat_activity WHERE application_name = %s', (APP_NAME,))
+            return cur.fetchone()[0]
+
+    def run(self):
+        while not self.stop.wait(self.period):
+            self.samples.append(self.count())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pollers', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--interval', type=float, default=0.1, help='пауза между сообщениями, с')
+    parser.add_argument('--idle', type=float, default=2.0, help='сколько подписчики ждут до первого сообщения, с')
+    args = parser.parse_args()
+
+    os.environ['PGAPPNAME'] = APP_NAME  # соединения пула функции видны в pg_stat_activity под этим именем
+    api = load_api()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'], application_name='bench-chat-poll-seed')
+    conn.autocommit = True
+    cur = conn.cursor()
+    chat_id, employee_id, employer_id = seed(cur)
+    cur.execute(f'SELECT COALESCE(MAX(id), 0) FROM {S}.chat_messages WHERE chat_id = %s', (chat_id,))
+    since_id = cur.fetchone()[0]
+    cur.execute('SHOW max_connections')
+    max_connections = cur.fetchone()[0]
+
+    monitor = ConnectionMonitor()
+    monitor.start()
+    timeout = api.MESSAGES_POLL_TIMEOUT
+    deadline = time.perf_counter() + args.idle + args.messages * (args.interval + 0.5) + timeout
+    pollers = [Poller(api, chat_id, employer_id if i % 2 else employee_id, since_id, timeout, args.messages, deadline)
+               for i in range(args.pollers)]
+    for poller in pollers:
+        poller.start()
+    time.sleep(args.idle)
+    idle_connections = monitor.count()
+
+    sent = {}  # id -> perf_counter начала POST
+    try:
+        for n in range(args.messages):
+            started = time.perf_counter()
+            response = api.handler({'httpMethod': 'POST', 'headers': {}, 'queryStringParameters': {'resource': 'messages'},
+                                    'body': json.dumps({'chat_id': chat_id, 'sender_id': employee_id,
+                                                        'message': f'bench {n}'})}, None)
+            sent[json.loads(response['body'])['id']] = started
+            time.sleep(args.interval)
+        for poller in pollers:
+            poller.join()
+    finally:
+        for poller in pollers:
+            poller.stop.set()
+        monitor.stop.set()
+        monitor.join()
+        if sent:
+            cur.execute(f'DELETE FROM {S}.chat_messages WHERE id = ANY(%s)', (list(sent),))
+
+    latencies, lost, duplicates = [], 0, 0
+    for poller in pollers:
+        ids = [message_id for message_id, _ in poller.received]
+        duplicates += len(ids) - len(set(ids))
+        lost += len(set(sent) - set(ids))
+        first_seen = {}
+        for message_id, at in poller.received:
+            first_seen.setdefault(message_id, at)
+        latencies += [(first_seen[i] - sent[i]) * 1000 for i in sent if i in first_seen]
+
+    requests = sum(p.requests for p in pollers)
+    print(f'{args.pollers} подписчиков, {len(sent)} сообщений каждые {args.interval * 1000:.0f} ms, '
+          f'MESSAGES_POLL_TIMEOUT {timeout} s')
+    print(f'  доставка (POST -> ответ poll)   {percentiles(latencies)}')
+    print(f'  доставлено {len(latencies)} из {len(sent) * len(pollers)}, потеряно {lost}, повторов {duplicates}, '
+          f'запросов poll {requests} ({requests / max(1, len(pollers)):.1f} на подписчика), ошибок {sum(p.errors for p in pollers)}')
+    print(f'  соединений Postgres у функции: в ожидании {idle_connections}, пик {max(monitor.samples, default=0)}, '
+          f'медиана {statistics.median(monitor.samples or [0]):.0f} (max_connections {max_connections})')
+    print(f'  пул после прогона: {api.DB_POOL.stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Бенчмарк GET resource=dashboard: один CTE/json_agg-запрос (load_dashboard) против прежнего
+пути из восьми последовательных запросов с сериализацией в Python.
+
+Засевает в базу из DATABASE_URL компанию «bench-dashboard» (по умолчанию 10 000 сотрудников)
+и при повторном запуске переиспользует её. Запускать только на локальной/тестовой базе:
+    DATABASE_URL=postgresql://... python scripts/bench_dashboard.py [--employees 10000] [--runs 50]
+
+Для каждой роли проверяет, что ответы обоих путей совпадают после json.loads,
+и печатает p50/p99 задержки.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+S = 't_p65890965_refstaff_project'
+COMPANY_NAME = 'bench-dashboard'
+
+
+def load_api():
+    function_dir = os.path.join(ROOT, 'backend', 'api')
+    sys.path.insert(0, function_dir)  # рядом с index.py лежат модули из shared/
+    spec = importlib.util.spec_from_file_location('api_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(cur, employees: int) -> int:
+    cur.execute(f'SELECT id FROM {S}.companies WHERE name = %s', (COMPANY_NAME,))
+    row = cur.fetchone()
+    if row:
+        return row['id']
+    rnd = random.Random(42)
+    base = datetime(2025, 1, 1)
+    cur.execute(f'INSERT INTO {S}.companies (name) VALUES (%s) RETURNING id', (COMPANY_NAME,))
+    company_id = cur.fetchone()['id']
+    cur.execute(
+        f"INSERT INTO {S}.users (email, first_name, last_name, company_id, role) "
+        f"VALUES (%s, 'Bench', 'Employer', %s, 'employer') RETURNING id",
+        (f'employer-{company_id}@bench.local', company_id)
+    )
+    employer_id = cur.fetchone()['id']
+    user_ids = [r['id'] for r in execute_values(
+        cur,
+        f'INSERT INTO {S}.users (email, first_name, last_name, company_id, role, position, department, '
+        f'total_recommendations, successful_hires, total_earnings, wallet_balance, wallet_pending) VALUES %s RETURNING id',
+        [(f'e{i}-{company_id}@bench.local', f'Имя{i}', f'Фамилия{i}', company_id, 'employee', 'Инженер', 'R&D',
+          rnd.randint(0, 30), rnd.randint(0, 10), rnd.randint(0, 100000) / 100, rnd.randint(0, 50000) / 100,
+          rnd.randint(0, 20000) / 100) for i in range(employees)],
+        fetch=True
+    )]
+    vacancy_ids = [r['id'] for r in execute_values(
+        cur,
+        f'INSERT INTO {S}.vacancies (title, company_id, status, reward_amount, created_by, created_at) VALUES %s RETURNING id',
+        [(f'Вакансия {i}', company_id, rnd.choice(['active', 'active', 'archived']), rnd.randint(5, 50) * 1000,
+          employer_id, base + timedelta(minutes=i, microseconds=rnd.choice([0, 120000, 123456]))) for i in range(200)],
+        fetch=True
+    )]
+    execute_values(
+        cur,
+        f'INSERT INTO {S}.recommendations (vacancy_id, recommended_by, candidate_name, candidate_email, status, '
+        f'reward_amount, created_at) VALUES %s',
+        [(rnd.choice(vacancy_ids), rnd.choice(user_ids), f'Кандидат {i}', f'c{i}@bench.local',
+          rnd.choice(['pending', 'accepted', 'hired', 'rejected']), rnd.randint(5, 50) * 1000,
+          base + timedelta(seconds=i * 37)) for i in range(employees * 2)]
+    )
+    execute_values(
+        cur,
+        f'INSERT INTO {S}.news (company_id, title, content, author_id, created_at) VALUES %s',
+        [(company_id, f'Новость {i}', 'Текст новости ' * 20, employer_id, base + timedelta(hours=i)) for i in range(50)]
+    )
+    chat_ids = [r['id'] for r in execute_values(
+        cur,
+        f'INSERT INTO {S}.chats (company_id, employee_id, last_message_at) VALUES %s RETURNING id',
+        [(company_id, uid, base + timedelta(minutes=i)) for i, uid in enumerate(user_ids[:2000])],
+        fetch=True
+    )]
+    execute_values(
+        cur,
+        f'INSERT INTO {S}.chat_messages (chat_id, sender_id, message, is_read) VALUES %s',
+        [(chat_id, uid if rnd.random() < 0.7 else employer_id, 'сообщение', rnd.random() < 0.5)
+         for chat_id, uid in zip(chat_ids, user_ids) for _ in range(3)]
+    )
+    execute_values(
+        cur,
+        f'INSERT INTO {S}.wallet_transactions (user_id, amount, type, description, created_at) VALUES %s',
+        [(user_ids[0], rnd.randint(100, 5000), 'bonus', 'Бонус', base + timedelta(days=i)) for i in range(80)]
+    )
+    execute_values(
+        cur,
+        f'INSERT INTO {S}.pending_payouts (user_id, amount, unlock_date, status) VALUES %s',
+        [(user_ids[0], rnd.randint(100, 5000), base + timedelta(days=30 + i), 'pending') for i in range(10)]
+    )
+    return company_id
+
+
+def legacy_dashboard(cur, company_id, user_id, role: str) -> str:
+    """Путь до user-002: последовательные запросы, json.dumps(default=str)."""
+    vac_where = 'WHERE v.company_id = %s'
+    vac_params = [company_id]
+    if role != 'employer':
+        vac_where += " AND v.status = 'active'"
+    cur.execute(f"""
+        SELECT v.id, v.title, v.department, v.salary_display, v.status,
+               v.reward_amount, v.payout_delay_days, v.requirements, v.description, v.motivation,
+               v.referral_token, v.created_at,
+               COUNT(r.id) as recommendations_count,
+               u.first_name || ' ' || u.last_name as created_by_name
+        FROM {S}.vacancies v
+        LEFT JOIN {S}.recommendations r ON v.id = r.vacancy_id
+        LEFT JOIN {S}.users u ON v.created_by = u.id
+        {vac_where}
+        GROUP BY v.id, u.first_name, u.last_name
+        ORDER BY v.created_at DESC
+    """, vac_params)
+    vacancies = [dict(r) for r in cur.fetchall()]
+    cur.execute(f"""
+        SELECT id, first_name, last_name, position, department, level, experience_points,
+               total_recommendations, successful_hires, total_earnings, wallet_pending,
+               wallet_balance, avatar_url, email, phone, telegram, vk, is_admin, is_fired
+        FROM {S}.users
+        WHERE company_id = %s AND role = 'employee'
+        ORDER BY successful_hires DESC, total_recommendations DESC
+    """, (company_id,))
+    employees = [dict(r) for r in cur.fetchall()]
+    rec_where = ['v.company_id = %s']
+    rec_params = [company_id]
+    if role == 'employee' and user_id:
+        rec_where.append('r.recommended_by = %s')
+        rec_params.append(user_id)
+    cur.execute(f"""
+        SELECT r.*, v.title as vacancy_title, v.payout_delay_days,
+               u.first_name || ' ' || u.last_name as recommended_by_name
+        FROM {S}.recommendations r
+        JOIN {S}.vacancies v ON r.vacancy_id = v.id
+        JOIN {S}.users u ON r.recommended_by = u.id
+        WHERE {' AND '.join(rec_where)}
+        ORDER BY r.created_at DESC
+    """, rec_params)
+    recommendations = [dict(r) for r in cur.fetchall()]
+    cur.execute(f"""
+        SELECT id, name, employee_count, invite_token, logo_url, description,
+               website, industry, inn, telegram, vk, created_at, subscription_tier,
+               to_char(subscription_expires_at, 'YYYY-MM-DD"T"HH24:MI:SS"Z"') as subscription_expires_at,
+               payout_methods
+        FROM {S}.companies WHERE id = %s
+    """, (company_id,))
+    company_row = cur.fetchone()
+    archived_filter = '' if role == 'employer' else 'AND n.is_archived = false'
+    cur.execute(f"""
+        SELECT n.id, n.title, n.content, n.category, n.created_at, n.updated_at, n.is_archived,
+               u.first_name || ' ' || u.last_name as author,
+               (SELECT COUNT(*) FROM {S}.news_likes WHERE news_id = n.id) as likes,
+               (SELECT json_agg(json_build_object('id', nc.id, 'author_name', nc.author_name, 'text', nc.text, 'created_at', nc.created_at) ORDER BY nc.created_at ASC)
+                FROM {S}.news_comments nc WHERE nc.news_id = n.id) as comments
+        FROM {S}.news n
+        LEFT JOIN {S}.users u ON n.author_id = u.id
+        WHERE n.company_id = %s {archived_filter}
+        ORDER BY n.created_at DESC
+    """, (company_id,))
+    news = [dict(r) for r in cur.fetchall()]
+    chats = []
+    if role == 'employer' and user_id:
+        cur.execute(f"""
+            SELECT c.*, u.first_name || ' ' || u.last_name as employee_name,
+                   u.position, u.avatar_url,
+                   (SELECT COUNT(*) FROM {S}.chat_messages
+                    WHERE chat_id = c.id AND is_read = false AND sender_id != %s) as unread_count
+            FROM {S}.chats c
+            JOIN {S}.users u ON c.employee_id = u.id
+            WHERE c.company_id = %s
+            ORDER BY c.last_message_at DESC NULLS LAST
+        """, (user_id, company_id))
+        chats = [dict(r) for r in cur.fetchall()]
+    wallet = None
+    if role == 'employee' and user_id:
+        cur.execute(f'SELECT wallet_balance, wallet_pending FROM {S}.users WHERE id = %s', (user_id,))
+        w = cur.fetchone()
+        cur.execute(f"""
+            SELECT id, amount, type, description, created_at FROM {S}.wallet_transactions
+            WHERE user_id = %s ORDER BY created_at DESC LIMIT 50
+        """, (user_id,))
+        transactions = [dict(r) for r in cur.fetchall()]
+        cur.execute(f"""
+            SELECT id, amount, unlock_date, status FROM {S}.pending_payouts
+            WHERE user_id = %s AND status = 'pending' ORDER BY unlock_date ASC
+        """, (user_id,))
+        pending = [dict(r) for r in cur.fetchall()]
+        wallet = {'wallet': dict(w) if w else {}, 'transactions': transactions, 'pending_payouts': pending}
+    return json.dumps({
+        'vacancies': vacancies, 'employees': employees, 'recommendations': recommendations,
+        'company': dict(company_row) if company_row else None, 'news': news, 'chats': chats,
+        'payouts': [], 'wallet': wallet,
+    }, default=str)
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f'p50 {statistics.median(samples):7.1f} ms   p99 {p99:7.1f} ms'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    api = load_api()
+    conn = api.get_db_connection()
+    cur = conn.cursor()
+    company_id = seed(cur, args.employees)
+    cur.execute(f"SELECT id FROM {S}.users WHERE company_id = %s AND role = 'employer' LIMIT 1", (company_id,))
+    employer_id = cur.fetchone()['id']
+    cur.execute(f"SELECT id FROM {S}.users WHERE company_id = %s AND role = 'employee' ORDER BY id LIMIT 1", (company_id,))
+    employee_id = cur.fetchone()['id']
+
+    for role, user_id in (('employer', employer_id), ('employee', employee_id)):
+        new_body = api.load_dashboard(cur, str(company_id), str(user_id), role)
+        old_body = legacy_dashboard(cur, str(company_id), str(user_id), role)
+        same = json.loads(new_body) == json.loads(old_body)
+        print(f'{role}: {len(new_body):,} bytes, same response as legacy path: {same}')
+        for name, fn in (('legacy (8 queries)', legacy_dashboard), ('load_dashboard', api.load_dashboard)):
+            samples = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                fn(cur, str(company_id), str(user_id), role)
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f'  {name:20} {percentiles(samples)}')
+
+
+if __name__ == '__main__':
+    main()
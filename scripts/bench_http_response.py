@@ -0,0 +1,122 @@
+"""
+Бенчмарк байтов на проводе для @http_response (user-025): реальные ответы функций без сжатия,
+с gzip и с br, время сжатия и пустой 304 на повторный запрос с If-None-Match.
+
+Ответы берутся из handler функций на базе из DATABASE_URL: дашборд работодателя в api (по умолчанию
+компании с наибольшим числом рекомендаций, кроме засеянных бенчмарками «bench-*»), список и самая
+длинная статья blog-posts, OG-страница этой статьи в og-proxy. br 11 для сравнения считается
+только для ответов до BR11_MAX_BYTES — на мегабайтах он идёт десятки секунд.
+Запускать только на локальной/тестовой базе:
+    DATABASE_URL=postgresql://... python scripts/bench_http_response.py [--company-id N] [--runs 20]
+"""
+import argparse
+import base64
+import gzip
+import importlib.util
+import os
+import statistics
+import sys
+import time
+
+import brotli
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'shared'))  # копии в функциях совпадают (scripts/sync_shared.py --check)
+from http_response import BROTLI_QUALITY, GZIP_LEVEL
+
+S = 't_p65890965_refstaff_project'
+BR11_MAX_BYTES = 2_000_000
+
+
+def load_function(name: str):
+    function_dir = os.path.join(ROOT, 'backend', name)
+    sys.path.insert(0, function_dir)  # рядом с index.py лежат модули из shared/
+    spec = importlib.util.spec_from_file_location(f'{name.replace("-", "_")}_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def wire_bytes(response: dict) -> int:
+    body = response.get('body') or ''
+    return len(base64.b64decode(body)) if response.get('isBase64Encoded') else len(body.encode('utf-8'))
+
+
+def median_ms(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def cases(cur, company_id) -> list:
+    """(название, функция, event) для ответов, которые есть в базе."""
+    found = []
+    cur.execute(
+        f"SELECT c.id, u.id FROM {S}.companies c "
+        f"JOIN {S}.users u ON u.company_id = c.id AND u.role = 'employer' "
+        f"WHERE c.id = %s OR (%s IS NULL AND c.name NOT LIKE 'bench-%%') "
+        f"ORDER BY (SELECT COUNT(*) FROM {S}.recommendations r JOIN {S}.vacancies v ON v.id = r.vacancy_id "
+        f"          WHERE v.company_id = c.id) DESC LIMIT 1",
+        (company_id, company_id)
+    )
+    row = cur.fetchone()
+    if row:
+        found.append(('api dashboard employer', 'api', {'queryStringParameters': {
+            'resource': 'dashboard', 'company_id': str(row[0]), 'user_id': str(row[1]), 'role': 'employer'}}))
+    else:
+        print('дашборд пропущен: в базе нет компании с работодателем')
+    found.append(('blog-posts list', 'blog-posts', {'queryStringParameters': {'action': 'list', 'per_page': '12'}}))
+    cur.execute(f'SELECT slug FROM {S}.blog_posts WHERE is_published = true ORDER BY length(content) DESC LIMIT 1')
+    row = cur.fetchone()
+    if row:
+        found.append(('blog-posts get', 'blog-posts', {'queryStringParameters': {'action': 'get', 'slug': row[0]}}))
+        found.append(('og-proxy blog page', 'og-proxy', {'queryStringParameters': {'type': 'blog', 'id': row[0]}}))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--company-id', type=int, help='компания для дашборда')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    with conn.cursor() as cur:
+        found = cases(cur, args.company_id)
+    modules = {}
+    print(f'{"":24} {"raw":>9} {f"gzip {GZIP_LEVEL}":>17} {f"br {BROTLI_QUALITY}":>17} {"br 11":>17} {"304":>5}')
+    for title, function, event in found:
+        module = modules.get(function) or modules.setdefault(function, load_function(function))
+        event = {'httpMethod': 'GET', **event}
+
+        plain = module.handler({**event, 'headers': {}}, None)
+        if plain['statusCode'] != 200:
+            print(f'{title:24} статус {plain["statusCode"]}, пропущен')
+            continue
+        raw = plain['body'].encode('utf-8')
+        sizes = {encoding: wire_bytes(module.handler({**event, 'headers': {'Accept-Encoding': encoding}}, None))
+                 for encoding in ('gzip', 'br')}
+        timings = {
+            'gzip': median_ms(lambda: gzip.compress(raw, GZIP_LEVEL), args.runs),
+            'br': median_ms(lambda: brotli.compress(raw, quality=BROTLI_QUALITY), args.runs),
+        }
+        etag = plain['headers'].get('ETag')
+        revalidated = module.handler({**event, 'headers': {'If-None-Match': etag}}, None) if etag else None
+        not_modified = f'{wire_bytes(revalidated)} B' if revalidated and revalidated['statusCode'] == 304 else '-'
+
+        def column(size: int, ms: float) -> str:
+            return f'{size:7,} {size / len(raw):4.0%} {ms:5.1f}ms'
+        br11 = '-'
+        if len(raw) <= BR11_MAX_BYTES:
+            br11_ms = median_ms(lambda: brotli.compress(raw, quality=11), max(1, args.runs // 5))
+            br11 = column(len(brotli.compress(raw, quality=11)), br11_ms)
+        print(f'{title:24} {len(raw):9,} {column(sizes["gzip"], timings["gzip"])} {column(sizes["br"], timings["br"])} '
+              f'{br11:>17} {not_modified:>5}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Бенчмарк inject_links в blog-posts (user-022): один проход общей регуляркой по HTML против прежней
+компиляции и замены по каждой ключевой фразе отдельно.
+
+Статьи синтетические: абзацы, списки, картинки и обычные ссылки, ключевые фразы — в начале,
+в конце или нигде. На таком «чистом» HTML (фраз нет в атрибутах и внутри <a>) оба способа
+должны давать одинаковый результат — это проверяется, как и то, что повторный проход ничего не меняет.
+Запуск:
+    python scripts/bench_inject_links.py [--runs 20]
+"""
+import argparse
+import importlib.util
+import os
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLOCKS = [
+    '<p>Компании ищут способы закрывать вакансии быстрее и дешевле, а сотрудники знают, кого позвать.</p>',
+    '<h2>Почему это работает</h2><ul><li>доверие</li><li>скорость</li><li>удержание</li></ul>',
+    '<p><img src="/img/team.webp" alt="команда за работой" width="600"> Подпись к иллюстрации.</p>',
+    '<p>Подробнее в <a href="https://example.com/guide">руководстве</a> и <strong>чек-листе</strong>.</p>',
+]
+
+
+def load_blog_posts():
+    function_dir = os.path.join(ROOT, 'backend', 'blog-posts')
+    sys.path.insert(0, function_dir)
+    spec = importlib.util.spec_from_file_location('blog_posts_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_inject_links(module, content: str) -> str:
+    """inject_links до user-022: regex на каждую фразу при каждом вызове."""
+    content = re.sub(r'\ufffd+', '', content)
+    used = set()
+    for phrase, url in module.KEY_PHRASES:
+        if phrase in used:
+            continue
+        pattern = re.compile(re.escape(phrase), re.IGNORECASE)
+
+        def replacer(m, p=phrase, u=url, _used=used):
+            if p in _used:
+                return m.group(0)
+            _used.add(p)
+            return f'<a href="{u}" class="text-primary hover:underline font-medium">{m.group(0)}</a>'
+        content = pattern.sub(replacer, content, count=1)
+    return content
+
+
+def article(module, size: int, where: str) -> str:
+    body, n = [], 0
+    while sum(map(len, body)) < size:
+        body.append(BLOCKS[n % len(BLOCKS)])
+        n += 1
+    phrases = ''.join(f'<p>{phrase.capitalize()} — ключевая мысль раздела.</p>' for phrase, _ in module.KEY_PHRASES)
+    if where == 'start':
+        body.insert(0, phrases)
+    elif where == 'end':
+        body.append(phrases)
+    return ''.join(body)
+
+
+def measure(fn, content: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(content)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    module = load_blog_posts()
+    print(f'{"":26} {"до user-022":>12} {"inject_links":>13} {"MB/s":>7}  одинаково  повтор без изменений')
+    for size, where in ((20_000, 'end'), (200_000, 'end'), (200_000, 'start'), (200_000, 'none'), (2_000_000, 'end')):
+        content = article(module, size, where)
+        linked = module.inject_links(content)
+        same = linked == legacy_inject_links(module, content)
+        idempotent = module.inject_links(linked) == linked
+        legacy_ms = measure(lambda c: legacy_inject_links(module, c), content, args.runs)
+        current_ms = measure(module.inject_links, content, args.runs)
+        mb_s = len(content.encode()) / 1e6 / (current_ms / 1000)
+        print(f'{len(content) // 1000:>6} KB, фразы: {where:6}    {legacy_ms:9.2f} ms {current_ms:10.2f} ms {mb_s:7.1f}'
+              f'  {str(same):9}  {idempotent}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Бенчмарк jobs-aggregator против локального фейкового trudvsem с искусственной задержкой.
+
+Поднимает HTTP-сервер, отвечающий как opendata.trudvsem.ru, направляет на него функцию через
+TRUDVSEM_API_URL (локальный индекс отключён — DATABASE_URL не передаётся) и измеряет:
+  - position=all: последовательный опрос позиций (как до user-011) против параллельного fan-out;
+  - HIT из кеша;
+  - устаревшую запись, когда trudvsem успевает в REVALIDATE_BUDGET (REVALIDATED) и когда нет (STALE);
+  - зависшую позицию: fan-out укладывается в FANOUT_DEADLINE и отдаёт остальные.
+Запуск:
+    python scripts/bench_jobs_aggregator.py [--latency 1.0] [--slow 12]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeTrudvsem(BaseHTTPRequestHandler):
+    latency = 1.0
+    slow_text = None   # запросы с этим text висят slow_latency секунд
+    slow_latency = 0.0
+
+    def do_GET(self):
+        text = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get('text', [''])[0]
+        time.sleep(self.slow_latency if text == self.slow_text else self.latency)
+        items = [{'vacancy': {
+            'id': f'{text}-{i}', 'job-name': f'{text} {i}', 'creation-date': f'2025-01-{i + 1:02d}',
+            'salary_min': 50000 + i * 1000, 'company': {'name': 'ООО Тест'}, 'region': {'name': 'Москва'},
+        }} for i in range(20)]
+        out = json.dumps({'results': {'vacancies': items}, 'meta': {'total': 20}}, ensure_ascii=False).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+        except OSError:
+            pass  # клиент уже ушёл по таймауту
+
+    def log_message(self, *args):
+        pass
+
+
+def load_aggregator():
+    function_dir = os.path.join(ROOT, 'backend', 'jobs-aggregator')
+    sys.path.insert(0, function_dir)
+    spec = importlib.util.spec_from_file_location('jobs_aggregator_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def request(module, position: str) -> tuple:
+    started = time.perf_counter()
+    response = module.handler({'httpMethod': 'GET', 'headers': {}, 'queryStringParameters': {'position': position}}, None)
+    elapsed = time.perf_counter() - started
+    headers = {k.lower(): v for k, v in response['headers'].items()}
+    return elapsed, headers.get('x-cache'), response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=1.0, help='задержка ответа trudvsem, с')
+    parser.add_argument('--slow', type=float, default=12.0, help='задержка «зависшей» позиции, с')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTrudvsem)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['TRUDVSEM_API_URL'] = f'http://127.0.0.1:{server.server_port}/api/v1/vacancies'
+    os.environ.pop('DATABASE_URL', None)
+    FakeTrudvsem.latency = args.latency
+    module = load_aggregator()
+    positions = len(module.HR_POSITIONS)
+
+    started = time.perf_counter()
+    for position in module.HR_POSITIONS:
+        module.fetch_trudvsem(position, '', None, None, 0)
+    print(f'position=all последовательно ({positions} позиций): {time.perf_counter() - started:5.2f} s')
+
+    elapsed, status, _ = request(module, 'all')
+    print(f'position=all fan-out, {status:12}: {elapsed:5.2f} s')
+    elapsed, status, _ = request(module, 'all')
+    print(f'position=all повторно, {status:12}: {elapsed * 1000:6.1f} ms')
+
+    key = ('all', '', None, None, 0)
+    for latency in (min(args.latency, module.REVALIDATE_BUDGET / 2), module.REVALIDATE_BUDGET + 1):
+        FakeTrudvsem.latency = latency
+        fresh_until, stale_until, result = module._cache[key]
+        module._cache[key] = (0, stale_until, result)  # запись устарела, но ещё в пределах stale
+        elapsed, status, _ = request(module, 'all')
+        print(f'устаревшая запись, trudvsem {latency:.2f} s, {status:12}: {elapsed:5.2f} s')
+
+    FakeTrudvsem.latency = args.latency
+    FakeTrudvsem.slow_text, FakeTrudvsem.slow_latency = next(iter(module.HR_POSITIONS.values())), args.slow
+    module._cache.clear()
+    elapsed, status, response = request(module, 'all')
+    error = json.loads(response['body'])['trudvsem']['error']
+    print(f'одна позиция висит {args.slow:.0f} s, {status:12}: {elapsed:5.2f} s (дедлайн {module.FANOUT_DEADLINE} s, error: {error})')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Микробенчмарк классификатора названий вакансий jobs-aggregator (user-013): одна скомпилированная
+регулярка classify_title против прежнего перебора POSITION_KEYWORDS через `in` для каждой позиции.
+
+Строит синтетический корпус уникальных названий (кеш classify_title не помогает) и проверяет,
+что оба способа дают одинаковые наборы позиций; прежний перебор для честности сравнения
+получает то же нормализованное название (ё → е, дефисы → пробел).
+Запуск:
+    python scripts/bench_keyword_matcher.py [--titles 200000]
+"""
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = ['Рекрутер', 'HR-менеджер', 'менеджер по персоналу', 'специалист по подбору персонала', 'HR директор',
+         'HRBP', 'HR бизнес-партнёр', 'кадровик', 'инспектор по кадрам', 'HR generalist', 'водитель', 'бухгалтер',
+         'менеджер по продажам', 'ведущий', 'старший', 'в IT-компанию', '(удалённо)', 'кладовщик', 'Менеджер']
+
+
+def load_aggregator():
+    function_dir = os.path.join(ROOT, 'backend', 'jobs-aggregator')
+    sys.path.insert(0, function_dir)
+    spec = importlib.util.spec_from_file_location('jobs_aggregator_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--titles', type=int, default=200000)
+    args = parser.parse_args()
+
+    module = load_aggregator()
+    rnd = random.Random(0)
+    titles = [' '.join(rnd.choices(WORDS, k=rnd.randint(2, 5))) + f' #{i}' for i in range(args.titles)]
+    keywords = {key: [module.normalize_title(kw) for kw in kws] for key, kws in module.POSITION_KEYWORDS.items()}
+
+    started = time.perf_counter()
+    legacy = []
+    for title in titles:
+        text = module.normalize_title(title)
+        legacy.append(frozenset(key for key, kws in keywords.items() if any(kw in text for kw in kws)))
+    legacy_time = time.perf_counter() - started
+
+    module.classify_title.cache_clear()
+    started = time.perf_counter()
+    current = [module.classify_title(title) for title in titles]
+    current_time = time.perf_counter() - started
+
+    mismatches = [(t, sorted(a), sorted(b)) for t, a, b in zip(titles, legacy, current) if a != b]
+    matched = sum(1 for positions in current if positions)
+    print(f'{len(titles):,} названий, {matched:,} HR-вакансий, расхождений: {len(mismatches)}')
+    for title, old, new in mismatches[:5]:
+        print(f'  {title!r}: было {old}, стало {new}')
+    print(f'  перебор keywords по позициям  {legacy_time:6.2f} s  ({legacy_time / len(titles) * 1e6:5.1f} µs/название)')
+    print(f'  classify_title (одна regex)   {current_time:6.2f} s  ({current_time / len(titles) * 1e6:5.1f} µs/название)')
+
+
+if __name__ == '__main__':
+    main()
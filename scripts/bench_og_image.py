@@ -0,0 +1,96 @@
+"""
+Бенчмарк рендера og-image (user-015): прежний путь (фон, карточка и шрифты заново на каждую
+картинку, полный RGB PNG) против render_image с готовым шаблоном, по каждому формату вывода.
+
+Кеши рендера не участвуют — замеряется только отрисовка и кодирование.
+Запуск:
+    python scripts/bench_og_image.py [--runs 20]
+"""
+import argparse
+import importlib.util
+import io
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TITLE = 'Ведущий специалист по подбору персонала в IT-компанию (удалённо, полный день)'
+DEPARTMENT = 'HR-департамент'
+SALARY = '150 000 – 220 000 ₽'
+
+
+def load_og_image():
+    function_dir = os.path.join(ROOT, 'backend', 'og-image')
+    sys.path.insert(0, function_dir)
+    os.environ.pop('OG_RENDER_STORAGE', None)
+    os.environ.pop('AWS_ACCESS_KEY_ID', None)  # без хранилища — только рендер
+    spec = importlib.util.spec_from_file_location('og_image_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_render(title: str, department: str, salary: str) -> bytes:
+    """Рендер до user-015: всё рисуется заново, перенос по 25 символов, PNG без палитры."""
+    img = Image.new('RGB', (1200, 630), color='#ffffff')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([(0, 0), (1200, 630)], fill='#f8fafc')
+    draw.rectangle([(40, 40), (1160, 590)], fill='#ffffff', outline='#e2e8f0', width=2)
+    title_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 60)
+    dept_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', 36)
+    brand_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 48)
+    draw.text((80, 80), 'iHUNT', font=brand_font, fill='#3b82f6')
+    lines, current = [], ''
+    for word in title.split():
+        test = current + ' ' + word if current else word
+        if len(test) > 25:
+            if current:
+                lines.append(current)
+            current = word
+        else:
+            current = test
+    if current:
+        lines.append(current)
+    y = 250
+    for line in lines[:3]:
+        draw.text((80, y), line, font=title_font, fill='#1e293b')
+        y += 80
+    draw.text((80, y + 20), department, font=dept_font, fill='#64748b')
+    draw.text((80, y + 80), f'💰 {salary}', font=dept_font, fill='#16a34a')
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def measure(fn, runs: int) -> tuple:
+    samples, data = [], b''
+    for _ in range(runs):
+        started = time.perf_counter()
+        data = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.mean(samples), statistics.median(samples), len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    if not os.path.exists('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'):
+        sys.exit('нужны шрифты DejaVu (/usr/share/fonts/truetype/dejavu), как в рантайме функции')
+
+    module = load_og_image()
+    module.get_base_template()  # шаблон строится один раз на инстанс — в замер не входит
+    cases = [('до user-015 (PNG RGB)', lambda: legacy_render(TITLE, DEPARTMENT, SALARY))]
+    cases += [(f'render_image {fmt}', lambda fmt=fmt: module.render_image(TITLE, DEPARTMENT, SALARY, fmt))
+              for fmt in module.OUTPUT_FORMATS]
+    print(f'{"":24} {"mean":>8} {"p50":>8} {"bytes":>9}')
+    for name, fn in cases:
+        mean, p50, size = measure(fn, args.runs)
+        print(f'{name:24} {mean:6.1f}ms {p50:6.1f}ms {size:9,}')
+
+
+if __name__ == '__main__':
+    main()
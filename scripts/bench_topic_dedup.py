@@ -0,0 +1,129 @@
+"""
+Бенчмарк дедупликации тем блога (user-021): ArticleIndex (обратные индексы слов) против прежнего
+попарного перебора «темы пула × все темы и заголовки» через titles_are_similar.
+
+Засевает в базу из DATABASE_URL неопубликованные статьи «bench-dedup-N» (по умолчанию до 10 000)
+и при повторном запуске переиспользует их. Запускать только на локальной/тестовой базе:
+    DATABASE_URL=postgresql://... python scripts/bench_topic_dedup.py [--posts 10000] [--candidates 50]
+
+Проверяет, что оба способа дают одинаковый список свободных тем и одинаковые найденные дубли,
+печатает время построения индекса, синхронизации без изменений и обеих проверок.
+"""
+import argparse
+import importlib.util
+import os
+import random
+import re
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+S = 't_p65890965_refstaff_project'
+SLUG_PREFIX = 'bench-dedup-'
+FILLER = ['как', 'почему', 'кейс', 'руководство', 'ошибки', 'тренды', 'компании', 'сотрудники', 'бонусы',
+          'удержание', 'бюджет', 'аналитика', 'HR', 'стартап', 'команда', 'рынок', 'зарплаты', 'опрос']
+POOL_SHARE = 0.005  # доля статей, повторяющих тему из пула: часть тем пула остаётся свободной
+VOCABULARY = 20000
+
+
+def load_blog_posts():
+    function_dir = os.path.join(ROOT, 'backend', 'blog-posts')
+    sys.path.insert(0, function_dir)
+    spec = importlib.util.spec_from_file_location('blog_posts_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_text(rnd: random.Random, pool: list) -> str:
+    """Изредка — переформулированная тема из пула (часть её слов плюс случайные), остальное —
+    статьи о другом: слова синтетического словаря и одно общее слово из FILLER."""
+    if rnd.random() < POOL_SHARE:
+        words = rnd.choice(pool).split()
+        kept = rnd.sample(words, k=max(1, len(words) // rnd.choice((1, 2, 3))))
+        return ' '.join(kept + rnd.choices(FILLER, k=rnd.randint(1, 3)))
+    return ' '.join([f'термин{n}' for n in rnd.choices(range(VOCABULARY), k=rnd.randint(3, 6))] + [rnd.choice(FILLER)])
+
+
+def seed(cur, module, posts: int):
+    cur.execute(f'SELECT COUNT(*) FROM {S}.blog_posts WHERE slug LIKE %s', (SLUG_PREFIX + '%',))
+    have = cur.fetchone()[0]
+    if have >= posts:
+        return
+    rnd = random.Random(21)
+    pool = [t.format(year=2026) for t in module.TOPIC_POOLS]
+    execute_values(
+        cur,
+        f'INSERT INTO {S}.blog_posts (slug, title, content, topic, is_published) VALUES %s',
+        [(f'{SLUG_PREFIX}{i}', synthetic_text(rnd, pool).capitalize(), '<p>текст</p>', synthetic_text(rnd, pool), False)
+         for i in range(have, posts)],
+        page_size=2000
+    )
+
+
+def legacy_words(text: str) -> set:
+    """Разбор слов до user-021: без кеша, заново на каждое сравнение."""
+    stop_words = {'в', 'и', 'на', 'с', 'по', 'для', 'как', 'что', 'от', 'к', 'о', 'из', 'не', 'или', 'а', 'но'}
+    return set(re.sub(r'[^а-яёa-z0-9\s]', '', text.lower()).split()) - stop_words
+
+
+def legacy_similar(a: str, b: str, threshold: float) -> bool:
+    wa, wb = legacy_words(a), legacy_words(b)
+    if not wa or not wb:
+        return False
+    return len(wa & wb) / min(len(wa), len(wb)) >= threshold
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--candidates', type=int, default=50)
+    args = parser.parse_args()
+
+    module = load_blog_posts()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    conn.autocommit = True
+    cur = conn.cursor()
+    seed(cur, module, args.posts)
+    cur.execute(f'SELECT topic, title FROM {S}.blog_posts ORDER BY id')
+    rows = [(topic or '', title or '') for topic, title in cur.fetchall()]
+    topics, titles = [r[0] for r in rows], [r[1] for r in rows]
+    print(f'{len(rows):,} статей в blog_posts')
+
+    index, build_ms = timed(lambda: module.get_article_index(conn))
+    _, sync_ms = timed(lambda: module.get_article_index(conn))
+    pool = index.pool
+
+    legacy_free, legacy_ms = timed(lambda: [
+        t for t in pool
+        if not any(legacy_similar(t, e, module.TOPIC_THRESHOLD) for e in topics)
+        and not any(legacy_similar(t, e, module.TOPIC_THRESHOLD) for e in titles)
+    ])
+    free, free_ms = timed(index.free_topics)
+    print(f'свободных тем пула: {len(free)} из {len(pool)}, совпадает с перебором: {free == legacy_free}')
+    print(f'  попарный перебор            {legacy_ms:10.1f} ms')
+    print(f'  ArticleIndex.free_topics    {free_ms:10.3f} ms   (построение {build_ms:.0f} ms, синхронизация {sync_ms:.1f} ms)')
+
+    rnd = random.Random(5)
+    candidates = [synthetic_text(rnd, pool).capitalize() for _ in range(args.candidates)]
+    legacy_dups, legacy_ms = timed(lambda: [
+        next((t for t in titles if legacy_similar(c, t, module.TITLE_THRESHOLD)), None) for c in candidates
+    ])
+    dups, index_ms = timed(lambda: [index.find_similar('title', c, module.TITLE_THRESHOLD) for c in candidates])
+    print(f'{len(candidates)} заголовков-кандидатов, дублей: {sum(d is not None for d in dups)}, '
+          f'совпадает с перебором: {dups == legacy_dups}')
+    print(f'  попарный перебор            {legacy_ms / len(candidates):10.2f} ms/кандидат')
+    print(f'  ArticleIndex.find_similar   {index_ms / len(candidates):10.3f} ms/кандидат')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Бенчмарк unread_count в GET resource=chats: счётчики chat_unread_counters (user-007) против
+прежнего коррелированного COUNT(*) по chat_messages на каждую строку чата.
+
+Засевает в базу из DATABASE_URL компанию «bench-unread» (по умолчанию 3 000 чатов по 40 сообщений)
+и при повторном запуске переиспользует её. Запускать только на локальной/тестовой базе:
+    DATABASE_URL=postgresql://... python scripts/bench_unread.py [--chats 3000] [--messages 40] [--runs 30]
+
+Проверяет, что оба способа дают одинаковые unread_count, печатает p50/p99 листинга чатов
+работодателя и время reconcile_unread.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+S = 't_p65890965_refstaff_project'
+COMPANY_NAME = 'bench-unread'
+
+LEGACY_QUERY = f"""
+    SELECT c.*,
+           u.first_name || ' ' || u.last_name as employee_name,
+           u.position, u.avatar_url,
+           (SELECT COUNT(*) FROM {S}.chat_messages
+            WHERE chat_id = c.id AND is_read = false AND sender_id != %s) as unread_count
+    FROM {S}.chats c
+    JOIN {S}.users u ON c.employee_id = u.id
+    WHERE c.company_id = %s
+    ORDER BY c.last_message_at DESC NULLS LAST
+"""
+# Тот же запрос, что в GET resource=chats для работодателя
+COUNTERS_QUERY = f"""
+    SELECT c.*,
+           u.first_name || ' ' || u.last_name as employee_name,
+           u.position, u.avatar_url,
+           (SELECT COALESCE(SUM(unread_count), 0) FROM {S}.chat_unread_counters
+            WHERE chat_id = c.id AND sender_id != %s) as unread_count
+    FROM {S}.chats c
+    JOIN {S}.users u ON c.employee_id = u.id
+    WHERE c.company_id = %s
+    ORDER BY c.last_message_at DESC NULLS LAST
+"""
+
+
+def time_query(cur, query: str, params: tuple, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        cur.execute(query, params)
+        cur.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def load_api():
+    function_dir = os.path.join(ROOT, 'backend', 'api')
+    sys.path.insert(0, function_dir)  # рядом с index.py лежат модули из shared/
+    spec = importlib.util.spec_from_file_location('api_index', os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(cur, chats: int, messages: int) -> tuple:
+    cur.execute(f'SELECT id FROM {S}.companies WHERE name = %s', (COMPANY_NAME,))
+    row = cur.fetchone()
+    if row:
+        cur.execute(f"SELECT id FROM {S}.users WHERE company_id = %s AND role = 'employer' LIMIT 1", (row['id'],))
+        return row['id'], cur.fetchone()['id']
+    rnd = random.Random(7)
+    base = datetime(2025, 1, 1)
+    cur.execute(f'INSERT INTO {S}.companies (name) VALUES (%s) RETURNING id', (COMPANY_NAME,))
+    company_id = cur.fetchone()['id']
+    cur.execute(
+        f"INSERT INTO {S}.users (email, first_name, last_name, company_id, role) "
+        f"VALUES (%s, 'Bench', 'Employer', %s, 'employer') RETURNING id",
+        (f'employer-{company_id}@unread.local', company_id)
+    )
+    employer_id = cur.fetchone()['id']
+    user_ids = [r['id'] for r in execute_values(
+        cur,
+        f'INSERT INTO {S}.users (email, first_name, last_name, company_id, role) VALUES %s RETURNING id',
+        [(f'u{i}-{company_id}@unread.local', f'Имя{i}', f'Фамилия{i}', company_id, 'employee') for i in range(chats)],
+        fetch=True
+    )]
+    chat_rows = execute_values(
+        cur,
+        f'INSERT INTO {S}.chats (company_id, employee_id, last_message_at) VALUES %s RETURNING id, employee_id',
+        [(company_id, uid, base + timedelta(minutes=i)) for i, uid in enumerate(user_ids)],
+        fetch=True
+    )
+    # Пачками по 500 чатов, чтобы statement-триггеры счётчиков работали на реалистичных вставках
+    for start in range(0, len(chat_rows), 500):
+        execute_values(
+            cur,
+            f'INSERT INTO {S}.chat_messages (chat_id, sender_id, message, is_read) VALUES %s',
+            [(c['id'], c['employee_id'] if rnd.random() < 0.6 else employer_id, 'сообщение', rnd.random() < 0.7)
+             for c in chat_rows[start:start + 500] for _ in range(messages)],
+            page_size=5000
+        )
+    return company_id, employer_id
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f'p50 {statistics.median(samples):7.1f} ms   p99 {p99:7.1f} ms'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=3000)
+    parser.add_argument('--messages', type=int, default=40)
+    parser.add_argument('--runs', type=int, default=30)
+    args = parser.parse_args()
+
+    api = load_api()
+    conn = api.get_db_connection()
+    cur = conn.cursor()
+    company_id, employer_id = seed(cur, args.chats, args.messages)
+    event = {'httpMethod': 'GET', 'headers': {},
+             'queryStringParameters': {'resource': 'chats', 'company_id': str(company_id), 'user_id': str(employer_id)}}
+
+    cur.execute(LEGACY_QUERY, (employer_id, company_id))
+    legacy = {r['id']: r['unread_count'] for r in cur.fetchall()}
+    current = {c['id']: c['unread_count'] for c in json.loads(api.handler(event, None)['body'])}
+    print(f'{len(current)} chats, same unread_count as COUNT(*): {legacy == current}')
+
+    params = (employer_id, company_id)
+    print(f'  {"COUNT(*) per chat":22} {percentiles(time_query(cur, LEGACY_QUERY, params, args.runs))}')
+    print(f'  {"chat_unread_counters":22} {percentiles(time_query(cur, COUNTERS_QUERY, params, args.runs))}')
+    samples = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        api.handler(event, None)
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f'  {"handler GET chats":22} {percentiles(samples)}   (с json.dumps и сжатием)')
+
+    secret = os.environ.get('ADMIN_SECRET')
+    if secret:
+        started = time.perf_counter()
+        response = api.handler({'httpMethod': 'POST', 'headers': {},
+                                'queryStringParameters': {'resource': 'chats', 'action': 'reconcile_unread'},
+                                'body': json.dumps({'admin_secret': secret})}, None)
+        print(f'reconcile_unread: {(time.perf_counter() - started) * 1000:.0f} ms, {response["body"]}')
+    else:
+        print('reconcile_unread пропущен: задайте ADMIN_SECRET')
+
+
+if __name__ == '__main__':
+    main()
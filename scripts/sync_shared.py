@@ -0,0 +1,65 @@
+"""
+Копирует общие модули из shared/ в папки облачных функций.
+
+Каждая функция в backend/ деплоится отдельно и видит только свою папку, поэтому общий код
+живёт в shared/, а в функции попадает копией с пометкой «не редактировать». Правьте shared/
+и запускайте:
+    python scripts/sync_shared.py          # обновить копии
+    python scripts/sync_shared.py --check  # только проверить (для CI), код выхода 1 при расхождении
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# модуль в shared/ -> функции backend/, которые его импортируют
+SHARED_MODULES = {
+    'messenger.py': ('api', 'max-auth', 'partner', 'payouts', 'telegram-auth'),
+    'batch_migrate.py': ('api', 'upload-avatar'),
+    # og-image не подключён: он отдаёт картинки, а бинарные ответы finish_response не трогает
+    'http_response.py': (
+        'admin', 'ai-assistant', 'api', 'auth', 'blog-posts', 'contact-form', 'game-scores', 'get-company-by-token',
+        'jobs-aggregator', 'max-auth', 'notify-company', 'og-proxy', 'partner', 'payouts', 'public-tests',
+        'request-password-reset', 'reset-password', 'send-email', 'telegram-auth', 'upload-avatar', 'upload-resume',
+        'vacancy-tests', 'verify-inn',
+    ),
+}
+
+HEADER = '# Сгенерировано scripts/sync_shared.py из shared/{name} — не редактировать, правьте shared/{name}.\n'
+
+
+def render(name: str) -> str:
+    with open(os.path.join(ROOT, 'shared', name), encoding='utf-8') as f:
+        return HEADER.format(name=name) + f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    stale = []
+    for name, functions in SHARED_MODULES.items():
+        content = render(name)
+        for function in functions:
+            path = os.path.join(ROOT, 'backend', function, name)
+            current = None
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    current = f.read()
+            if current == content:
+                continue
+            stale.append(os.path.relpath(path, ROOT))
+            if not args.check:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+
+    for path in stale:
+        print(f'{"устарел" if args.check else "обновлён"}: {path}')
+    if args.check and stale:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
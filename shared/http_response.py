@@ -0,0 +1,90 @@
+"""
+Общая обработка ответов облачных функций: Cache-Control, слабый ETag с 304 и сжатие br/gzip.
+
+Каноничный исходник: shared/http_response.py. Облачные функции деплоятся каждая из своей папки,
+поэтому в backend/<функция>/http_response.py лежит копия, которую пишет scripts/sync_shared.py.
+
+Использование:
+    @http_response(cache_policy)  # cache_policy(event) -> Cache-Control маршрута
+    def handler(event, context): ...
+"""
+
+import base64
+import gzip
+import hashlib
+from functools import wraps
+
+import brotli
+
+COMPRESS_MIN_BYTES = 1024  # меньше — выигрыш съедают заголовки
+BROTLI_QUALITY = 5  # дальше размер почти не падает, а время растёт
+GZIP_LEVEL = 6
+
+
+def no_store(event: dict) -> str:
+    """Политика по умолчанию: ответ не кешируется ни браузером, ни прокси."""
+    return 'no-store'
+
+
+def accepted_encoding(accept_encoding: str) -> str:
+    """'br' или 'gzip' из Accept-Encoding (br предпочтительнее), '' — не сжимать."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    for name in ('br', 'gzip'):
+        if accepted.get(name, accepted.get('*', 0)) > 0:
+            return name
+    return ''
+
+
+def finish_response(event: dict, response: dict, cache_control: str) -> dict:
+    """Cache-Control маршрута (если handler не задал свой), слабый ETag и 304 для GET 200,
+    сжатие br/gzip по Accept-Encoding от COMPRESS_MIN_BYTES. Бинарные ответы не трогаем.
+    Ошибки не получают публичный Cache-Control маршрута — прокси не должен запомнить 4xx/5xx."""
+    body = response.get('body')
+    if not isinstance(body, str) or response.get('isBase64Encoded'):
+        return response
+    status = response.get('statusCode', 200)
+    if not (200 <= status < 300 or status == 304) and 'public' in cache_control:
+        cache_control = 'no-store'
+    headers = dict(response.get('headers') or {})
+    headers.setdefault('Cache-Control', cache_control)
+    request_headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    raw = body.encode('utf-8')
+
+    if event.get('httpMethod') == 'GET' and status == 200 and 'no-store' not in headers['Cache-Control']:
+        etag = headers.setdefault('ETag', f'W/"{hashlib.sha256(raw).hexdigest()[:32]}"')
+        if_none_match = request_headers.get('if-none-match', '')
+        tags = [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+        if etag.removeprefix('W/') in tags or if_none_match.strip() == '*':
+            headers.pop('Content-Type', None)
+            return {'statusCode': 304, 'headers': headers, 'body': '', 'isBase64Encoded': False}
+
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return {**response, 'headers': headers}
+    headers['Vary'] = ', '.join(filter(None, [headers.get('Vary'), 'Accept-Encoding']))
+    encoding = accepted_encoding(request_headers.get('accept-encoding', ''))
+    if not encoding:
+        return {**response, 'headers': headers}
+    raw = brotli.compress(raw, quality=BROTLI_QUALITY) if encoding == 'br' else gzip.compress(raw, GZIP_LEVEL)
+    headers['Content-Encoding'] = encoding
+    return {**response, 'headers': headers, 'body': base64.b64encode(raw).decode(), 'isBase64Encoded': True}
+
+
+def http_response(cache_policy=no_store):
+    """Декоратор handler: каждый ответ проходит через finish_response с политикой cache_policy(event)."""
+    def decorate(handler_fn):
+        @wraps(handler_fn)
+        def wrapper(event: dict, context) -> dict:
+            return finish_response(event, handler_fn(event, context), cache_policy(event))
+        return wrapper
+    return decorate
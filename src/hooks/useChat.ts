@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { api } from '@/lib/api';
+import { api, withAuthToken } from '@/lib/api';
 import type { Chat } from '@/lib/api';
 import type { ChatMessage, CurrentUser, Employee } from '@/types';
 
@@ -100,7 +100,7 @@ export function useChat(params: {
         isOwn: m.sender_id === currentUser?.id,
         attachments: m.attachment_url ? [{
           type: m.attachment_type ?? 'file',
-          url: m.attachment_url,
+          url: withAuthToken(m.attachment_url),
           name: m.attachment_name || 'файл',
           size: m.attachment_size || 0,
         }] : undefined,
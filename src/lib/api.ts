@@ -137,6 +137,14 @@ export interface ChatMessage {
   created_at: string;
 }
 
+// Вложения и резюме отдаются API только авторизованным; браузер открывает их
+// обычной ссылкой без заголовков, поэтому токен сессии передаётся в query.
+export const withAuthToken = (url: string): string => {
+  const token = localStorage.getItem('authToken');
+  if (!token || !url.startsWith(API_URL)) return url;
+  return `${url}&token=${encodeURIComponent(token)}`;
+};
+
 export const api = {
   async getVacancies(companyId: number = 1, status: string = 'active'): Promise<Vacancy[]> {
     const response = await fetch(`${API_URL}/?resource=vacancies&company_id=${companyId}&status=${status}`);
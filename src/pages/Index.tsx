@@ -15,7 +15,7 @@ import { Separator } from '@/components/ui/separator';
 import { Checkbox } from '@/components/ui/checkbox';
 import Icon from '@/components/ui/icon';
 import { QRCodeSVG } from 'qrcode.react';
-import { api, type Company } from '@/lib/api';
+import { api, withAuthToken, type Company } from '@/lib/api';
 import type { UserRole, Vacancy, Employee, Recommendation, NewsPost, NewsComment, PayoutRequest } from '@/types';
 import ScrollableTabs from '@/components/ScrollableTabs';
 import TelegramLoginButton from '@/components/TelegramLoginButton';
@@ -2518,7 +2518,7 @@ function Index() {
                 {activeRecommendation.resumeUrl && (
                   <div>
                     <p className="text-[10px] text-muted-foreground uppercase tracking-wide mb-1">Резюме</p>
-                    <a href={activeRecommendation.resumeUrl} target="_blank" rel="noopener noreferrer" download>
+                    <a href={withAuthToken(activeRecommendation.resumeUrl)} target="_blank" rel="noopener noreferrer" download>
                       <Button variant="outline" size="sm" className="gap-2 text-xs h-8">
                         <Icon name="Download" size={14} />
                         Скачать резюме
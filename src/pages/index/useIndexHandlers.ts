@@ -1,5 +1,5 @@
 import React from 'react';
-import { api, type Vacancy as ApiVacancy, type Employee as ApiEmployee, type Recommendation as ApiRecommendation } from '@/lib/api';
+import { api, withAuthToken, type Vacancy as ApiVacancy, type Employee as ApiEmployee, type Recommendation as ApiRecommendation } from '@/lib/api';
 import type { UserRole, Vacancy, Employee, Recommendation, ChatMessage, NewsPost, NewsComment, PayoutRequest } from '@/types';
 
 // Принимает всё состояние из useIndexState и возвращает все обработчики
@@ -49,7 +49,7 @@ export function useIndexHandlers(s: ReturnType<typeof import('./useIndexState').
         isOwn: m.sender_id === s.currentUser?.id,
         attachments: m.attachment_url ? [{
           type: m.attachment_type as 'image' | 'file',
-          url: m.attachment_url,
+          url: withAuthToken(m.attachment_url),
           name: m.attachment_name || 'файл',
           size: m.attachment_size || 0,
         }] : undefined,